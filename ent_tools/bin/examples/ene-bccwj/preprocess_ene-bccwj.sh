@@ -10,20 +10,14 @@
 
 mkdir -p ../data/processed/gsk-ene-bccwj/json/
 
-python ent_tools/datasets/ene_bccwj/convert_xmls_to_json.py \
-       -x ../data/original/gsk-ene/bccwj/xml \
-       -j ../data/processed/gsk-ene-bccwj/json/bccwj-exPN-train.json \
-       -i ../data/supplement/UD_Japanese-BCCWJ/UDJB_train_ids.txt \
-       --exclude_domains PN
-
-python ent_tools/datasets/ene_bccwj/convert_xmls_to_json.py \
-       -x ../data/original/gsk-ene/bccwj/xml \
-       -j ../data/processed/gsk-ene-bccwj/json/bccwj-exPN-dev.json \
-       -i ../data/supplement/UD_Japanese-BCCWJ/UDJB_dev_ids.txt \
-       --exclude_domains PN
+# Every XML file is parsed once and each document is written to the output
+# of the split whose id list contains it.
+JSON_DIR=../data/processed/gsk-ene-bccwj/json
+ID_DIR=../data/supplement/UD_Japanese-BCCWJ
 
 python ent_tools/datasets/ene_bccwj/convert_xmls_to_json.py \
        -x ../data/original/gsk-ene/bccwj/xml \
-       -j ../data/processed/gsk-ene-bccwj/json/bccwj-exPN-test.json \
-       -i ../data/supplement/UD_Japanese-BCCWJ/UDJB_test_ids.txt \
-       --exclude_domains PN
+       -j $JSON_DIR/bccwj-exPN-train.json,$JSON_DIR/bccwj-exPN-dev.json,$JSON_DIR/bccwj-exPN-test.json \
+       -i $ID_DIR/UDJB_train_ids.txt,$ID_DIR/UDJB_dev_ids.txt,$ID_DIR/UDJB_test_ids.txt \
+       --exclude_domains PN \
+       --jobs 0
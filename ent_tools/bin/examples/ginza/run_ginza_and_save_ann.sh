@@ -10,6 +10,9 @@ mkdir -p $DATA_OUT_DIR/tsv_for_ner
 mkdir -p $DATA_OUT_DIR/ginza/conll_per_doc
 
 ## Parse txt using ginza and save result as json
+## (python steps are run for all files in a single process by `ent-tools --batch`)
+: > $DATA_OUT_DIR/txt_to_tsv.batch
+: > $DATA_OUT_DIR/conll_to_ann.batch
 for TXT_PATH in $DATA_IN_DIR/*.txt; do
     # check whether input file is empty
     if [ ! -s "$TXT_PATH" ]; then
@@ -23,19 +26,29 @@ for TXT_PATH in $DATA_IN_DIR/*.txt; do
     GINZA_CNL_PATH=$DATA_OUT_DIR/ginza/conll_per_doc/$DOC_NAME.conll
     ANN_PATH=$DATA_OUT_DIR/brat/$DOC_NAME.ann
     
-    ## Convert txt -> tsv (for ginza)
-    python ent_tools/data_conversion/txt_to_tsv_for_auto_ner.py \
-           -itxt $TXT_PATH \
-           -tsv $TSV_PATH
+    echo txt-to-tsv \
+         -itxt $TXT_PATH \
+         -tsv $TSV_PATH >> $DATA_OUT_DIR/txt_to_tsv.batch
+    echo conll-to-ann \
+         -conll $GINZA_CNL_PATH \
+         -ann $ANN_PATH \
+         -tsv $TSV_PATH \
+         -label ../data/supplement/label_map/labelmap_ene-v7.1.0_to_loc-fac-org-name.json \
+         >> $DATA_OUT_DIR/conll_to_ann.batch
+done
+
+## Convert txt -> tsv (for ginza)
+ent-tools --batch $DATA_OUT_DIR/txt_to_tsv.batch
+
+## Run ginza and save as conll
+for TSV_PATH in $DATA_OUT_DIR/tsv_for_ner/*.tsv; do
+    FILE_NAME=`basename $TSV_PATH`
+    DOC_NAME="${FILE_NAME%.*}"
+    GINZA_CNL_PATH=$DATA_OUT_DIR/ginza/conll_per_doc/$DOC_NAME.conll
 
-    ## Run ginza and save as conll
     cut -f4 $TSV_PATH | ginza -d -m $MODEL_NAME > $GINZA_CNL_PATH
     echo "Save: $GINZA_CNL_PATH"
-
-    ## Convert conll -> ann (for brat)
-    python ent_tools/data_conversion/ginza_conll_to_ann.py \
-           -conll $GINZA_CNL_PATH \
-           -ann $ANN_PATH \
-           -tsv $TSV_PATH \
-           -label ../data/supplement/label_map/labelmap_ene-v7.1.0_to_loc-fac-org-name.json
 done
+
+## Convert conll -> ann (for brat)
+ent-tools --batch $DATA_OUT_DIR/conll_to_ann.batch
@@ -12,6 +12,9 @@ mkdir -p $DATA_OUT_DIR/json_per_doc
 mkdir -p $DATA_OUT_DIR/json
 
 ## Parse txt using ginza and save result as json
+## (python steps are run for all files in a single process by `ent-tools --batch`)
+: > $DATA_OUT_DIR/txt_to_tsv.batch
+: > $DATA_OUT_DIR/conll_to_json.batch
 for TXT_PATH in $DATA_IN_DIR/*.txt; do
     # check whether input file is empty
     if [ ! -s "$TXT_PATH" ]; then
@@ -25,23 +28,32 @@ for TXT_PATH in $DATA_IN_DIR/*.txt; do
     GINZA_CNL_PATH=$DATA_OUT_DIR/conll_per_doc/$DOC_NAME.conll
     GINZA_JSON_PATH=$DATA_OUT_DIR/json_per_doc/$DOC_NAME.json
     
-    ## Convert txt -> tsv (for ginza)
-    python ent_tools/data_conversion/txt_to_tsv_for_auto_ner.py \
-           -itxt $TXT_PATH \
-           -tsv $TSV_PATH
+    echo txt-to-tsv \
+         -itxt $TXT_PATH \
+         -tsv $TSV_PATH >> $DATA_OUT_DIR/txt_to_tsv.batch
+    echo conll-to-json \
+         -conll $GINZA_CNL_PATH \
+         -json $GINZA_JSON_PATH \
+         -tsv $TSV_PATH >> $DATA_OUT_DIR/conll_to_json.batch
+done
+
+## Convert txt -> tsv (for ginza)
+ent-tools --batch $DATA_OUT_DIR/txt_to_tsv.batch
+
+## Run ginza and save as conll
+for TSV_PATH in $DATA_OUT_DIR/tsv_for_ner/*.tsv; do
+    FILE_NAME=`basename $TSV_PATH`
+    DOC_NAME="${FILE_NAME%.*}"
+    GINZA_CNL_PATH=$DATA_OUT_DIR/conll_per_doc/$DOC_NAME.conll
 
-    ## Run ginza and save as conll
     cut -f4 $TSV_PATH | ginza -d -m $MODEL_NAME > $GINZA_CNL_PATH
     echo "Save: $GINZA_CNL_PATH"
-
-    ## Convert conll -> json
-    python ent_tools/data_conversion/ginza_conll_to_json.py \
-           -conll $GINZA_CNL_PATH \
-           -json $GINZA_JSON_PATH \
-           -tsv $TSV_PATH
 done
 
+## Convert conll -> json
+ent-tools --batch $DATA_OUT_DIR/conll_to_json.batch
+
 ## Merge json files into a single json file
-python ent_tools/data_conversion/merge_jsons_into_single_json.py \
+ent-tools merge \
        -i $DATA_OUT_DIR/json_per_doc \
        -o $DATA_OUT_DIR/json/all.json
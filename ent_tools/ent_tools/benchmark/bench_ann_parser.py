@@ -0,0 +1,66 @@
+import argparse
+import os
+import tempfile
+import time
+from collections import Counter
+
+import logzero
+from logzero import logger
+
+from ent_tools.benchmark.synthetic_data import gen_brat_subdoc_texts
+from ent_tools.data_conversion.ann_parser import iter_ann_records
+from ent_tools.data_conversion.brat_util import load_ann
+
+
+def count_records(
+        ann_path: str,
+) -> Counter:
+
+    counter = Counter()
+    for record in iter_ann_records(ann_path):
+        counter[type(record).__name__] += 1
+    return counter
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n_subdocs', type=int, default=20000)
+    parser.add_argument('--n_sens', type=int, default=10)
+    parser.add_argument('--n_repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    logzero.loglevel(logzero.WARNING)
+
+    _, ann = gen_brat_subdoc_texts(n_subdocs=args.n_subdocs, n_sens=args.n_sens)
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        ann_path = os.path.join(work_dir, 'synthetic.ann')
+        with open(ann_path, 'w') as fw:
+            fw.write(ann)
+        size_mb = os.path.getsize(ann_path) / 1e6
+
+        for method, run in (
+                ('iter_ann_records', count_records),
+                ('load_ann', load_ann),
+        ):
+            logger.warning(f'Run: {method}')
+            times = []
+            for _ in range(args.n_repeat):
+                t0 = time.perf_counter()
+                run(ann_path)
+                times.append(time.perf_counter() - t0)
+            results.append((method, min(times)))
+
+        counter = count_records(ann_path)
+
+    print(f'size_MB\t{size_mb:.1f}')
+    for name, count in sorted(counter.items()):
+        print(f'{name}\t{count}')
+    print('method\tsec\tMB/s\tsec/GB')
+    for method, sec in results:
+        print(f'{method}\t{sec:.3f}\t{size_mb/sec:.1f}\t{1000*sec/size_mb:.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+import argparse
+import os
+import tempfile
+import time
+
+from logzero import logger
+
+from ent_tools.benchmark.synthetic_data import gen_corpus
+from ent_tools.util.data_io import (
+    BZ2, GZIP, XZ, ZSTD, iter_docs, write_docs, zstandard,
+)
+
+
+def get_available_compressions() -> list[str]:
+    compressions = ['', GZIP, BZ2, XZ]
+    if zstandard is not None:
+        compressions.append(ZSTD)
+    return compressions
+
+
+def run(
+        data: dict,
+        file_name: str,
+        work_dir: str,
+        n_repeat: int = 3,
+) -> dict:
+
+    path = os.path.join(work_dir, file_name)
+
+    write_times = []
+    read_times = []
+    for _ in range(n_repeat):
+        t0 = time.perf_counter()
+        write_docs(data.items(), path)
+        t1 = time.perf_counter()
+        n_docs = sum(1 for _ in iter_docs(path))
+        t2 = time.perf_counter()
+        assert n_docs == len(data)
+        write_times.append(t1 - t0)
+        read_times.append(t2 - t1)
+
+    return {
+        'size_mb': os.path.getsize(path) / 1e6,
+        'write_sec': min(write_times),
+        'read_sec': min(read_times),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n_docs', type=int, default=2000)
+    parser.add_argument('--n_sens', type=int, default=30)
+    parser.add_argument('--n_repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    data = gen_corpus(n_docs=args.n_docs, n_sens=args.n_sens)
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for ext in ('.json', '.jsonl'):
+            for compression in get_available_compressions():
+                file_name = f'corpus{ext}{compression}'
+                logger.info(f'Run: {file_name}')
+                results.append((file_name, run(data, file_name, work_dir, n_repeat=args.n_repeat)))
+
+    print('file\tsize_MB\twrite_sec\tread_sec\tread_docs/s')
+    n_docs = len(data)
+    for file_name, res in results:
+        print(f'{file_name}\t{res["size_mb"]:.1f}'
+              f'\t{res["write_sec"]:.3f}\t{res["read_sec"]:.3f}'
+              f'\t{n_docs/res["read_sec"]:.0f}')
+
+
+if __name__ == '__main__':
+    main()
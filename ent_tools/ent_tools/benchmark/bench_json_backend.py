@@ -0,0 +1,72 @@
+import argparse
+import os
+import tempfile
+import time
+
+from logzero import logger
+
+from ent_tools.benchmark.synthetic_data import gen_corpus
+from ent_tools.util.data_io import (
+    get_available_json_backends, set_json_backend, load_json, write_as_json,
+)
+
+
+def run(
+        data: dict,
+        backend: str,
+        compact: bool,
+        work_dir: str,
+        n_repeat: int = 3,
+) -> dict:
+
+    set_json_backend(backend)
+    path = os.path.join(work_dir, f'{backend}_{"compact" if compact else "indent"}.json')
+
+    dump_times = []
+    load_times = []
+    for _ in range(n_repeat):
+        t0 = time.perf_counter()
+        write_as_json(data, path, compact=compact)
+        t1 = time.perf_counter()
+        data_loaded = load_json(path)
+        t2 = time.perf_counter()
+        assert data_loaded == data
+        dump_times.append(t1 - t0)
+        load_times.append(t2 - t1)
+
+    size_mb = os.path.getsize(path) / 1e6
+    return {
+        'size_mb': size_mb,
+        'dump_sec': min(dump_times),
+        'load_sec': min(load_times),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n_docs', type=int, default=2000)
+    parser.add_argument('--n_sens', type=int, default=30)
+    parser.add_argument('--n_repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    data = gen_corpus(n_docs=args.n_docs, n_sens=args.n_sens)
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for backend in get_available_json_backends():
+            for compact in (False, True):
+                logger.info(f'Run: backend={backend} compact={compact}')
+                res = run(data, backend, compact, work_dir, n_repeat=args.n_repeat)
+                results.append((backend, compact, res))
+    set_json_backend()
+
+    print('backend\tcompact\tsize_MB\tdump_sec\tload_sec\tdump_docs/s\tload_docs/s')
+    n_docs = len(data)
+    for backend, compact, res in results:
+        print(f'{backend}\t{compact}\t{res["size_mb"]:.1f}'
+              f'\t{res["dump_sec"]:.3f}\t{res["load_sec"]:.3f}'
+              f'\t{n_docs/res["dump_sec"]:.0f}\t{n_docs/res["load_sec"]:.0f}')
+
+
+if __name__ == '__main__':
+    main()
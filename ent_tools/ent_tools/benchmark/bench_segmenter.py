@@ -0,0 +1,96 @@
+import argparse
+import random
+import time
+
+from logzero import logger
+
+from ent_tools.benchmark.synthetic_data import gen_sentence_text
+from ent_tools.data_conversion.sentence_segmenter import SCAN_BACKEND, Segmenter
+
+
+BRACKETS = ['「{}」', '（{}）', '『{}』', '【{}】', '<{}>', '“{}”']
+ENDINGS = ['。', '！', '？', '!?', '。。', '。）']
+
+
+def gen_texts(
+        n_texts: int,
+        boilerplate_ratio: float,
+        seed: int = 0,
+) -> list[str]:
+    """Generate paragraphs of a few sentences; some are drawn from a small set of boilerplate lines."""
+
+    rng = random.Random(seed)
+
+    def gen_text():
+        sentences = []
+        for _ in range(rng.randint(1, 5)):
+            sentence = gen_sentence_text(rng, min_len=10, max_len=40)[:-1]
+            if rng.random() < 0.3:
+                inner = gen_sentence_text(rng, min_len=5, max_len=15)
+                sentence += rng.choice(BRACKETS).format(inner)
+            sentences.append(sentence + rng.choice(ENDINGS))
+        return ''.join(sentences)
+
+    boilerplates = [gen_text() for _ in range(100)]
+    return [rng.choice(boilerplates) if rng.random() < boilerplate_ratio else gen_text()
+            for _ in range(n_texts)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n_texts', type=int, default=50000)
+    parser.add_argument('--boilerplate_ratio', type=float, default=0.5)
+    parser.add_argument('--cache_size', type=int, default=65536)
+    parser.add_argument('--jobs', type=int, default=2)
+    args = parser.parse_args()
+
+    texts = gen_texts(args.n_texts, args.boilerplate_ratio)
+    n_chars = sum(len(text) for text in texts)
+
+    segmenter = Segmenter()
+    cached_segmenter = Segmenter(cache_size=args.cache_size)
+    scan_segmenter = Segmenter(backend=SCAN_BACKEND)
+    cached_scan_segmenter = Segmenter(cache_size=args.cache_size, backend=SCAN_BACKEND)
+
+    def sentencize_with_offsets():
+        # offsets rebuilt by callers from the sentences
+        results = []
+        for text in texts:
+            spans = []
+            begin = 0
+            for sentence in segmenter.sentencize(text):
+                spans.append((begin, begin + len(sentence)))
+                begin += len(sentence)
+            results.append(tuple(spans))
+        return results
+
+    results = []
+    expected = None
+    for method, run in (
+            ('sentencize', sentencize_with_offsets),
+            ('get_spans', lambda: [segmenter.get_spans(text) for text in texts]),
+            ('get_spans_batch', lambda: segmenter.get_spans_batch(texts)),
+            ('get_spans_batch+cache', lambda: cached_segmenter.get_spans_batch(texts)),
+            (f'get_spans_batch jobs={args.jobs}', lambda: segmenter.get_spans_batch(texts, jobs=args.jobs)),
+            ('scan get_spans_batch', lambda: scan_segmenter.get_spans_batch(texts)),
+            ('scan get_spans_batch+cache', lambda: cached_scan_segmenter.get_spans_batch(texts)),
+    ):
+        logger.info(f'Run: {method}')
+        t0 = time.perf_counter()
+        spans = run()
+        sec = time.perf_counter() - t0
+
+        if expected is None:
+            expected = spans
+        assert spans == expected, f'Output of {method} differs'
+        results.append((method, sec))
+
+    print(f'texts\t{len(texts)}\tchars\t{n_chars}\tboilerplate_ratio\t{args.boilerplate_ratio}')
+    print('method\tsec\ttexts/s\tMchars/s')
+    for method, sec in results:
+        print(f'{method}\t{sec:.2f}\t{len(texts)/sec:.0f}\t{n_chars/sec/1e6:.2f}')
+    print(f'cache: {cached_segmenter.cache_info()}')
+
+
+if __name__ == '__main__':
+    main()
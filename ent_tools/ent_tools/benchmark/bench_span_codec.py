@@ -0,0 +1,70 @@
+import argparse
+import random
+import time
+
+from ent_tools.benchmark.synthetic_data import CHARS, ENT_TYPES
+from ent_tools.data_conversion.span_codec import (
+    SCHEMES, TagSet, decode_batch, decode_token_tags, encode_spans,
+)
+
+
+def gen_tagged_sentences(
+        n_sens: int,
+        scheme: str,
+        n_words: int = 30,
+        seed: int = 0,
+) -> tuple[list[list[str]], list[list[str]]]:
+    """Generate words of random sentences and their tags of random spans."""
+
+    rng = random.Random(seed)
+    words_batch = []
+    tags_batch = []
+    for _ in range(n_sens):
+        words = [''.join(rng.choice(CHARS) for _ in range(rng.randint(1, 4))) for _ in range(n_words)]
+        spans = []
+        i = 0
+        while i < n_words:
+            if rng.random() < 0.15:
+                end = min(i + rng.randint(1, 4), n_words)
+                spans.append((i, end, rng.choice(ENT_TYPES)))
+                i = end
+            else:
+                i += 1
+        words_batch.append(words)
+        tags_batch.append(encode_spans(n_words, spans, scheme=scheme))
+    return words_batch, tags_batch
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n_sens', type=int, default=50000)
+    parser.add_argument('--n_repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print('scheme\tmethod\tsec\tsentences/s')
+    for scheme in SCHEMES:
+        words_batch, tags_batch = gen_tagged_sentences(args.n_sens, scheme)
+        tagset = TagSet(ENT_TYPES, scheme=scheme)
+        ids_batch = [tagset.get_ids(tags) for tags in tags_batch]
+
+        expected = [decode_token_tags(words, tags) for words, tags in zip(words_batch, tags_batch)]
+        assert decode_batch(ids_batch, tagset, words_batch=words_batch) == expected
+
+        for method, run in (
+                ('decode_token_tags', lambda: [decode_token_tags(words, tags)
+                                               for words, tags in zip(words_batch, tags_batch)]),
+                ('decode_batch', lambda: decode_batch(ids_batch, tagset, words_batch=words_batch)),
+                ('get_ids+decode_batch', lambda: decode_batch(
+                    [tagset.get_ids(tags) for tags in tags_batch], tagset, words_batch=words_batch)),
+        ):
+            times = []
+            for _ in range(args.n_repeat):
+                t0 = time.perf_counter()
+                run()
+                times.append(time.perf_counter() - t0)
+            sec = min(times)
+            print(f'{scheme}\t{method}\t{sec:.3f}\t{args.n_sens/sec:.0f}')
+
+
+if __name__ == '__main__':
+    main()
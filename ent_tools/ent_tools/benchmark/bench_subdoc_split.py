@@ -0,0 +1,81 @@
+import argparse
+import os
+import tempfile
+import time
+
+import logzero
+from logzero import logger
+
+from ent_tools.benchmark.synthetic_data import gen_brat_subdoc_texts
+from ent_tools.data_conversion.brat_util import gen_doc_dict, gen_subdoc_dicts, get_subdoc_spans
+
+
+def split_per_subdoc(
+        txt_path: str,
+        ann_path: str,
+) -> list[dict]:
+    """Split the files by re-reading them for each subdocument."""
+
+    return [gen_doc_dict(txt_path, ann_path, subdoc_span=subdoc_span, assign_section_id=True)
+            for subdoc_span in get_subdoc_spans(txt_path)]
+
+
+def split_single_pass(
+        txt_path: str,
+        ann_path: str,
+) -> list[dict]:
+
+    return gen_subdoc_dicts(txt_path, ann_path, assign_section_id=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n_subdocs', type=int, default=100)
+    parser.add_argument('--per_subdoc_max', type=int, default=200)
+    parser.add_argument('--n_sens', type=int, default=10)
+    parser.add_argument('--n_repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    # per-file logs of gen_doc_dict would dominate the timing
+    logzero.loglevel(logzero.WARNING)
+
+    txt, ann = gen_brat_subdoc_texts(n_subdocs=args.n_subdocs, n_sens=args.n_sens)
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        txt_path = os.path.join(work_dir, 'synthetic.txt')
+        ann_path = os.path.join(work_dir, 'synthetic.ann')
+        with open(txt_path, 'w') as fw:
+            fw.write(txt)
+        with open(ann_path, 'w') as fw:
+            fw.write(ann)
+
+        expected = None
+        for method, split in (
+                ('per_subdoc', split_per_subdoc),
+                ('single_pass', split_single_pass),
+        ):
+            # the per-subdoc method rereads the files for each subdoc, i.e., takes quadratic time
+            if method == 'per_subdoc' and args.n_subdocs > args.per_subdoc_max:
+                logger.warning(f'Skip: {method} (n_subdocs > {args.per_subdoc_max})')
+                continue
+
+            logger.warning(f'Run: {method}')
+            times = []
+            for _ in range(args.n_repeat):
+                t0 = time.perf_counter()
+                doc_dicts = split(txt_path, ann_path)
+                times.append(time.perf_counter() - t0)
+
+            if expected is None:
+                expected = doc_dicts
+            assert doc_dicts == expected, f'Output of {method} differs'
+            results.append((method, min(times)))
+
+    print('method\tsec\tsubdocs/s')
+    for method, sec in results:
+        print(f'{method}\t{sec:.3f}\t{args.n_subdocs/sec:.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+import random
+
+from ent_tools.util.constants import (
+    COREF, COREF_ATTR, SENS, MENS, ENTS, SEC_ID, SEN_ID, MEN_IDS, MEM_MEN_IDS, ENT_ID, TXT, SPAN, ENT_TYPE,
+)
+
+
+CHARS = 'あいうえおかきくけこさしすせそたちつてとなにぬねの日本語文字列奈良京都大阪東京'
+ENT_TYPES = ['LOC_NAME', 'FAC_NAME', 'ORG_NAME', 'LOC_NOMINAL', 'FAC_NOMINAL']
+
+
+def gen_sentence_text(
+        rng: random.Random,
+        min_len: int = 20,
+        max_len: int = 60,
+) -> str:
+
+    length = rng.randint(min_len, max_len)
+    return ''.join(rng.choice(CHARS) for _ in range(length - 1)) + '。'
+
+
+def gen_doc_dict(
+        rng: random.Random,
+        n_sens: int = 30,
+        n_mens_per_sen: int = 2,
+        sens_per_sec: int = 5,
+) -> dict:
+    """Generate a random document in the processed JSON format."""
+
+    doc = {SENS: {}, MENS: {}, ENTS: {}}
+    men_id_num = 0
+    ent_ids = []
+
+    for i in range(n_sens):
+        sen_id = f'{i+1:03d}'
+        sec_id = f'{i // sens_per_sec + 1:03d}'
+        text = gen_sentence_text(rng)
+        men_ids = []
+
+        begin = 0
+        for _ in range(n_mens_per_sen):
+            if begin + 2 >= len(text):
+                break
+            begin = rng.randint(begin, len(text) - 2)
+            end = rng.randint(begin + 1, min(begin + 8, len(text) - 1))
+
+            men_id_num += 1
+            men_id = f'M{men_id_num:03d}'
+            if ent_ids and rng.random() < 0.3:
+                ent_id = rng.choice(ent_ids)
+            else:
+                ent_id = f'E{len(ent_ids)+1:03d}'
+                ent_ids.append(ent_id)
+                doc[ENTS][ent_id] = {MEM_MEN_IDS: []}
+
+            doc[MENS][men_id] = {
+                SEN_ID: sen_id,
+                SPAN: [begin, end],
+                TXT: text[begin:end],
+                ENT_TYPE: rng.choice(ENT_TYPES),
+                ENT_ID: ent_id,
+            }
+            doc[ENTS][ent_id][MEM_MEN_IDS].append(men_id)
+            men_ids.append(men_id)
+            begin = end
+
+        doc[SENS][sen_id] = {SEC_ID: sec_id, TXT: text, MEN_IDS: men_ids}
+
+    return doc
+
+
+def gen_corpus(
+        n_docs: int = 1000,
+        n_sens: int = 30,
+        n_mens_per_sen: int = 2,
+        seed: int = 0,
+) -> dict:
+
+    rng = random.Random(seed)
+    return {f'doc{i+1:06d}': gen_doc_dict(rng, n_sens=n_sens, n_mens_per_sen=n_mens_per_sen)
+            for i in range(n_docs)}
+
+
+def gen_brat_subdoc_texts(
+        n_subdocs: int = 1000,
+        n_sens: int = 10,
+        n_mens_per_sen: int = 2,
+        seed: int = 0,
+) -> tuple[str, str]:
+    """Generate the contents of a brat .txt file with <subdoc> blocks and its .ann file.
+
+    Mentions carry attributes and annotator notes, and are linked by undirected
+    coreference relations and directed relations within each subdocument.
+    """
+
+    rng = random.Random(seed)
+    txt_lines = []
+    ann_lines = []
+    offset = 0
+    n_tags = n_atts = n_notes = n_rels = n_corefs = 0
+
+    def add_line(line: str) -> int:
+        nonlocal offset
+        bol_idx = offset
+        txt_lines.append(line)
+        offset += len(line) + 1
+        return bol_idx
+
+    for i in range(n_subdocs):
+        add_line(f'<title>title {i+1}</title>')
+        add_line(f'<subdoc page_begin={i+1}>')
+
+        mids = []
+        for j in range(n_sens):
+            if j > 0 and j % 5 == 0:
+                add_line('')
+
+            text = gen_sentence_text(rng)
+            bol_idx = add_line(text)
+
+            begin = 0
+            for _ in range(n_mens_per_sen):
+                if begin + 2 >= len(text):
+                    break
+                begin = rng.randint(begin, len(text) - 2)
+                end = rng.randint(begin + 1, min(begin + 8, len(text) - 1))
+
+                n_tags += 1
+                mid = f'T{n_tags}'
+                mids.append(mid)
+                ann_lines.append(f'{mid}\t{rng.choice(ENT_TYPES)} {bol_idx+begin} {bol_idx+end}\t{text[begin:end]}')
+                if rng.random() < 0.2:
+                    n_atts += 1
+                    ann_lines.append(f'A{n_atts}\tGeneric {mid}')
+                if rng.random() < 0.1:
+                    n_notes += 1
+                    ann_lines.append(f'#{n_notes}\tAnnotatorNotes {mid}\tnote {n_notes}')
+                begin = end
+
+        for _ in range(len(mids) // 5):
+            n_corefs += 1
+            members = ' '.join(rng.sample(mids, 2))
+            ann_lines.append(f'*\t{COREF} {members}')
+        for _ in range(len(mids) // 10):
+            n_rels += 1
+            mid1, mid2 = rng.sample(mids, 2)
+            ann_lines.append(f'R{n_rels}\t{COREF_ATTR} Arg1:{mid1} Arg2:{mid2}')
+
+        add_line('</subdoc>')
+        add_line('')
+
+    return '\n'.join(txt_lines) + '\n', '\n'.join(ann_lines) + '\n'
@@ -0,0 +1,164 @@
+import argparse
+import importlib
+import shlex
+import sys
+import time
+from typing import Iterator
+
+from logzero import logger
+
+
+# subcommand -> module with main(); modules are imported only when their
+# subcommand is run, so that startup does not pay for unused dependencies
+SUBCOMMANDS = {
+    'brat-to-json'        : 'ent_tools.data_conversion.brat_ann_to_json',
+    'brat-to-json-resplit': 'ent_tools.data_conversion.ann_to_json_with_sentence_resplit',
+    'brat-pipeline'       : 'ent_tools.data_conversion.brat_pipeline',
+    'conll-to-json'       : 'ent_tools.data_conversion.ginza_conll_to_json',
+    'conll-to-ann'        : 'ent_tools.data_conversion.ginza_conll_to_ann',
+    'txt-to-tsv'          : 'ent_tools.data_conversion.txt_to_tsv_for_auto_ner',
+    'json-to-tsv'         : 'ent_tools.data_conversion.json_to_tsv',
+    'json-to-xml'         : 'ent_tools.data_conversion.json_to_xml',
+    'json-to-brat'        : 'ent_tools.data_conversion.json_to_brat',
+    'merge'               : 'ent_tools.data_conversion.merge_jsons_into_single_json',
+    'segment'             : 'ent_tools.data_conversion.sentence_segmenter',
+    'resegment'           : 'ent_tools.data_conversion.resegment_corpus',
+    'ene-bccwj-to-json'   : 'ent_tools.datasets.ene_bccwj.convert_xmls_to_json',
+    'eval-mr'             : 'ent_tools.evaluate.evaluate_mention_recognition',
+    'eval-ed'             : 'ent_tools.evaluate.evaluate_entity_disambiguation',
+    'eval-coref'          : 'ent_tools.evaluate.evaluate_coreference_resolution',
+    'index'               : 'ent_tools.util.indexed_corpus',
+    'mention-table'       : 'ent_tools.util.mention_table',
+    'check-xml'           : 'ent_tools.util.check_xml',
+    'validate'            : 'ent_tools.util.validate_corpus',
+}
+PROG = 'ent-tools'
+
+
+def run_subcommand(
+        name: str,
+        argv: list[str],
+) -> int:
+    """Run the main function of a subcommand with argv as its command line arguments.
+
+    Return the exit status: 0 on success and non-zero if the subcommand
+    exited with an error.
+    """
+
+    if not name in SUBCOMMANDS:
+        raise ValueError(f'Unknown subcommand: {name}')
+
+    module = importlib.import_module(SUBCOMMANDS[name])
+
+    sys_argv = sys.argv
+    sys.argv = [f'{PROG} {name}'] + argv
+    try:
+        module.main()
+    except SystemExit as e:
+        # raised by argparse and sys.exit in subcommands
+        if e.code is None:
+            return 0
+        return e.code if isinstance(e.code, int) else 1
+    finally:
+        sys.argv = sys_argv
+
+    return 0
+
+
+def read_batch_commands(
+        batch_path: str,
+) -> Iterator[list[str]]:
+    """Yield the arguments of each line in a batch file (or stdin if batch_path is '-').
+
+    Each line is `<subcommand> <arguments...>` quoted as in the shell;
+    empty lines and lines starting with # are skipped.
+    """
+
+    f = sys.stdin if batch_path == '-' else open(batch_path, encoding='utf-8')
+    try:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            yield shlex.split(line)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def run_batch(
+        batch_path: str,
+        keep_going: bool = True,
+) -> int:
+    """Run the commands of a batch file in the current process.
+
+    A failed command is reported and, if keep_going, the remaining commands
+    are still run. Return the number of failed commands.
+    """
+
+    n_done = 0
+    n_failed = 0
+    t0 = time.perf_counter()
+    for i, args in enumerate(read_batch_commands(batch_path)):
+        name, argv = args[0], args[1:]
+        try:
+            status = run_subcommand(name, argv)
+        except Exception as e:
+            logger.error(f'Command {i+1} failed: {shlex.join(args)}: {type(e).__name__}: {e}')
+            status = 1
+        else:
+            if status != 0:
+                logger.error(f'Command {i+1} exited with status {status}: {shlex.join(args)}')
+
+        n_done += 1
+        if status != 0:
+            n_failed += 1
+            if not keep_going:
+                break
+
+    logger.info(f'Ran {n_done} commands ({n_failed} failed) in {time.perf_counter()-t0:.1f} sec')
+    return n_failed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog=PROG,
+        usage=f'{PROG} [--batch PATH [--stop_on_error]] | {PROG} <subcommand> [args...]',
+        epilog='subcommands: ' + ', '.join(SUBCOMMANDS),
+    )
+    parser.add_argument(
+        '--batch', '-b',
+        type=str,
+        metavar='PATH',
+    )
+    parser.add_argument(
+        '--stop_on_error',
+        action='store_true',
+    )
+    parser.add_argument(
+        'subcommand',
+        nargs='?',
+        choices=SUBCOMMANDS,
+        metavar='subcommand',
+    )
+    parser.add_argument(
+        'args',
+        nargs=argparse.REMAINDER,
+    )
+    args = parser.parse_args()
+
+    if args.batch:
+        if args.subcommand:
+            parser.error('--batch cannot be used with a subcommand')
+        n_failed = run_batch(args.batch, keep_going=not args.stop_on_error)
+        sys.exit(1 if n_failed > 0 else 0)
+
+    if not args.subcommand:
+        parser.print_help()
+        sys.exit(2)
+
+    sys.exit(run_subcommand(args.subcommand, args.args))
+
+
+if __name__ == '__main__':
+    main()
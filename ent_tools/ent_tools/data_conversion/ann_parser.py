@@ -0,0 +1,180 @@
+from typing import Iterator, NamedTuple, TextIO, Tuple, Union
+
+from ent_tools.util.data_io import open_file
+
+
+class TextBound(NamedTuple):
+    """`T1<tab>LABEL 0 5;8 12<tab>text` (fragments are separated by ';')"""
+    id: str
+    label: str
+    fragments: Tuple[Tuple[int, int], ...]
+    text: str
+
+    @property
+    def begin(self) -> int:
+        return self.fragments[0][0]
+
+    @property
+    def end(self) -> int:
+        return self.fragments[-1][1]
+
+    @property
+    def is_discontinuous(self) -> bool:
+        return len(self.fragments) > 1
+
+
+class Attribute(NamedTuple):
+    """`A1<tab>NAME T1 VALUE` (value is True for binary attributes)"""
+    id: str
+    name: str
+    target: str
+    value: Union[str, bool]
+
+
+class Relation(NamedTuple):
+    """`R1<tab>LABEL Arg1:T1 Arg2:T2`"""
+    id: str
+    label: str
+    arg1: str
+    arg2: str
+
+
+class Equiv(NamedTuple):
+    """`*<tab>LABEL T1 T2 ...`"""
+    label: str
+    targets: Tuple[str, ...]
+
+
+class Note(NamedTuple):
+    """`#1<tab>AnnotatorNotes T1<tab>text`"""
+    id: str
+    label: str
+    target: str
+    text: str
+
+
+AnnRecord = Union[TextBound, Attribute, Relation, Equiv, Note]
+
+
+def _parse_text_bound(
+        fields: list[str],
+) -> TextBound:
+
+    label, _, offsets = fields[1].partition(' ')
+    if ';' in offsets:
+        fragments = []
+        for fragment in offsets.split(';'):
+            begin, end = fragment.split(' ')
+            fragments.append((int(begin), int(end)))
+        fragments = tuple(fragments)
+    else:
+        begin, end = offsets.split(' ')
+        fragments = ((int(begin), int(end)),)
+
+    text = fields[2] if len(fields) > 2 else ''
+    return TextBound(fields[0], label, fragments, text)
+
+
+def _parse_attribute(
+        fields: list[str],
+) -> Attribute:
+
+    args = fields[1].split(' ')
+    value = args[2] if len(args) > 2 else True
+    return Attribute(fields[0], args[0], args[1], value)
+
+
+def _parse_relation(
+        fields: list[str],
+) -> Relation:
+
+    label, arg1, arg2 = fields[1].split(' ')
+    return Relation(fields[0], label, arg1.partition(':')[2], arg2.partition(':')[2])
+
+
+def _parse_equiv(
+        fields: list[str],
+) -> Equiv:
+
+    args = fields[1].split(' ')
+    return Equiv(args[0], tuple(args[1:]))
+
+
+def _parse_note(
+        fields: list[str],
+) -> Note:
+
+    label, target = fields[1].split(' ')
+    return Note(fields[0], label, target, fields[2])
+
+
+# first character of a line -> (parser, number of tab-separated fields)
+# M is the legacy id prefix of attributes; other records (e.g., events and
+# normalizations) are skipped
+_PARSERS = {
+    'T': (_parse_text_bound, 3),
+    'A': (_parse_attribute, 2),
+    'M': (_parse_attribute, 2),
+    'R': (_parse_relation, 2),
+    '*': (_parse_equiv, 2),
+    '#': (_parse_note, 3),
+}
+
+
+def parse_ann_line(
+        line: str,
+) -> AnnRecord:
+    """Parse a line of a brat .ann file, or return None if it is not a supported record.
+
+    Raise ValueError if the line is malformed.
+    """
+
+    line = line.rstrip('\r\n')
+    if not line:
+        return None
+
+    parser = _PARSERS.get(line[0])
+    if parser is None:
+        return None
+
+    parse, n_fields = parser
+    fields = line.split('\t', n_fields - 1)
+    try:
+        return parse(fields)
+    except (IndexError, ValueError):
+        raise ValueError(f'Malformed annotation: {line}') from None
+
+
+def iter_ann_records(
+        input_ann: Union[str, TextIO],
+) -> Iterator[AnnRecord]:
+    """Yield the records of a brat .ann file (a path or a text stream) one by one.
+
+    Compressed files are decompressed on the fly by their suffixes.
+    """
+
+    if isinstance(input_ann, str):
+        with open_file(input_ann) as f:
+            yield from _iter_ann_records(f, input_ann)
+    else:
+        yield from _iter_ann_records(input_ann, getattr(input_ann, 'name', '<stream>'))
+
+
+def _iter_ann_records(
+        f: TextIO,
+        name: str,
+) -> Iterator[AnnRecord]:
+
+    # same as parse_ann_line, inlined as this loop is the bottleneck for large dumps
+    parsers = _PARSERS
+    for lineno, line in enumerate(f, 1):
+        if not line or not line[0] in parsers:
+            continue
+
+        parse, n_fields = parsers[line[0]]
+        line = line.rstrip('\r\n')
+        try:
+            record = parse(line.split('\t', n_fields - 1))
+        except (IndexError, ValueError):
+            raise ValueError(f'{name}:{lineno}: Malformed annotation: {line}') from None
+        yield record
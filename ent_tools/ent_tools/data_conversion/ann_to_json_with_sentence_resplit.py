@@ -1,352 +1,234 @@
 import argparse
-from typing import Tuple
-from io import TextIOWrapper
+from bisect import bisect_right
+from typing import Iterable, Tuple
 
 import logzero
 from logzero import logger
 
+from ent_tools.data_conversion.ann_parser import TextBound, iter_ann_records
+from ent_tools.data_conversion.brat_util import get_subdoc_spans_from_lines, iter_lines_with_offsets
 from ent_tools.util.constants import SENS, SEN_ID, TXT, MEN_IDS, MENS, SPAN, ENT_TYPE
 from ent_tools.util.data_io import write_as_json
-from ent_tools.data_conversion.util import merge_clusters_until_convergence
 
 
 SEN_SEPARATOR = '　　　　　'
+SUBDOC_BEGIN_MARKER = '<subdoc '
 
 
-def load_ann(
+def load_mentions(
         input_ann: str,
-        subdoc_span: Tuple[int] = None,
-        keep_coref_relations: bool = False,
         ignore_span_with_newline: bool = True,
-) -> Tuple:
+) -> list[Tuple[str, Tuple]]:
+    """Return (mid, (men_txt, men_label, begin, end)) of the mentions in the order of their spans.
 
-    mid2mention = {}  # mid (e.g. T1) -> men_txt, men_label, begin, end
-    mid2cidx = {}
-    dict_mid2att = {}
-    clusters = []
+    Mentions with multiple fragments are skipped if ignore_span_with_newline,
+    and are otherwise regarded as spanning from the first to the last fragment.
+    """
 
-    mid_exclude = set()
+    mentions = []
+    logger.info(f'Read: {input_ann}')
+    for record in iter_ann_records(input_ann):
+        if type(record) is not TextBound:
+            continue
 
-    with open(input_ann) as f:
-        if subdoc_span:
-            logger.info(f'Read: {input_ann} (for subdoc {subdoc_span})')
-        else:
-            logger.info(f'Read: {input_ann}')
-
-        for line in f:
-            line = line.strip('\n')
-            if line.startswith('T'):
-                array = line.split('\t')
-                men_id = array[0]  # entity MENTION id
-                array2 = array[1].split(' ')
-                men_label = array2[0]
-                men_begin = int(array2[1])
-                if ignore_span_with_newline:
-                    if ';' in array[1]:
-                        logger.warning(f'Skip a mention including newline char: {line}' )
-                        continue
-
-                men_end = int(array2[-1])
-                men_txt = array[2]
-
-                if (subdoc_span
-                    and (men_begin < subdoc_span[0] or subdoc_span[1] < men_end)
-                ):
-                    mid_exclude.add(men_id)
-                else:
-                    mid2mention[men_id] = (men_txt, men_label, men_begin, men_end)
-
-            elif line.startswith('A'):
-                array = line.split('\t')
-                att_info = array[1].split(' ')
-                att_name = att_info[0]
-                men_id = att_info[1]
-                att_label = att_info[2] if len(att_info) > 2 else True
-
-                if not att_name in dict_mid2att:
-                    dict_mid2att[att_name] = {}
-                mid2att = dict_mid2att[att_name]
-                mid2att[men_id] = att_label
-
-            elif line.startswith('*'):
-                array = line.split('\t')
-                coref_info = array[1].split(' ')
-                coref_name = coref_info[0]
-                if coref_name != COREF:
-                    continue
-
-                mids = [e for e in coref_info[1:]]
-                clusters.append(mids)
-                cidx = len(clusters) - 1
-                for men_id in mids:
-                    mid2cidx[men_id] = cidx
-
-            elif line.startswith('#'):
-                array = line.split('\t')
-                assert len(array) == 3
-                men_id = array[1].split(' ')[1]
-
-    # remove mid in mid_exclude
-    for mid_ex in mid_exclude:
-        for mid2att in dict_mid2att:
-            if mid_ex in mid2att:
-                del mid2att[mid_ex]
-
-        for mids in clusters:
-            if mid_ex in mids:
-                mids.remove(mid_ex)
-                if len(mids) == 0:
-                    clusters.remove(mids)
-
-    if keep_coref_relations:
-        return clusters, mid2mention, None, dict_mid2att
-
-    # merge clusters if there are clusters with common elements
-    clusters_new = merge_clusters_until_convergence(clusters)
-
-    # assign cidx to each singleton mention and add it to clusters_new
-    mids_already_added = set(sum([cls for cls in clusters_new], []))
-    for mid in mid2mention.keys():
-        if mid in mids_already_added:
+        if ignore_span_with_newline and record.is_discontinuous:
+            logger.warning(f'Skip a mention including newline char: '
+                           f'{record.id} {record.label} {record.fragments} {record.text}')
             continue
-        cidx = len(clusters_new)
-        mid2cidx[mid] = cidx
-        clusters_new.append([mid])
-    
-    mid2cidx_new = {}
-    for cidx, cls in enumerate(clusters_new):
-        # print('N', cidx, cls)
-        for mid in cls:
-            mid2cidx_new[mid] = cidx
 
-    # obtain elabel type of cluster
-    # cidx2labelinfo = get_entity_info_from_mentions(clusters_new, mid2mention)
+        mentions.append((record.id, (record.text, record.label, record.begin, record.end)))
 
-    return clusters_new, mid2mention, mid2cidx_new, dict_mid2att
+    mentions.sort(key=lambda x: (x[1][2], x[1][3]))
+    return mentions
 
 
-def get_subdoc_spans(
-        input_txt: str,
-) -> list:
+def is_blank_line(
+        line: str,
+) -> bool:
 
-    subdoc_spans = []
-    in_subdoc = False
-    dt_begin = sd_begin = sd_end = -1
+    return len(line.strip(' 　\n')) == 0
 
-    with open(input_txt) as f:
-        logger.info(f'Read: {input_txt}')
-        bol_idx = 0
-        for line in f:
-            eol_idx = bol_idx + len(line)
 
-            if not in_subdoc and line.startswith('<title>'):
-                dt_begin = bol_idx
+def get_sentences_by_line(
+        lines: Iterable[Tuple[int, str]],
+) -> list[Tuple[int, int, str]]:
+    """Return (begin offset, end offset, text) of the sentences, each of which is a non-empty line."""
 
-            if line.startswith('<subdoc '): # page_begin=* or fulldoc='True'
-                if dt_begin >= 0:
-                    sd_begin = dt_begin
-                    dt_begin = -1
-                else:
-                    sd_begin = bol_idx
-                in_subdoc = True
+    sentences = []
+    for bol_idx, line in lines:
+        sen_txt = line.strip('\n')
+        if sen_txt:
+            sentences.append((bol_idx, bol_idx + len(line), sen_txt))
+    return sentences
 
-            if line.startswith('</subdoc>'):
-                sd_end = eol_idx
-                in_subdoc = False
-                subdoc_spans.append((sd_begin, sd_end))
 
-            bol_idx = eol_idx
+def get_sentences_with_resplit(
+        lines: Iterable[Tuple[int, str]],
+) -> list[Tuple[int, int, str]]:
+    """Return (begin offset, end offset, text) of the sentences made by joining lines.
 
-    return subdoc_spans
+    A sentence continues until a blank line or a line starting with
+    SEN_SEPARATOR, and the newline chars between its lines are replaced by
+    spaces so that the offsets in the sentence match those in the file. The
+    end offset is that of the last line of the sentence including its newline.
+    """
 
+    sentences = []
+    sen_begin = sen_end = -1
+    sen_lines = []  # joined at the end of each sentence, to build it in linear time
 
-def gen_doc_dict(
-        input_txt: str,
-        input_ann: str,
-        att_keys: list = None,
-        subdoc_span: Tuple[int] = None,
+    def add_sentence():
+        # the last char is the newline of the last line
+        sen_txt = ''.join(sen_lines)[:-1]
+        assert len(sen_txt.strip(' ')) > 0
+        sentences.append((sen_begin, sen_end, sen_txt))
+
+    for bol_idx, line in lines:
+        if sen_lines and (line.startswith(SEN_SEPARATOR) or is_blank_line(line)):
+            add_sentence()
+            sen_lines = []
+
+        if is_blank_line(line):
+            continue
+
+        if not sen_lines:
+            sen_begin = bol_idx
+        sen_end = bol_idx + len(line)
+        sen_lines.append(f'{line[:-1]} ' if line.endswith('\n') else line)
+
+    if sen_lines:
+        add_sentence()
+
+    return sentences
+
+
+def gen_doc_dict_from_sentences(
+        sentences: list[Tuple[int, int, str]],
+        mentions: list[Tuple[str, Tuple]],
         sentence_resplit: bool = False,
 ) -> dict:
+    """Generate a document dict from the sentences and the mentions in the order of their spans.
+
+    Each mention is assigned to the sentence containing its begin offset. For
+    resplit sentences, every mention must be within a sentence; otherwise,
+    mentions out of sentences are dropped.
+    """
+
+    sen_begins = [sen_begin for sen_begin, _, _ in sentences]
+    sen_ids = [f'{i+1:03d}' for i in range(len(sentences))]
+    sen_dicts = [{TXT: sen_txt, MEN_IDS: []} for _, _, sen_txt in sentences]
+    doc_dict  = {SENS: dict(zip(sen_ids, sen_dicts)), MENS: {}}
+
+    for men_id, (men_txt, etype, begin, end) in mentions:
+        idx = bisect_right(sen_begins, begin) - 1
+        if sentence_resplit:
+            assert idx >= 0 and end < sentences[idx][1], f'Mention out of sentences: {men_id} {men_txt}'
+        elif idx < 0 or sentences[idx][1] <= begin:
+            continue
+
+        bol_idx, _, sen_txt = sentences[idx]
+        span_begin = begin - bol_idx
+        span_end = end - bol_idx
+
+        if sentence_resplit and sen_txt[span_begin:span_end] != men_txt:
+            logger.warning(f'mention string diff:"{sen_txt[span_begin:span_end]}" != "{men_txt}"')
+            assert sen_txt[span_begin:span_end].replace(' ', '').replace('　', '') == men_txt.replace(' ', '')
+
+        men_dict = {SEN_ID: sen_ids[idx],
+                    SPAN: (span_begin, span_end),
+                    ENT_TYPE: etype,
+                    TXT: men_txt,}
+        doc_dict[MENS][men_id] = men_dict
+        sen_dicts[idx][MEN_IDS].append(men_id)
+
+    return doc_dict
+
+
+def get_sentences(
+        lines: Iterable[Tuple[int, str]],
+        sentence_resplit: bool = False,
+) -> list[Tuple[int, int, str]]:
 
     if sentence_resplit:
-        return gen_doc_dict_with_sentence_resplit(
-            input_txt, input_ann, att_keys, subdoc_span)
+        return get_sentences_with_resplit(lines)
     else:
-        return gen_doc_dict_(input_txt, input_ann, att_keys, subdoc_span)
+        return get_sentences_by_line(lines)
 
 
-def gen_doc_dict_(
+def gen_doc_dict(
         input_txt: str,
         input_ann: str,
         att_keys: list = None,
         subdoc_span: Tuple[int] = None,
+        sentence_resplit: bool = False,
 ) -> dict:
 
-    doc_dict  = {SENS: {}, MENS: {}}
-
-    cluster_list, mid2mention, mid2clsidx, dict_mid2att = load_ann(
-        input_ann, subdoc_span=subdoc_span,
-        keep_coref_relations=True,
-        ignore_span_with_newline=True)
-
-    # generate output tsv rows
-    span_list = sorted(
-        mid2mention.items(), key=lambda x: (x[1][2], x[1][3])
-    )  # mention: (mid, (men_txt, men_label, men_begin, men_end))
-
-    clsidx2rows = {}
-
     with open(input_txt) as f:
         if subdoc_span:
             logger.info(f'Read: {input_txt} (for subdoc {subdoc_span})')
         else:
             logger.info(f'Read: {input_txt}')
 
-        span_list_idx = 0
-        sen_id_num = 0
-        bol_idx = 0
-        for line in f:
-            eol_idx = bol_idx + len(line)
-
-            sen_txt = line.strip('\n')
-            if not sen_txt:
-                bol_idx = eol_idx
-                continue
-
-            sen_id_num += 1
-            sen_id = f'{sen_id_num:03d}'
-            sen_dict = {TXT: sen_txt, MEN_IDS: []}
-            doc_dict[SENS][sen_id] = sen_dict
-
-            while span_list_idx < len(span_list):
-                men_id, mention = span_list[span_list_idx]
-                men_txt = mention[0]
-                etype   = mention[1]
-                begin   = mention[2]
-                end     = mention[3]
-
-                if bol_idx <= begin < eol_idx:
-                    span_begin = begin - bol_idx
-                    span_end = end - bol_idx
-
-                    men_dict = {SEN_ID: sen_id,
-                                SPAN: (span_begin, span_end),
-                                ENT_TYPE: etype,
-                                TXT: men_txt,}
-                    doc_dict[MENS][men_id] = men_dict
-                    sen_dict[MEN_IDS].append(men_id)
-
-                    span_list_idx += 1
-
-                else:
-                    break
+        lines = iter_lines_with_offsets(f)
+        if subdoc_span:
+            lines = ((bol_idx, line) for bol_idx, line in lines
+                     if subdoc_span[0] <= bol_idx and bol_idx + len(line) <= subdoc_span[1])
+        sentences = get_sentences(lines, sentence_resplit=sentence_resplit)
 
-            bol_idx = eol_idx
+    mentions = load_mentions(input_ann, ignore_span_with_newline=not sentence_resplit)
+    if subdoc_span:
+        mentions = [(mid, mention) for mid, mention in mentions
+                    if subdoc_span[0] <= mention[2] and mention[3] <= subdoc_span[1]]
 
-    return doc_dict
+    return gen_doc_dict_from_sentences(sentences, mentions, sentence_resplit=sentence_resplit)
 
 
-def gen_doc_dict_with_sentence_resplit(
+def gen_subdoc_dicts(
         input_txt: str,
         input_ann: str,
         att_keys: list = None,
-        subdoc_span: Tuple[int] = None,
-) -> dict:
-
-    doc_dict  = {SENS: {}, MENS: {}}
-
-    cluster_list, mid2mention, mid2clsidx, dict_mid2att = load_ann(
-        input_ann, subdoc_span=subdoc_span,
-        keep_coref_relations=True,
-        ignore_span_with_newline=False)
-
-    # generate output tsv rows
-    span_list = sorted(
-        mid2mention.items(), key=lambda x: (x[1][2], x[1][3])
-    )  # mention: (mid, (men_txt, men_label, men_begin, men_end))
+        sentence_resplit: bool = False,
+) -> list[dict]:
+    """Generate the document dicts of all subdocuments in a single pass over the files.
 
-    # clsidx2rows = {}
+    The result is the same as calling gen_doc_dict for each subdocument span,
+    but lines and mentions are routed to subdocuments by offsets.
+    """
 
     with open(input_txt) as f:
-        if subdoc_span:
-            logger.info(f'Read: {input_txt} (for subdoc {subdoc_span})')
-        else:
-            logger.info(f'Read: {input_txt}')
+        logger.info(f'Read: {input_txt}')
+        lines = list(iter_lines_with_offsets(f))
 
-        span_list_idx = 0
-        bol_idx = eol_idx = 0
-
-        sen_id_num = 1
-        sen_id = f'{sen_id_num:03d}'
-        sen_txt = ''
-        sen_dict = {TXT: None, MEN_IDS: []}
-
-        for line in f:
-            if (line.startswith(SEN_SEPARATOR) or
-                len(line.strip(' 　\n')) == 0
-            ):
-                if sen_txt:
-                    # split sentence here
-                    sen_dict[TXT] = sen_txt[:-1]
-                    assert len(sen_dict[TXT].strip(' ')) > 0
-                    doc_dict[SENS][sen_id] = sen_dict
-                    logger.debug(f'add sentence: id={sen_id} txt={sen_txt}')
-
-                    # reset sentence info
-                    sen_id_num += 1
-                    sen_id = f'{sen_id_num:03d}'
-                    sen_txt = ''
-                    sen_dict = {TXT: None, MEN_IDS: []}
-
-                bol_idx = eol_idx
-
-            eol_idx += len(line)
-            if len(line.strip(' 　\n')) == 0:
-                bol_idx = eol_idx
-                continue
-
-            sen_txt += line.replace('\n', ' ')
-            logger.debug(f'text segment: bol={bol_idx} eol={eol_idx} txt={sen_txt}')
-
-            while span_list_idx < len(span_list):
-                men_id, mention = span_list[span_list_idx]
-                men_txt = mention[0]
-                etype   = mention[1]
-                begin   = mention[2]
-                end     = mention[3]
-
-                if bol_idx <= begin and end < eol_idx:
-                    span_begin = begin - bol_idx
-                    span_end = end - bol_idx
-                    if sen_txt[span_begin:span_end] != men_txt:
-                        logger.warning(f'mention string diff:"{sen_txt[span_begin:span_end]}" != "{men_txt}"')
-                    assert sen_txt[span_begin:span_end].replace(' ', '').replace('　', '') == men_txt.replace(' ', '')
-
-                    men_dict = {SEN_ID: sen_id,
-                                SPAN: (span_begin, span_end),
-                                ENT_TYPE: etype,
-                                TXT: men_txt,}
-                    doc_dict[MENS][men_id] = men_dict
-                    sen_dict[MEN_IDS].append(men_id)
-                    logger.debug(f'add mention: id={men_id} txt={men_txt}')
-
-                    span_list_idx += 1
-
-                else:
-                    break
+    # unlike brat_util, a subdoc begins only at a `<subdoc ` line with attributes
+    subdoc_spans = get_subdoc_spans_from_lines(lines, begin_marker=SUBDOC_BEGIN_MARKER)
+    if not subdoc_spans:
+        return []
 
-        if sen_txt:
-            sen_dict[TXT] = sen_txt[:-1]
-            assert len(sen_dict[TXT].strip(' ')) > 0
-            doc_dict[SENS][sen_id] = sen_dict
-            logger.debug(f'add sentence: id={sen_id} txt={sen_txt}')
+    sd_begins = [sd_begin for sd_begin, _ in subdoc_spans]
 
-        assert len(doc_dict[MENS]) == len(span_list)
+    def get_subdoc_idx(begin: int, end: int) -> int:
+        # index of the subdoc that contains [begin, end), or -1
+        idx = bisect_right(sd_begins, begin) - 1
+        if idx >= 0 and end <= subdoc_spans[idx][1]:
+            return idx
+        return -1
 
-        sen_len_list = sorted([len(sen_dict[TXT]) for sen_dict in doc_dict[SENS].values()])
-        logger.debug(f'sentence lengths: {sen_len_list}')
+    sd_lines = [[] for _ in subdoc_spans]
+    for bol_idx, line in lines:
+        idx = get_subdoc_idx(bol_idx, bol_idx + len(line))
+        if idx >= 0:
+            sd_lines[idx].append((bol_idx, line))
 
-    return doc_dict
+    sd_mentions = [[] for _ in subdoc_spans]
+    for mid, mention in load_mentions(input_ann, ignore_span_with_newline=not sentence_resplit):
+        idx = get_subdoc_idx(mention[2], mention[3])
+        if idx >= 0:
+            sd_mentions[idx].append((mid, mention))
+
+    return [gen_doc_dict_from_sentences(
+                get_sentences(sd_lines[idx], sentence_resplit=sentence_resplit),
+                sd_mentions[idx], sentence_resplit=sentence_resplit)
+            for idx in range(len(subdoc_spans))]
 
 
 def main():
@@ -360,6 +242,7 @@ def main():
     parser.add_argument('--attributes')
     parser.add_argument('--split_by_subdoc', action='store_true')
     parser.add_argument('--sentence_resplit', action='store_true')
+    parser.add_argument('--compact_json', action='store_true')
     args = parser.parse_args()
 
     if args.output_json_name:
@@ -367,35 +250,30 @@ def main():
     else:
         name = args.input_txt.split('/')[-1].split('.txt')[0]
 
-    if args.split_by_subdoc:
-        subdoc_spans = get_subdoc_spans(args.input_txt)
-    else:
-        subdoc_spans = None
-
     if args.attributes:
         attributes = args.attributes.split(',')
     else:
         attributes = None
 
-    data = {}
-    output_json_path = f'{args.output_json_dir}/{name}.json'
-    with open(output_json_path, 'w', encoding='utf-8') as f_out_json:
-        if subdoc_spans:
-            for i, subdoc_span in enumerate(subdoc_spans):
-                doc_name = f'{name}-{i+1}'
-                doc_dict = gen_doc_dict(args.input_txt, args.input_ann,
+    if args.split_by_subdoc:
+        subdoc_dicts = gen_subdoc_dicts(args.input_txt, args.input_ann,
                                         att_keys=attributes,
-                                        subdoc_span=subdoc_span,
                                         sentence_resplit=args.sentence_resplit)
-                data[doc_name] = doc_dict
-        else:
-            doc_name = name
-            doc_dict = gen_doc_dict(args.input_txt, args.input_ann,
-                                    att_keys=attributes,
-                                    sentence_resplit=args.sentence_resplit)
-            data[doc_name] = doc_dict
+    else:
+        subdoc_dicts = None
 
-    write_as_json(data, output_json_path)
+    data = {}
+    if subdoc_dicts:
+        for i, doc_dict in enumerate(subdoc_dicts):
+            data[f'{name}-{i+1}'] = doc_dict
+    else:
+        # also for a file without subdocs under --split_by_subdoc
+        data[name] = gen_doc_dict(args.input_txt, args.input_ann,
+                                  att_keys=attributes,
+                                  sentence_resplit=args.sentence_resplit)
+
+    output_json_path = f'{args.output_json_dir}/{name}.json'
+    write_as_json(data, output_json_path, compact=args.compact_json)
 
 
 if __name__ == '__main__':
@@ -1,33 +1,250 @@
 import argparse
 import os
+import sys
+from typing import Iterator, Tuple
 
 import logzero
 from logzero import logger
 
 from ent_tools.data_conversion.atd_util import convert_json_for_atd
 from ent_tools.data_conversion.jel_util import convert_json_for_jel
-from ent_tools.data_conversion.brat_util import get_subdoc_spans, gen_doc_dict
+from ent_tools.data_conversion.brat_util import gen_doc_dict, gen_subdoc_dicts, iter_brat_files_in_dir
 from ent_tools.data_conversion.json_util import check_attributes, segment_sentence_in_doc_dict
+from ent_tools.util.conversion_cache import ConversionCache
 from ent_tools.util.data_io import load_jsonl, write_as_json
-
-import json                     # tmp
+from ent_tools.util.parallel import map_in_batches
 
 
 ATD = 'atd'
 JEL = 'jel'
 
 
+def convert_doc_dict(
+        doc_dict: dict,
+        name: str,
+        resegment_sentence: bool = False,
+        data_style: str = None,
+        kb_data: dict = None,
+) -> dict:
+
+    if data_style:
+        if data_style == ATD:
+            doc_dict = convert_json_for_atd(doc_dict)
+
+        elif data_style == JEL:
+            doc_dict = convert_json_for_jel(doc_dict, docid=name, kb_data=kb_data)
+
+    if resegment_sentence:
+        doc_dict = segment_sentence_in_doc_dict(doc_dict)
+
+    return doc_dict
+
+
+def convert_brat_files(
+        input_txt: str,
+        input_ann: str,
+        name: str,
+        attributes: list[str] = None,
+        coref_tag_name: str = None,
+        directed_coref_tag_name: str = None,
+        split_by_subdoc: bool = False,
+        resegment_sentence: bool = False,
+        unset_section_id: bool = False,
+        keep_discontinuous_mentions: bool = False,
+        data_style: str = None,
+        kb_data: dict = None,
+) -> Iterator[Tuple[str, dict]]:
+    """Yield (doc_id, doc) pairs converted from a pair of brat .txt and .ann files.
+
+    If split_by_subdoc, each subdocument enclosed by <subdoc ...> and
+    </subdoc> is yielded as a document named `{name}-{i}`, with the first
+    <doc ...> line of the file as its meta_info. Mentions with multiple fragments
+    are skipped unless keep_discontinuous_mentions, in which case their
+    fragments are kept as well as their overall spans.
+    """
+
+    if split_by_subdoc:
+        # all subdocuments are generated in a single pass over the files
+        subdoc_dicts = gen_subdoc_dicts(
+            input_txt, input_ann,
+            att_keys=attributes,
+            coref_tag_name=coref_tag_name,
+            directed_coref_tag_name=directed_coref_tag_name,
+            assign_section_id=not unset_section_id,
+            keep_discontinuous_mentions=keep_discontinuous_mentions,
+        )
+    else:
+        subdoc_dicts = None
+
+    if subdoc_dicts:
+        meta_text = None
+        with open(input_txt) as f:
+            for line in f:
+                if line.startswith('<doc'):
+                    meta_text = line.rstrip()
+                    break
+
+        for i, doc_dict in enumerate(subdoc_dicts):
+            doc_name = f'{name}-{i+1}'
+            doc_dict = convert_doc_dict(
+                doc_dict, name,
+                resegment_sentence=resegment_sentence,
+                data_style=data_style,
+                kb_data=kb_data,
+            )
+
+            if meta_text:
+                doc_dict['meta_info'] = {'text': meta_text}
+            check_attributes(doc_dict)
+            yield doc_name, doc_dict
+
+    else:
+        doc_name = name
+        doc_dict = gen_doc_dict(
+            input_txt, input_ann,
+            att_keys=attributes,
+            coref_tag_name=coref_tag_name,
+            directed_coref_tag_name=directed_coref_tag_name,
+            assign_section_id=not unset_section_id,
+            keep_discontinuous_mentions=keep_discontinuous_mentions,
+        )
+        doc_dict = convert_doc_dict(
+            doc_dict, name,
+            resegment_sentence=resegment_sentence,
+            data_style=data_style,
+            kb_data=kb_data,
+        )
+
+        check_attributes(doc_dict)
+        yield doc_name, doc_dict
+
+
+def convert_brat_files_to_json(
+        input_txt: str,
+        input_ann: str,
+        name: str,
+        output_json_dir: str,
+        compact: bool = False,
+        **kwargs,
+) -> str:
+
+    data = dict(convert_brat_files(input_txt, input_ann, name, **kwargs))
+    output_json_path = f'{output_json_dir}/{name}.json'
+    write_as_json(data, output_json_path, compact=compact)
+    return output_json_path
+
+
+# conversion options shared by all files converted in a worker process
+_worker_options = None
+
+
+def _init_worker(
+        options: dict,
+) -> None:
+
+    global _worker_options
+    _worker_options = dict(options)
+
+    # load the KB in each worker instead of sending it from the parent
+    kb_info_jsonl_path = _worker_options.pop('kb_info_jsonl_path', None)
+    if kb_info_jsonl_path:
+        _worker_options['kb_data'] = load_jsonl(kb_info_jsonl_path)
+
+
+def _convert_in_worker(
+        brat_file: Tuple[str, str, str],
+) -> str:
+
+    input_txt, input_ann, name = brat_file
+    return convert_brat_files_to_json(input_txt, input_ann, name, **_worker_options)
+
+
+def get_cache_input_paths(
+        input_txt: str,
+        input_ann: str,
+        options: dict,
+) -> list[str]:
+
+    input_paths = [input_txt, input_ann]
+    if options.get('kb_info_jsonl_path'):
+        input_paths.append(options['kb_info_jsonl_path'])
+    return input_paths
+
+
+def convert_brat_dir(
+        input_dir: str,
+        output_json_dir: str,
+        jobs: int = 1,
+        cache: ConversionCache = None,
+        **kwargs,
+) -> list[Tuple[str, str]]:
+    """Convert all pairs of brat files in input_dir into JSON files in output_json_dir.
+
+    Pairs are converted by `jobs` worker processes. A failure in a pair is
+    logged and does not stop the conversion of the others. Return the list of
+    (txt path, error message) for the failed pairs in the order of file names.
+
+    kwargs are the options of `convert_brat_files_to_json` except that the KB
+    is given by kb_info_jsonl_path. If cache is given, pairs whose files and
+    options have not changed since the previous conversion are skipped.
+    """
+
+    options = dict(kwargs, output_json_dir=output_json_dir)
+
+    brat_files = list(iter_brat_files_in_dir(input_dir))
+    if cache:
+        n_files = len(brat_files)
+        brat_files = [
+            (input_txt, input_ann, name) for input_txt, input_ann, name in brat_files
+            if not cache.is_valid(
+                    f'{output_json_dir}/{name}.json',
+                    get_cache_input_paths(input_txt, input_ann, options), options)
+        ]
+        logger.info(f'Skip {n_files-len(brat_files)} unchanged files')
+
+    if not brat_files:
+        return []
+
+    logger.info(f'Convert {len(brat_files)} files with {jobs} processes')
+    results = map_in_batches(
+        _convert_in_worker, brat_files, jobs=jobs,
+        initializer=_init_worker, initargs=(options,))
+
+    errors = []
+    try:
+        for (input_txt, input_ann, name), _, error in results:
+            output_json_path = f'{output_json_dir}/{name}.json'
+            if error:
+                logger.error(f'Failed to convert {input_txt}: {error}')
+                errors.append((input_txt, error))
+                if cache:
+                    cache.remove(output_json_path)
+
+            elif cache:
+                cache.update(
+                    output_json_path, get_cache_input_paths(input_txt, input_ann, options),
+                    options, output_paths=[output_json_path])
+    finally:
+        if cache:
+            cache.save()
+
+    logger.info(f'Converted {len(brat_files)-len(errors)} files ({len(errors)} failed)')
+    return errors
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument(
         '--input_txt', '-txt',
         type=str,
-        required=True,
     )
     parser.add_argument(
         '--input_ann', '-ann',
         type=str,
-        required=True,
+    )
+    parser.add_argument(
+        '--input_dir', '-i',
+        type=str,
     )
     parser.add_argument(
         '--output_json_dir', '-json_dir',
@@ -62,6 +279,10 @@ def main():
         '--unset_section_id',
         action='store_true',
     )
+    parser.add_argument(
+        '--keep_discontinuous_mentions',
+        action='store_true',
+    )
     parser.add_argument(
         '--data_style',
         type=str,
@@ -71,88 +292,77 @@ def main():
         '--kb_info_jsonl_path',
         type=str,
     )
+    parser.add_argument(
+        '--compact_json',
+        action='store_true',
+    )
+    parser.add_argument(
+        '--jobs', '-j',
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        '--cache_path',
+        type=str,
+    )
     args = parser.parse_args()
 
-    if args.output_json_name:
-        name = args.output_json_name
-    else:
-        name = os.path.basename(args.input_txt).split('.txt')[0]
-
-    if args.split_by_subdoc:
-        subdoc_spans = get_subdoc_spans(args.input_txt)
-    else:
-        subdoc_spans = None
+    if args.input_dir:
+        if args.input_txt or args.input_ann or args.output_json_name:
+            parser.error('-txt, -ann and -json_name cannot be used with --input_dir.')
+    elif not (args.input_txt and args.input_ann):
+        parser.error('Specify -txt and -ann, or --input_dir.')
 
     if args.attributes:
         attributes = args.attributes.split(',')
     else:
         attributes = None
 
-    if args.kb_info_jsonl_path:
-        kb_data = load_jsonl(args.kb_info_jsonl_path)
-    else:
-        kb_data = None
-
-    data = {}
-    output_json_path = f'{args.output_json_dir}/{name}.json'
-    if subdoc_spans:
-        meta_text = None
-        with open(args.input_txt) as f:
-            for line in f:
-                if line.startswith('<doc'):
-                    meta_text = line.rstrip()
-                    break
-
-        for i, subdoc_span in enumerate(subdoc_spans):
-            doc_name = f'{name}-{i+1}'
-            doc_dict = gen_doc_dict(
-                args.input_txt, args.input_ann,
-                att_keys=attributes,
-                subdoc_span=subdoc_span,
-                coref_tag_name=args.coref_tag_name,
-                directed_coref_tag_name=args.directed_coref_tag_name,
-                assign_section_id=not args.unset_section_id,
-            )
+    options = {
+        'compact': args.compact_json,
+        'attributes': attributes,
+        'coref_tag_name': args.coref_tag_name,
+        'directed_coref_tag_name': args.directed_coref_tag_name,
+        'split_by_subdoc': args.split_by_subdoc,
+        'resegment_sentence': args.resegment_sentence,
+        'unset_section_id': args.unset_section_id,
+        'keep_discontinuous_mentions': args.keep_discontinuous_mentions,
+        'data_style': args.data_style,
+        'kb_info_jsonl_path': args.kb_info_jsonl_path,
+    }
+    cache = ConversionCache(args.cache_path) if args.cache_path else None
 
-            if args.data_style:
-                if args.data_style == ATD:
-                    doc_dict = convert_json_for_atd(doc_dict)
-
-                elif args.data_style == JEL:
-                    doc_dict = convert_json_for_jel(doc_dict, docid=name, kb_data=kb_data)
-
-            if args.resegment_sentence:
-                doc_dict = segment_sentence_in_doc_dict(doc_dict)
-
-            if meta_text:
-                doc_dict['meta_info'] = {'text': meta_text}
-            check_attributes(doc_dict)
-            data[doc_name] = doc_dict
+    if args.input_dir:
+        # batch mode
+        jobs = args.jobs if args.jobs > 0 else os.cpu_count()
+        errors = convert_brat_dir(
+            args.input_dir, args.output_json_dir, jobs=jobs, cache=cache, **options)
+        if errors:
+            sys.exit(1)
 
     else:
-        doc_name = name
-        doc_dict = gen_doc_dict(
-            args.input_txt, args.input_ann,
-            att_keys=attributes,
-            coref_tag_name=args.coref_tag_name,
-            directed_coref_tag_name=args.directed_coref_tag_name,
-            assign_section_id=not args.unset_section_id,
-        )
-
-        if args.data_style:
-            if args.data_style == ATD:
-                doc_dict = convert_json_for_atd(doc_dict)
+        if args.output_json_name:
+            name = args.output_json_name
+        else:
+            name = os.path.basename(args.input_txt).split('.txt')[0]
 
-            elif args.data_style == JEL:
-                doc_dict = convert_json_for_jel(doc_dict, docid=name, kb_data=kb_data)
+        output_json_path = f'{args.output_json_dir}/{name}.json'
+        input_paths = get_cache_input_paths(args.input_txt, args.input_ann, options)
+        if cache and cache.is_valid(output_json_path, input_paths, options):
+            logger.info(f'Skip unchanged file: {args.input_txt}')
+            return
 
-        if args.resegment_sentence:
-            doc_dict = segment_sentence_in_doc_dict(doc_dict)
+        conversion_options = dict(options)
+        kb_info_jsonl_path = conversion_options.pop('kb_info_jsonl_path')
+        if kb_info_jsonl_path:
+            conversion_options['kb_data'] = load_jsonl(kb_info_jsonl_path)
 
-        check_attributes(doc_dict)
-        data[doc_name] = doc_dict
+        convert_brat_files_to_json(
+            args.input_txt, args.input_ann, name, args.output_json_dir, **conversion_options)
 
-    write_as_json(data, output_json_path)
+        if cache:
+            cache.update(output_json_path, input_paths, options, output_paths=[output_json_path])
+            cache.save()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,141 @@
+import argparse
+from typing import Iterator, Tuple
+
+from logzero import logger
+
+from ent_tools.data_conversion.brat_ann_to_json import ATD, JEL, convert_brat_files
+from ent_tools.data_conversion.brat_util import iter_brat_files_in_dir, iter_brat_files_in_manifest
+from ent_tools.data_conversion.merge_jsons_into_single_json import merge_docs
+from ent_tools.util.data_io import load_jsonl, load_target_ids
+
+
+def run_pipeline(
+        brat_files: Iterator[Tuple[str, str, str]],
+        output_path: str,
+        target_ids: set[str] = None,
+        compact: bool = False,
+        **kwargs,
+) -> int:
+    """Convert pairs of brat files and write the documents into a single corpus file.
+
+    Each document is passed through the conversion stages of
+    `brat_ann_to_json.convert_brat_files` (configured by kwargs) and written to
+    output_path as soon as it is converted, so that no intermediate file is
+    saved. Return the number of written documents.
+    """
+
+    def gen_docs():
+        for txt_path, ann_path, name in brat_files:
+            if target_ids and not name in target_ids:
+                continue
+
+            logger.info(f'Convert: {txt_path}')
+            for doc_id, doc in convert_brat_files(txt_path, ann_path, name, **kwargs):
+                yield doc_id, doc, txt_path
+
+    return merge_docs(gen_docs(), output_path, compact=compact)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--input_dir', '-i',
+        type=str,
+    )
+    parser.add_argument(
+        '--manifest_path', '-m',
+        type=str,
+    )
+    parser.add_argument(
+        '--output_path', '-o',
+        type=str,
+        required=True,
+    )
+    parser.add_argument(
+        '--target_ids_path', '-t',
+        type=str,
+    )
+    parser.add_argument(
+        '--coref_tag_name',
+        type=str,
+    )
+    parser.add_argument(
+        '--directed_coref_tag_name',
+        type=str,
+    )
+    parser.add_argument(
+        '--attributes',
+        type=str,
+    )
+    parser.add_argument(
+        '--split_by_subdoc',
+        action='store_true',
+    )
+    parser.add_argument(
+        '--resegment_sentence',
+        action='store_true',
+    )
+    parser.add_argument(
+        '--unset_section_id',
+        action='store_true',
+    )
+    parser.add_argument(
+        '--keep_discontinuous_mentions',
+        action='store_true',
+    )
+    parser.add_argument(
+        '--data_style',
+        type=str,
+        choices=(ATD, JEL),
+    )
+    parser.add_argument(
+        '--kb_info_jsonl_path',
+        type=str,
+    )
+    parser.add_argument(
+        '--compact_json',
+        action='store_true',
+    )
+    args = parser.parse_args()
+
+    if bool(args.input_dir) == bool(args.manifest_path):
+        parser.error('Specify either --input_dir or --manifest_path.')
+
+    if args.input_dir:
+        brat_files = iter_brat_files_in_dir(args.input_dir)
+    else:
+        brat_files = iter_brat_files_in_manifest(args.manifest_path)
+
+    if args.target_ids_path:
+        target_ids = load_target_ids(args.target_ids_path)
+    else:
+        target_ids = None
+
+    if args.attributes:
+        attributes = args.attributes.split(',')
+    else:
+        attributes = None
+
+    if args.kb_info_jsonl_path:
+        kb_data = load_jsonl(args.kb_info_jsonl_path)
+    else:
+        kb_data = None
+
+    run_pipeline(
+        brat_files, args.output_path,
+        target_ids=target_ids,
+        compact=args.compact_json,
+        attributes=attributes,
+        coref_tag_name=args.coref_tag_name,
+        directed_coref_tag_name=args.directed_coref_tag_name,
+        split_by_subdoc=args.split_by_subdoc,
+        resegment_sentence=args.resegment_sentence,
+        unset_section_id=args.unset_section_id,
+        keep_discontinuous_mentions=args.keep_discontinuous_mentions,
+        data_style=args.data_style,
+        kb_data=kb_data,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -1,106 +1,113 @@
-from typing import Tuple
+import os
+from bisect import bisect_right
+from typing import Iterable, Iterator, Tuple
 
 from logzero import logger
 
 from ent_tools.util.constants import (
-    SENS, MENS, ENTS, SEC_ID, SEN_ID, MEN_IDS, MEM_MEN_IDS, ENT_ID, TXT, SPAN, ENT_TYPE, COREF, COREF_ATTR, DIR_MEN_PAIRS, NOTES,
+    SENS, MENS, ENTS, SEC_ID, SEN_ID, MEN_IDS, MEM_MEN_IDS, ENT_ID, TXT, SPAN, FRAGMENTS, ENT_TYPE, COREF, COREF_ATTR, DIR_MEN_PAIRS, NOTES,
 )
+from ent_tools.data_conversion.ann_parser import Attribute, Equiv, Note, Relation, TextBound, iter_ann_records
+from ent_tools.util.cluster_builder import merge_clusters
 
 
-def merge_clusters_until_convergence(
-        clusters: list
-) -> list:
-
-    while True:
-        idx_sets_to_be_merged = _get_idx_sets_to_be_merged(clusters)
-        if not idx_sets_to_be_merged:
-            break
-        
-        clusters = _merge_clusters(clusters, idx_sets_to_be_merged)
-
-    return clusters
+def iter_lines_with_offsets(
+        f: Iterable[str],
+) -> Iterator[Tuple[int, str]]:
 
+    bol_idx = 0
+    for line in f:
+        yield bol_idx, line
+        bol_idx += len(line)
 
-def _get_idx_sets_to_be_merged(
-        clusters: list[list],
-) -> list[set]:
-
-    to_be_merged = []
-    for i, cls1 in enumerate(clusters):
-        for j, cls2 in enumerate(clusters):
-            if i < j:
-                if set(cls1) & set(cls2):
-                    flag_add = False
-                    for idx_set in to_be_merged:
-                        if i in idx_set:
-                            idx_set.add(j)
-                            flag_add = True
-                            break
 
-                        elif j in idx_set:
-                            idx_set.add(i)
-                            flag_add = True
-                            break
+def get_subdoc_spans_from_lines(
+        lines: Iterable[Tuple[int, str]],
+        begin_marker: str = '<subdoc',
+) -> list:
 
-                    if not flag_add:
-                        to_be_merged.append(set([i, j]))
+    subdoc_spans = []
+    in_subdoc = False
+    dt_begin = sd_begin = sd_end = -1
 
-    return to_be_merged
+    for bol_idx, line in lines:
+        eol_idx = bol_idx + len(line)
 
+        if (not in_subdoc) and line.startswith('<title>'):
+            dt_begin = bol_idx
 
-def _merge_clusters(
-        clusters: list[list],
-        idx_set_to_be_merged: list[set],
-) -> list[list]:
+        if line.startswith(begin_marker): # page_begin=* or fulldoc='True'
+            if dt_begin >= 0:
+                sd_begin = dt_begin
+                dt_begin = -1
+            else:
+                sd_begin = bol_idx
 
-    new_clusters = []
-    idx_used = set()
-    for idx_set in idx_set_to_be_merged:
-        new_set = list(set(sum([clusters[idx] for idx in idx_set], [])))
-        idx_used |= idx_set
-        new_clusters.append(new_set)
+            in_subdoc = True
 
-    for idx, cls in enumerate(clusters):
-        if not idx in idx_used:
-            new_clusters.append(cls)
+        if line.startswith('</subdoc>'):
+            sd_end = eol_idx
+            in_subdoc = False
+            subdoc_spans.append((sd_begin, sd_end))
 
-    return new_clusters
+    return subdoc_spans
 
 
 def get_subdoc_spans(
         input_txt: str,
 ) -> list:
 
-    subdoc_spans = []
-    in_subdoc = False
-    dt_begin = sd_begin = sd_end = -1
-
     with open(input_txt) as f:
         logger.info(f'Read: {input_txt}')
-        bol_idx = 0
-        for line in f:
-            eol_idx = bol_idx + len(line)
+        return get_subdoc_spans_from_lines(iter_lines_with_offsets(f))
 
-            if (not in_subdoc) and line.startswith('<title>'):
-                dt_begin = bol_idx
 
-            if line.startswith('<subdoc'): # page_begin=* or fulldoc='True'
-                if dt_begin >= 0:
-                    sd_begin = dt_begin
-                    dt_begin = -1
-                else:
-                    sd_begin = bol_idx
+def iter_brat_files_in_dir(
+        input_dir: str,
+) -> Iterator[Tuple[str, str, str]]:
+    """Yield (txt path, ann path, name) for the non-empty .txt files in input_dir."""
 
-                in_subdoc = True
+    for file_name in sorted(os.listdir(input_dir)):
+        if not file_name.endswith('.txt'):
+            continue
 
-            if line.startswith('</subdoc>'):
-                sd_end = eol_idx
-                in_subdoc = False
-                subdoc_spans.append((sd_begin, sd_end))
+        txt_path = os.path.join(input_dir, file_name)
+        if os.path.getsize(txt_path) == 0:
+            logger.info(f'Skip: empty file {txt_path}')
+            continue
 
-            bol_idx = eol_idx
+        name = file_name[:-len('.txt')]
+        ann_path = os.path.join(input_dir, f'{name}.ann')
+        if not os.path.isfile(ann_path):
+            logger.warning(f'Skip: no ann file for {txt_path}')
+            continue
 
-    return subdoc_spans
+        yield txt_path, ann_path, name
+
+
+def iter_brat_files_in_manifest(
+        manifest_path: str,
+) -> Iterator[Tuple[str, str, str]]:
+    """Yield (txt path, ann path, name) listed in a manifest file.
+
+    Each line of the manifest is `<txt path>\\t<ann path>[\\t<name>]`. If name
+    is omitted, the base name of the txt file is used.
+    """
+
+    with open(manifest_path) as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line or line.startswith('#'):
+                continue
+
+            array = line.split('\t')
+            txt_path, ann_path = array[0], array[1]
+            if len(array) > 2:
+                name = array[2]
+            else:
+                name = os.path.basename(txt_path).split('.txt')[0]
+
+            yield txt_path, ann_path, name
 
 
 def load_ann(
@@ -112,98 +119,115 @@ def load_ann(
         directed_coref_tag_name: str = None,
 ) -> Tuple:
 
+    clusters, mid2mention, mid_exclude, directed_rels, dict_mid2att, mid2notes = _read_ann(
+        input_ann, subdoc_span=subdoc_span,
+        ignore_span_with_newline=ignore_span_with_newline,
+        coref_tag_name=coref_tag_name,
+        directed_coref_tag_name=directed_coref_tag_name,
+    )
+
+    return _get_ann_info(
+        clusters, mid2mention, directed_rels, dict_mid2att, mid2notes,
+        mid_exclude=mid_exclude,
+        keep_coref_relations=keep_coref_relations,
+    )
+
+
+def _read_ann(
+        input_ann: str,
+        subdoc_span: Tuple[int] = None,
+        ignore_span_with_newline: bool = True,
+        coref_tag_name: str = None,
+        directed_coref_tag_name: str = None,
+) -> Tuple:
+
     if coref_tag_name == None:
         coref_tag_name = COREF
     if directed_coref_tag_name == None:
         directed_coref_tag_name = COREF_ATTR
 
     clusters = []
-    mid2mention = {}  # mid (e.g. T1) -> men_txt, men_label, begin, end
+    mid2mention = {}  # mid (e.g. T1) -> men_txt, men_label, begin, end[, fragments]
     mid2notes = {}
     dict_mid2att = {}
     directed_rels = set()
     mid_exclude = set()
 
-    with open(input_ann) as f:
-        if subdoc_span:
-            logger.info(f'Read: {input_ann} (for subdoc {subdoc_span})')
-        else:
-            logger.info(f'Read: {input_ann}')
+    if subdoc_span:
+        logger.info(f'Read: {input_ann} (for subdoc {subdoc_span})')
+    else:
+        logger.info(f'Read: {input_ann}')
+
+    for record in iter_ann_records(input_ann):
+        record_type = type(record)
+        if record_type is TextBound: # mention
+            men_id = record.id
+            fragments = record.fragments
+            men_begin = fragments[0][0]
+            men_end = fragments[-1][1]
+            is_discontinuous = len(fragments) > 1
+
+            if is_discontinuous and ignore_span_with_newline:
+                logger.warning(f'Skip a discontinuous mention (e.g., including newline char): '
+                               f'{men_id} {record.label} {record.fragments} {record.text}')
+                mid_exclude.add(men_id)
+
+            elif (subdoc_span
+                  and (men_begin < subdoc_span[0] or subdoc_span[1] < men_end)
+            ):
+                mid_exclude.add(men_id)
 
-        for line in f:
-            line = line.strip('\n')
-            if line.startswith('T'): # mention
-                array = line.split('\t')
-                men_id = array[0]
-                array2 = array[1].split(' ')
-                men_label = array2[0]
-                men_begin = int(array2[1])
-                if ignore_span_with_newline:
-                    if ';' in array[1]:
-                        logger.warning(f'Skip a mention including newline char: {line}' )
-                        continue
-
-                men_end = int(array2[-1])
-                men_txt = array[2]
-
-                if (subdoc_span
-                    and (men_begin < subdoc_span[0] or subdoc_span[1] < men_end)
-                ):
-                    mid_exclude.add(men_id)
-                else:
-                    mid2mention[men_id] = (men_txt, men_label, men_begin, men_end)
-
-            elif line.startswith('A'): # attribute tag
-                array = line.split('\t')
-                att_info = array[1].split(' ')
-                att_name = att_info[0]
-                men_id = att_info[1]
-                att_label = att_info[2] if len(att_info) > 2 else True
-
-                if not att_name in dict_mid2att:
-                    dict_mid2att[att_name] = {}
-                mid2att = dict_mid2att[att_name]
-                assert not men_id in mid2att
-                mid2att[men_id] = att_label
-
-            elif line.startswith('*'): # undirected relation
-                array = line.split('\t')
-                coref_info = array[1].split(' ')
-                coref_name = coref_info[0]
-                if coref_name != coref_tag_name:
-                    continue
-
-                mids = [e for e in coref_info[1:]]
-                clusters.append(mids)
-                cidx = len(clusters) - 1
-
-            elif line.startswith('R'): # directed relation
-                array    = line.split('\t')
-                rel_info = array[1].split(' ')
-                rel_name = rel_info[0]
-                men_id1	 = rel_info[1].split(':')[1]
-                men_id2	 = rel_info[2].split(':')[1]
-                directed_rels.add((rel_name, men_id1, men_id2))
-
-                if rel_name == directed_coref_tag_name:
-                    clusters.append([men_id1, men_id2])
-
-            elif line.startswith('#'): # AnnotatorNotes
-                array = line.split('\t')
-                assert len(array) == 3
-                men_id = array[1].split(' ')[1]
-                notes  = array[2]
-                mid2notes[men_id] = notes
+            elif is_discontinuous:
+                mid2mention[men_id] = (record.text, record.label, men_begin, men_end, fragments)
+
+            else:
+                mid2mention[men_id] = (record.text, record.label, men_begin, men_end)
+
+        elif record_type is Attribute: # attribute tag
+            if not record.name in dict_mid2att:
+                dict_mid2att[record.name] = {}
+            mid2att = dict_mid2att[record.name]
+            assert not record.target in mid2att
+            mid2att[record.target] = record.value
+
+        elif record_type is Equiv: # undirected relation
+            if record.label != coref_tag_name:
+                continue
+
+            clusters.append(list(record.targets))
+
+        elif record_type is Relation: # directed relation
+            directed_rels.add((record.label, record.arg1, record.arg2))
+
+            if record.label == directed_coref_tag_name:
+                clusters.append([record.arg1, record.arg2])
+
+        elif record_type is Note: # AnnotatorNotes
+            mid2notes[record.target] = record.text
+
+    return clusters, mid2mention, mid_exclude, directed_rels, dict_mid2att, mid2notes
+
+
+def _get_ann_info(
+        clusters: list[list],
+        mid2mention: dict,
+        directed_rels: set,
+        dict_mid2att: dict,
+        mid2notes: dict,
+        mid_exclude: set = None,
+        keep_coref_relations: bool = False,
+) -> Tuple:
+
+    if mid_exclude is None:
+        mid_exclude = set()
 
     # remove mid in mid_exclude
-    for mid_ex in mid_exclude:
-        for mid2att in dict_mid2att:
-            if mid_ex in mid2att:
+    if mid_exclude:
+        for mid2att in dict_mid2att.values():
+            for mid_ex in mid_exclude & mid2att.keys():
                 del mid2att[mid_ex]
 
-        for i, mids in enumerate(clusters):
-            if mid_ex in mids:
-                mids.remove(mid_ex)
+        clusters = [[mid for mid in mids if not mid in mid_exclude] for mids in clusters]
 
     clusters_new = []
     for mids in clusters:
@@ -214,10 +238,10 @@ def load_ann(
         return clusters_new, mid2mention, None, None, dict_mid2att, mid2notes
 
     # merge clusters if there are clusters with common elements
-    clusters_new = merge_clusters_until_convergence(clusters_new)
+    clusters_new = merge_clusters(clusters_new)
 
     # assign cidx to each singleton mention and add it to clusters_new
-    mids_already_added = set(sum([cls for cls in clusters_new], []))
+    mids_already_added = {mid for cls in clusters_new for mid in cls}
     for mid in mid2mention.keys():
         if (mid in mids_already_added
             or mid in mid_exclude
@@ -237,24 +261,40 @@ def load_ann(
     return clusters_new, mid2mention, mid2cidx, directed_rels, dict_mid2att, mid2notes
 
 
-def gen_doc_dict(
-        input_txt: str,
-        input_ann: str,
-        att_keys: list = None,
-        subdoc_span: Tuple[int] = None,
-        coref_tag_name: str = None,
-        directed_coref_tag_name: str = None,
+def _exclude_mentions_across_lines(
+        mid2mention: dict,
+        mid_exclude: set,
+        lines: list[Tuple[int, str]],
+) -> None:
+    """Move discontinuous mentions whose fragments are not within a single line to mid_exclude.
+
+    Such mentions cannot be assigned to a sentence (e.g., a mention broken by a newline).
+    """
+
+    line_begins = [bol_idx for bol_idx, _ in lines]
+    for mid, mention in list(mid2mention.items()):
+        if len(mention) <= 4:
+            continue
+
+        idx = bisect_right(line_begins, mention[2]) - 1
+        bol_idx, line = lines[idx] if idx >= 0 else (0, '')
+        if mention[3] > bol_idx + len(line.rstrip('\n')):
+            logger.warning(f'Skip a discontinuous mention across lines: '
+                           f'{mid} {mention[1]} {mention[4]} {mention[0]}')
+            del mid2mention[mid]
+            mid_exclude.add(mid)
+
+
+def _gen_doc_dict_from_lines(
+        lines: Iterable[Tuple[int, str]],
+        ann_info: Tuple,
         assign_section_id: bool = False,
 ) -> dict:
+    """Generate a document dict from (offset, line) pairs of the text and the result of load_ann."""
 
     doc_dict  = {SENS: {}, MENS: {}, ENTS: {}}
 
-    cluster_list, mid2mention, mid2clsidx, directed_rels, dict_mid2att, mid2notes = load_ann(
-        input_ann, subdoc_span=subdoc_span,
-        ignore_span_with_newline=True,
-        coref_tag_name=coref_tag_name,
-        directed_coref_tag_name=directed_coref_tag_name,
-    )
+    cluster_list, mid2mention, mid2clsidx, directed_rels, dict_mid2att, mid2notes = ann_info
 
     use_coref = len(cluster_list) > 0
 
@@ -267,105 +307,92 @@ def gen_doc_dict(
     clsidx2entid = {}
     menid_old2new = {}
 
-    with open(input_txt) as f:
-        if subdoc_span:
-            logger.info(f'Read: {input_txt} (for subdoc {subdoc_span})')
-        else:
-            logger.info(f'Read: {input_txt}')
+    span_list_idx = 0
+    sec_id_num = 1
+    sen_id_num = 0
+    ent_id_num = 1
+    flag_cont_empty = False
 
-        span_list_idx = 0
-        sec_id_num = 1
-        sen_id_num = 0
-        ent_id_num = 1
-        flag_cont_empty = False
-        bol_idx = 0
+    for bol_idx, line in lines:
+        eol_idx = bol_idx + len(line)
 
-        for line in f:
-            eol_idx = bol_idx + len(line)
-
-            if (subdoc_span
-                and (bol_idx < subdoc_span[0]
-                     or eol_idx > subdoc_span[1]
-                )
+        sen_txt = line.strip('\n')
+        if not sen_txt:
+            if (assign_section_id
+                and sen_id_num > 0
+                and not flag_cont_empty
             ):
-                bol_idx = eol_idx
-                continue
+                sec_id_num += 1
 
-            sen_txt = line.strip('\n')
-            if not sen_txt:
-                bol_idx = eol_idx
-
-                if (assign_section_id
-                    and sen_id_num > 0
-                    and not flag_cont_empty
-                ):
-                    sec_id_num += 1
+            flag_cont_empty = True
+            continue
 
-                flag_cont_empty = True
-                continue
+        flag_cont_empty = False
 
-            flag_cont_empty = False
+        sen_id_num += 1
+        sen_id = f'{sen_id_num:03d}'
+        if assign_section_id:
+            sec_id = f'{sec_id_num:03d}'
+            sen_dict = {SEC_ID: sec_id, TXT: sen_txt, MEN_IDS: []}
+        else:
+            sen_dict = {TXT: sen_txt, MEN_IDS: []}
+
+        men_ids_new = []
+        doc_dict[SENS][sen_id] = sen_dict
+
+        while span_list_idx < len(span_list):
+            men_id_old, mention = span_list[span_list_idx]
+            men_id_new = f'M{span_list_idx+1:03d}'
+            menid_old2new[men_id_old] = men_id_new
+            men_txt = mention[0]
+            etype   = mention[1]
+            begin   = mention[2]
+            end     = mention[3]
+
+            if bol_idx <= begin < eol_idx:
+                span_begin = begin - bol_idx
+                span_end = end - bol_idx
+
+                men_dict = {SEN_ID: sen_id,
+                            SPAN: (span_begin, span_end),
+                            TXT: men_txt,
+                            ENT_TYPE: etype,
+                }
+
+                if len(mention) > 4:
+                    # discontinuous mention; fragments may go beyond the sentence
+                    men_dict[FRAGMENTS] = [
+                        (frag_begin - bol_idx, frag_end - bol_idx) for frag_begin, frag_end in mention[4]]
+
+                for key, mid2att in dict_mid2att.items():
+                    if men_id_old in mid2att:
+                        men_dict[key] = mid2att[men_id_old]
+
+                if men_id_old in mid2notes:
+                    notes = mid2notes[men_id_old]
+                    men_dict[NOTES] = notes
+
+                if men_id_old in mid2clsidx:
+                    clsidx = mid2clsidx[men_id_old]
+                    # ent_id = f'E{clsidx+1:03d}'
+                    if clsidx in clsidx2entid:
+                        ent_id = clsidx2entid[clsidx]
+                    else:
+                        ent_id = f'E{ent_id_num:03d}'
+                        clsidx2entid[clsidx] = ent_id
+                        ent_id_num += 1
+
+                    men_dict[ENT_ID] = ent_id
+
+                doc_dict[MENS][men_id_new] = men_dict
+                men_ids_new.append(men_id_new)
+
+                span_list_idx += 1
 
-            sen_id_num += 1
-            sen_id = f'{sen_id_num:03d}'
-            if assign_section_id:
-                sec_id = f'{sec_id_num:03d}'
-                sen_dict = {SEC_ID: sec_id, TXT: sen_txt, MEN_IDS: []}
             else:
-                sen_dict = {TXT: sen_txt, MEN_IDS: []}
-
-            men_ids_new = []
-            doc_dict[SENS][sen_id] = sen_dict
-
-            while span_list_idx < len(span_list):
-                men_id_old, mention = span_list[span_list_idx]
-                men_id_new = f'M{span_list_idx+1:03d}'
-                menid_old2new[men_id_old] = men_id_new
-                men_txt = mention[0]
-                etype   = mention[1]
-                begin   = mention[2]
-                end     = mention[3]
-
-                if bol_idx <= begin < eol_idx:
-                    span_begin = begin - bol_idx
-                    span_end = end - bol_idx
-
-                    men_dict = {SEN_ID: sen_id,
-                                SPAN: (span_begin, span_end),
-                                TXT: men_txt,
-                                ENT_TYPE: etype,
-                    }
-
-                    for key, mid2att in dict_mid2att.items():
-                        if men_id_old in mid2att:
-                            men_dict[key] = mid2att[men_id_old]
-
-                    if men_id_old in mid2notes:
-                        notes = mid2notes[men_id_old]
-                        men_dict[NOTES] = notes
+                break
 
-                    if men_id_old in mid2clsidx:
-                        clsidx = mid2clsidx[men_id_old]
-                        # ent_id = f'E{clsidx+1:03d}'
-                        if clsidx in clsidx2entid:
-                            ent_id = clsidx2entid[clsidx]
-                        else:
-                            ent_id = f'E{ent_id_num:03d}'
-                            clsidx2entid[clsidx] = ent_id
-                            ent_id_num += 1
-
-                        men_dict[ENT_ID] = ent_id
-
-                    doc_dict[MENS][men_id_new] = men_dict
-                    men_ids_new.append(men_id_new)
-
-                    span_list_idx += 1
-
-                else:
-                    break
-
-            bol_idx = eol_idx
-            sen_dict[MEN_IDS] = men_ids_new
+        sen_dict[MEN_IDS] = men_ids_new
 
     men1_to_dir_pair_strs = {}
     if directed_rels:
@@ -399,3 +426,123 @@ def gen_doc_dict(
         doc_dict[ENTS][ent_id] = ent_dict
 
     return doc_dict
+
+
+def gen_doc_dict(
+        input_txt: str,
+        input_ann: str,
+        att_keys: list = None,
+        subdoc_span: Tuple[int] = None,
+        coref_tag_name: str = None,
+        directed_coref_tag_name: str = None,
+        assign_section_id: bool = False,
+        keep_discontinuous_mentions: bool = False,
+) -> dict:
+
+    with open(input_txt) as f:
+        if subdoc_span:
+            logger.info(f'Read: {input_txt} (for subdoc {subdoc_span})')
+        else:
+            logger.info(f'Read: {input_txt}')
+
+        lines = iter_lines_with_offsets(f)
+        if subdoc_span:
+            lines = ((bol_idx, line) for bol_idx, line in lines
+                     if subdoc_span[0] <= bol_idx and bol_idx + len(line) <= subdoc_span[1])
+        lines = list(lines)
+
+    clusters, mid2mention, mid_exclude, directed_rels, dict_mid2att, mid2notes = _read_ann(
+        input_ann, subdoc_span=subdoc_span,
+        ignore_span_with_newline=not keep_discontinuous_mentions,
+        coref_tag_name=coref_tag_name,
+        directed_coref_tag_name=directed_coref_tag_name,
+    )
+    if keep_discontinuous_mentions:
+        _exclude_mentions_across_lines(mid2mention, mid_exclude, lines)
+
+    ann_info = _get_ann_info(
+        clusters, mid2mention, directed_rels, dict_mid2att, mid2notes, mid_exclude=mid_exclude)
+
+    return _gen_doc_dict_from_lines(lines, ann_info, assign_section_id=assign_section_id)
+
+
+def gen_subdoc_dicts(
+        input_txt: str,
+        input_ann: str,
+        att_keys: list = None,
+        coref_tag_name: str = None,
+        directed_coref_tag_name: str = None,
+        assign_section_id: bool = False,
+        keep_discontinuous_mentions: bool = False,
+) -> list[dict]:
+    """Generate the document dicts of all subdocuments in a single pass over the files.
+
+    The result is the same as calling gen_doc_dict for each span of
+    get_subdoc_spans, but the .txt and .ann files are read only once and their
+    lines and mentions are routed to subdocuments by offsets.
+    """
+
+    with open(input_txt) as f:
+        logger.info(f'Read: {input_txt}')
+        lines = list(iter_lines_with_offsets(f))
+
+    subdoc_spans = get_subdoc_spans_from_lines(lines)
+    if not subdoc_spans:
+        return []
+
+    sd_begins = [sd_begin for sd_begin, _ in subdoc_spans]
+
+    def get_subdoc_idx(begin: int, end: int) -> int:
+        # index of the subdoc that contains [begin, end), or -1
+        idx = bisect_right(sd_begins, begin) - 1
+        if idx >= 0 and end <= subdoc_spans[idx][1]:
+            return idx
+        return -1
+
+    sd_lines = [[] for _ in subdoc_spans]
+    for bol_idx, line in lines:
+        idx = get_subdoc_idx(bol_idx, bol_idx + len(line))
+        if idx >= 0:
+            sd_lines[idx].append((bol_idx, line))
+
+    clusters, mid2mention, _, directed_rels, dict_mid2att, mid2notes = _read_ann(
+        input_ann,
+        ignore_span_with_newline=not keep_discontinuous_mentions,
+        coref_tag_name=coref_tag_name,
+        directed_coref_tag_name=directed_coref_tag_name,
+    )
+    if keep_discontinuous_mentions:
+        _exclude_mentions_across_lines(mid2mention, set(), lines)
+
+    # mentions not contained in any subdoc are excluded as in load_ann
+    sd_mid2mention = [{} for _ in subdoc_spans]
+    mid2sd = {}
+    for mid, mention in mid2mention.items():
+        idx = get_subdoc_idx(mention[2], mention[3])
+        if idx >= 0:
+            sd_mid2mention[idx][mid] = mention
+            mid2sd[mid] = idx
+
+    sd_clusters = [[] for _ in subdoc_spans]
+    for cluster in clusters:
+        idx2mids = {}
+        for mid in cluster:
+            if mid in mid2sd:
+                idx2mids.setdefault(mid2sd[mid], []).append(mid)
+        for idx, mids in idx2mids.items():
+            sd_clusters[idx].append(mids)
+
+    sd_directed_rels = [set() for _ in subdoc_spans]
+    for rel in directed_rels:
+        _, mid1, mid2 = rel
+        if mid1 in mid2sd and mid2sd.get(mid2) == mid2sd[mid1]:
+            sd_directed_rels[mid2sd[mid1]].add(rel)
+
+    doc_dicts = []
+    for idx in range(len(subdoc_spans)):
+        ann_info = _get_ann_info(
+            sd_clusters[idx], sd_mid2mention[idx], sd_directed_rels[idx], dict_mid2att, mid2notes)
+        doc_dicts.append(
+            _gen_doc_dict_from_lines(sd_lines[idx], ann_info, assign_section_id=assign_section_id))
+
+    return doc_dicts
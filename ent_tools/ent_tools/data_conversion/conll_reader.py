@@ -0,0 +1,260 @@
+from typing import Iterator, NamedTuple, Tuple, Union
+
+from logzero import logger
+
+from ent_tools.util.constants import NON_ENTITY
+from ent_tools.util.data_io import open_file
+from ent_tools.data_conversion.span_codec import TagSet, decode_batch, gen_doc_dict_from_spans
+from ent_tools.data_conversion.util import read_tsv
+
+
+NEWDOC_PREFIX = '# newdoc'
+
+# (begin offset of the sentence in the document, sentence text, [(begin, end, label)] in the sentence)
+TaggedSentence = Tuple[int, str, list[Tuple[int, int, str]]]
+
+
+class ConllSentence(NamedTuple):
+    """Words and ENE labels of the token lines of a sentence, where a space
+    after a token (`SpaceAfter=Yes`) is a word labeled NON_ENTITY."""
+    words: list[str]
+    labels: list[str]
+
+    @property
+    def text(self) -> str:
+        return ''.join(self.words)
+
+
+def parse_token_line(
+        line: str,
+) -> Tuple[str, str, bool]:
+    """Return (form, ENE label, whether a space follows) of a CoNLL-U token line of GiNZA.
+
+    The label is the value of `ENE=` in the MISC column (e.g., `B-City`), or
+    NON_ENTITY if it is not given.
+    """
+
+    array = line.split('\t')
+    word  = array[1]
+    ene   = NON_ENTITY
+    space_after = False
+    for attr in array[9].split('|'):
+        if attr == 'SpaceAfter=Yes':
+            space_after = True
+        elif attr.startswith('ENE'):
+            ene = attr[4:]
+    return word, ene, space_after
+
+
+def parse_newdoc_line(
+        line: str,
+) -> str:
+    """Return the id of a `# newdoc id = ...` line, '' if no id is given, or None for other lines."""
+
+    if not line.startswith(NEWDOC_PREFIX):
+        return None
+
+    rest = line[len(NEWDOC_PREFIX):].strip()
+    if not rest:
+        return ''
+    key, _, value = rest.partition('=')
+    return value.strip() if key.strip() == 'id' else ''
+
+
+def iter_conll_sentences(
+        conll_path: str,
+) -> Iterator[Union[ConllSentence, str]]:
+    """Yield the sentences of a CoNLL-U file one by one, and the id of each
+    `# newdoc` line ('' if no id is given) at its position.
+
+    A sentence ends at an empty line, and the other comment lines are
+    skipped. Compressed files are decompressed on the fly by their suffixes.
+    """
+
+    words = []
+    labels = []
+
+    with open_file(conll_path) as f:
+        logger.info(f'Read: {conll_path}')
+        for line in f:
+            line = line.rstrip('\n')
+
+            if line.startswith('#'):
+                doc_id = parse_newdoc_line(line)
+                if doc_id is not None:
+                    yield doc_id
+
+            elif not line:
+                yield ConllSentence(words, labels)
+                words = []
+                labels = []
+
+            else:
+                word, ene, space_after = parse_token_line(line)
+                words.append(word)
+                labels.append(ene)
+
+                if space_after:
+                    words.append(' ')
+                    labels.append(NON_ENTITY)
+
+    # the last sentence without a trailing empty line
+    if words:
+        yield ConllSentence(words, labels)
+
+
+def get_mentions(
+        sentences: list[ConllSentence],
+        tagset: TagSet,
+        labelmap: dict = None,
+) -> list[list[Tuple[int, int, str]]]:
+    """Return (begin, end, label) of the mentions decoded from the BIO labels of each sentence.
+
+    The labels of all the sentences are decoded at once by `decode_batch`
+    with tagset, to which new labels are added. If labelmap is given, labels
+    are mapped by it and mentions with other labels are dropped. A trailing
+    ideographic space is excluded from a mention.
+    """
+
+    spans_batch = decode_batch(
+        [tagset.get_ids(sentence.labels) for sentence in sentences], tagset,
+        words_batch=[sentence.words for sentence in sentences])
+
+    mentions_batch = []
+    for sentence, spans in zip(sentences, spans_batch):
+        text = sentence.text
+        mentions = []
+        for begin, end, label in spans:
+            if labelmap:
+                if label in labelmap:
+                    label = labelmap[label]
+                else:
+                    continue
+
+            if text[end-1] == '　':
+                end -= 1
+            mentions.append((begin, end, label))
+        mentions_batch.append(mentions)
+    return mentions_batch
+
+
+def read_manifest(
+        manifest_path: str,
+) -> list[Tuple[str, str]]:
+    """Return (document name, tsv path) in the lines of a manifest.
+
+    Each line is `name<tab>tsv path`, where the tsv is the output of
+    `txt_to_tsv_for_auto_ner` for the document, in the order of the documents
+    in the CoNLL-U file.
+    """
+
+    docs = []
+    with open_file(manifest_path) as f:
+        logger.info(f'Read: {manifest_path}')
+        for line in f:
+            line = line.rstrip('\n')
+            if not line:
+                continue
+            name, tsv_path = line.split('\t')
+            docs.append((name, tsv_path))
+    return docs
+
+
+def iter_conll_docs(
+        conll_path: str,
+        doc_name: str = None,
+        tsv_path: str = None,
+        manifest_path: str = None,
+        labelmap: dict = None,
+        split_by_newdoc: bool = True,
+) -> Iterator[Tuple[str, list[TaggedSentence]]]:
+    """Yield (document name, tagged sentences) for each document in a CoNLL-U file.
+
+    The file is read in a single pass, and documents are split as follows.
+    - With manifest_path, each document in the manifest consumes the
+      sentences in its tsv, whose texts are verified and whose offsets are
+      used as the sentence offsets. `# newdoc` lines are ignored.
+    - With tsv_path or without split_by_newdoc, all sentences are a
+      document named doc_name, whose sentence texts and offsets are taken
+      from tsv_path if given.
+    - Otherwise, a document starts at each `# newdoc` line and is named by
+      its id, or `doc_name-N` for the N-th document without id. Sentences
+      before the first `# newdoc` are a document named doc_name.
+    Without a tsv, the sentence offsets are 0.
+    """
+
+    items = iter_conll_sentences(conll_path)
+    sentences = (item for item in items if type(item) is ConllSentence)
+    # the labels of the documents are decoded document by document with a shared tagset
+    tagset = TagSet()
+
+    def tag(doc_sentences, sen_begins=None):
+        mentions_batch = get_mentions(doc_sentences, tagset, labelmap=labelmap)
+        sen_begins = sen_begins or [0] * len(doc_sentences)
+        return [(sen_begin, sentence.text, mentions)
+                for sen_begin, sentence, mentions in zip(sen_begins, doc_sentences, mentions_batch)]
+
+    def tag_with_tsv(tsv_path):
+        doc_sentences = []
+        sen_begins = []
+        for sen_begin, sen_tsv in read_tsv(tsv_path):
+            sentence = next(sentences, None)
+            assert sentence is not None, f'No sentence in {conll_path} for: {sen_tsv}'
+            assert sentence.text == sen_tsv, f'Sentence mismatch: {sentence.text} != {sen_tsv}'
+            doc_sentences.append(sentence)
+            sen_begins.append(sen_begin)
+        return tag(doc_sentences, sen_begins)
+
+    if manifest_path:
+        for name, doc_tsv_path in read_manifest(manifest_path):
+            yield name, tag_with_tsv(doc_tsv_path)
+
+        assert next(sentences, None) is None, f'More sentences in {conll_path} than the manifest'
+        return
+
+    if tsv_path or not split_by_newdoc:
+        if tsv_path:
+            yield doc_name, tag_with_tsv(tsv_path)
+            assert next(sentences, None) is None, f'More sentences in {conll_path} than {tsv_path}'
+        else:
+            yield doc_name, tag(list(sentences))
+        return
+
+    name = doc_name
+    doc_sentences = []
+    n_docs = 0          # documents started at `# newdoc`
+    for item in items:
+        if type(item) is ConllSentence:
+            doc_sentences.append(item)
+            continue
+
+        if doc_sentences or n_docs > 0:
+            yield name, tag(doc_sentences)
+        doc_sentences = []
+        n_docs += 1
+        name = item or f'{doc_name}-{n_docs}'
+
+    # a file without `# newdoc` is a document even if empty
+    yield name, tag(doc_sentences)
+
+
+def gen_doc_dict_from_sentences(
+        sentences: list[TaggedSentence],
+) -> dict:
+    """Return the document dict of the tagged sentences, whose ids are sequential numbers."""
+
+    return gen_doc_dict_from_spans(
+        [text for _, text, _ in sentences], [mentions for _, _, mentions in sentences])
+
+
+def gen_ann_text_from_sentences(
+        sentences: list[TaggedSentence],
+) -> str:
+    """Return the brat .ann content of the tagged sentences, whose offsets are in the document."""
+
+    ann_lines = []
+    for sen_begin, text, mentions in sentences:
+        for begin, end, label in mentions:
+            ann_lines.append(
+                f'T{len(ann_lines)+1}\t{label} {sen_begin+begin} {sen_begin+end}\t{text[begin:end]}\n')
+    return ''.join(ann_lines)
@@ -1,10 +1,11 @@
 import argparse
+import os
 
 from logzero import logger
 
-from ent_tools.util.constants import NON_ENTITY
 from ent_tools.util.data_io import load_json
-from ent_tools.data_conversion.util import read_tsv, get_spans_from_BIO_seq
+from ent_tools.data_conversion.conll_reader import gen_ann_text_from_sentences, iter_conll_docs
+from ent_tools.data_conversion.ginza_conll_to_json import convert_conll
 
 
 def read_and_write(
@@ -14,75 +15,12 @@ def read_and_write(
         labelmap: dict = None,
 ) -> None:
 
-    sen = None
-    words = []
-    labels = []
+    [(_, sentences)] = iter_conll_docs(
+        conll_path, tsv_path=tsv_path, labelmap=labelmap, split_by_newdoc=False)
 
-    men_id = 1
-    sen_begin_global = 0
-    
-    tsv_reader = read_tsv(tsv_path) if tsv_path else None
-
-    with open(conll_path) as f, open(output_ann_path, 'w') as fw:
-        logger.info(f'Read: {conll_path}')
-        for line in f:
-            line = line.rstrip('\n')
-
-            if line.startswith('#'):
-                continue
-
-            elif not line:
-                sen = ''.join(words)
-
-                if tsv_reader:
-                    sen_begin_global, sen_tsv = tsv_reader.__next__()
-                    assert sen == sen_tsv
-
-                spans = get_spans_from_BIO_seq(words, labels)
-                for span in spans:
-                    begin = span[0]
-                    end   = span[1]
-                    label = span[2]
-                    if labelmap:
-                        if label in labelmap:
-                            label = labelmap[label]
-                        else:
-                            continue
-
-                    if sen[end-1] == '　':
-                        end -= 1
-
-                    span_text = sen[begin:end]
-
-                    begin_global = sen_begin_global + begin
-                    end_global   = sen_begin_global + end
-                    fw.write(f'T{men_id}\t{label} {begin_global} {end_global}\t{span_text}\n')
-                    men_id += 1
-
-                sen = None
-                words = []
-                labels = []
-                
-            else:
-                array = line.split('\t')
-                word  = array[1]
-                attrs = array[9].split('|')
-                ene   = NON_ENTITY
-                space_after = False
-                for attr in attrs:
-                    if attr == 'SpaceAfter=Yes':
-                        space_after = True
-                    elif attr.startswith('ENE'):
-                        ene = attr[4:]
-
-                words.append(word)
-                labels.append(ene)
-
-                if space_after:
-                    words.append(' ')
-                    labels.append(NON_ENTITY)
-
-        logger.info(f'Save: {output_ann_path}')
+    with open(output_ann_path, 'w') as fw:
+        fw.write(gen_ann_text_from_sentences(sentences))
+    logger.info(f'Save: {output_ann_path}')
 
 
 def main():
@@ -97,24 +35,47 @@ def main():
         type=str,
         dest='tsv',
     )
+    parser.add_argument(
+        '--manifest', '-manifest',
+        type=str,
+    )
     parser.add_argument(
         '--output_ann', '-ann',
         type=str,
-        required=True,
+    )
+    parser.add_argument(
+        '--output_ann_dir', '-ann_dir',
+        type=str,
     )
     parser.add_argument(
         '--label_conversion_map_path', '-label',
         type=str,
     )
     args = parser.parse_args()
-    
+
+    if bool(args.output_ann) == bool(args.output_ann_dir):
+        parser.error('Specify either --output_ann or --output_ann_dir.')
+    if args.tsv and args.manifest:
+        parser.error('Specify either --tsv_with_text_span or --manifest.')
+    if args.output_ann and args.manifest:
+        parser.error('--manifest writes a file per document; use --output_ann_dir instead of --output_ann.')
+
     labelmap = None
     if args.label_conversion_map_path:
         labelmap = load_json(args.label_conversion_map_path)
 
-    read_and_write(args.input_conll, args.output_ann,
-                   tsv_path=args.tsv,
-                   labelmap=labelmap)
+    if args.output_ann:
+        read_and_write(args.input_conll, args.output_ann,
+                       tsv_path=args.tsv,
+                       labelmap=labelmap)
+    else:
+        # documents split by the manifest or `# newdoc` lines
+        os.makedirs(args.output_ann_dir, exist_ok=True)
+        convert_conll(args.input_conll,
+                      output_ann_dir=args.output_ann_dir,
+                      tsv_path=args.tsv,
+                      manifest_path=args.manifest,
+                      labelmap=labelmap)
 
 
 if __name__ == '__main__':
@@ -4,114 +4,122 @@ import sys
 
 from logzero import logger
 
-from ent_tools.util.constants import NON_ENTITY, SENS, SEN_ID, TXT, MEN_IDS, MENS, SPAN, ENT_TYPE
-from ent_tools.util.data_io import load_json, write_as_json
-from ent_tools.data_conversion.util import read_tsv, get_spans_from_BIO_seq
+from ent_tools.util.conversion_cache import ConversionCache
+from ent_tools.util.data_io import JsonWriter, load_json
+from ent_tools.data_conversion.conll_reader import (
+    gen_ann_text_from_sentences, gen_doc_dict_from_sentences, iter_conll_docs, read_manifest,
+)
 
 
 def gen_doc_dict(
         conll_path: str,
         tsv_path: str = None,
         labelmap: dict = None,
-) -> None:
-
-    sen = None
-    words = []
-    labels = []
-
-    doc_dict  = {SENS: {}, MENS: {}}
-    men_id_num = 0
-    sen_id_num = 0
-
-    tsv_reader = read_tsv(tsv_path) if tsv_path else None
-
-    with open(conll_path) as f:
-        logger.info(f'Read: {conll_path}')
-        for line in f:
-            line = line.rstrip('\n')
-
-            if line.startswith('#'):
-                continue
-
-            elif not line:
-                sen_id_num += 1
-                sen_id = f'{sen_id_num:03d}'
-                sen = ''.join(words)
-                sen_dict = {TXT: sen, MEN_IDS: []}
-                doc_dict[SENS][sen_id] = sen_dict
-
-                if tsv_reader:
-                    _, sen_tsv = tsv_reader.__next__()
-                    assert sen == sen_tsv
-
-                spans = get_spans_from_BIO_seq(words, labels)
-                for span in spans:
-                    begin = span[0]
-                    end   = span[1]
-                    label = span[2]
-                    if labelmap:
-                        if label in labelmap:
-                            label = labelmap[label]
-                        else:
-                            continue
-
-                    if sen[end-1] == '　':
-                        end -= 1
-
-                    span_text = sen[begin:end]
-
-                    men_id_num += 1
-                    men_id = f'{men_id_num:03d}'
-                    sen_id = f'{sen_id_num:03d}'
-                    men_dict = {SEN_ID: sen_id,
-                                SPAN: (begin, end),
-                                ENT_TYPE: label,
-                                TXT: span_text,}
-                    doc_dict[MENS][men_id] = men_dict
-                    sen_dict[MEN_IDS].append(men_id)
-
-                sen = None
-                words = []
-                labels = []
-                
-            else:
-                array = line.split('\t')
-                word  = array[1]
-                attrs = array[9].split('|')
-                ene   = NON_ENTITY
-                space_after = False
-                for attr in attrs:
-                    if attr == 'SpaceAfter=Yes':
-                        space_after = True
-                    elif attr.startswith('ENE'):
-                        ene = attr[4:]
-
-                words.append(word)
-                labels.append(ene)
-
-                if space_after:
-                    words.append(' ')
-                    labels.append(NON_ENTITY)
-
-    return doc_dict
+) -> dict:
+    """Return the document dict of all sentences in a CoNLL-U file."""
+
+    [(_, sentences)] = iter_conll_docs(
+        conll_path, tsv_path=tsv_path, labelmap=labelmap, split_by_newdoc=False)
+    return gen_doc_dict_from_sentences(sentences)
+
+
+def convert_conll(
+        conll_path: str,
+        output_json: str = None,
+        output_ann_dir: str = None,
+        doc_name: str = None,
+        tsv_path: str = None,
+        manifest_path: str = None,
+        labelmap: dict = None,
+        split_by_newdoc: bool = True,
+        compact: bool = False,
+) -> list[str]:
+    """Convert the documents in a CoNLL-U file into a JSON corpus and/or brat .ann files.
+
+    Documents are split as `conll_reader.iter_conll_docs` and both outputs are
+    written in a single pass over the file, so that a corpus tagged into a
+    single CoNLL-U file is converted without loading it at once. The .ann
+    file of each document is saved as `output_ann_dir/name.ann`. Return the
+    paths of the output files.
+    """
+
+    if doc_name is None:
+        doc_name = os.path.basename(conll_path).split('.conll')[0]
+
+    output_paths = []
+    writer = JsonWriter(output_json, compact=compact) if output_json else None
+    try:
+        for name, sentences in iter_conll_docs(
+                conll_path, doc_name=doc_name, tsv_path=tsv_path, manifest_path=manifest_path,
+                labelmap=labelmap, split_by_newdoc=split_by_newdoc):
+            if writer:
+                writer.write(name, gen_doc_dict_from_sentences(sentences))
+
+            if output_ann_dir:
+                output_ann_path = os.path.join(output_ann_dir, f'{name}.ann')
+                with open(output_ann_path, 'w') as fw:
+                    fw.write(gen_ann_text_from_sentences(sentences))
+                logger.info(f'Save: {output_ann_path}')
+                output_paths.append(output_ann_path)
+    finally:
+        if writer:
+            writer.close()
+
+    if output_json:
+        output_paths.append(output_json)
+    return output_paths
 
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--input_conll', '-conll', required=True)
-    parser.add_argument('--output_json', '-json', required=True)
+    parser.add_argument('--output_json', '-json')
+    parser.add_argument('--output_ann_dir', '-ann_dir')
     parser.add_argument('--tsv_with_text_span', '-tsv', dest='tsv')
+    parser.add_argument('--manifest', '-manifest')
     parser.add_argument('--label_conversion_map_path', '-label')
+    parser.add_argument('--compact_json', action='store_true')
+    parser.add_argument('--cache_path')
     args = parser.parse_args()
-    
+
+    if not (args.output_json or args.output_ann_dir):
+        parser.error('Specify --output_json and/or --output_ann_dir.')
+    if args.tsv and args.manifest:
+        parser.error('Specify either --tsv_with_text_span or --manifest.')
+
+    cache = None
+    if args.cache_path:
+        cache = ConversionCache(args.cache_path)
+        input_paths = [path for path in (args.input_conll, args.tsv, args.manifest,
+                                         args.label_conversion_map_path) if path]
+        if args.manifest:
+            input_paths.extend(tsv_path for _, tsv_path in read_manifest(args.manifest))
+        options = {'compact': args.compact_json, 'ann_dir': args.output_ann_dir}
+        cache_key = args.output_json or args.output_ann_dir
+        if cache.is_valid(cache_key, input_paths, options):
+            logger.info(f'Skip unchanged file: {args.input_conll}')
+            return
+
     labelmap = None
     if args.label_conversion_map_path:
         labelmap = load_json(args.label_conversion_map_path)
 
-    doc_name = os.path.basename(args.input_conll).split('.conll')[0]
-    doc_dict = gen_doc_dict(args.input_conll, tsv_path=args.tsv, labelmap=labelmap)
-    data = {doc_name: doc_dict}
-    write_as_json(data, args.output_json)
+    if args.output_ann_dir:
+        os.makedirs(args.output_ann_dir, exist_ok=True)
+
+    output_paths = convert_conll(
+        args.input_conll,
+        output_json=args.output_json,
+        output_ann_dir=args.output_ann_dir,
+        tsv_path=args.tsv,
+        manifest_path=args.manifest,
+        labelmap=labelmap,
+        compact=args.compact_json,
+    )
+
+    if cache:
+        cache.update(cache_key, input_paths, options, output_paths=output_paths)
+        cache.save()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,253 @@
+import argparse
+import os
+import sys
+from typing import Iterator, Tuple
+
+from logzero import logger
+
+from ent_tools.util.constants import (
+    SENS, MENS, ENTS, SEC_ID, SEN_ID, MEM_MEN_IDS, ENT_ID, TXT, SPAN, FRAGMENTS, ENT_TYPE,
+    COREF, COREF_ATTR, DIR_MEN_PAIRS, NOTES,
+)
+from ent_tools.util.data_io import load_target_ids
+from ent_tools.util.indexed_corpus import iter_corpus
+from ent_tools.util.parallel import map_in_batches
+
+
+# mention keys that are not exported as brat attributes
+MENTION_KEYS = {SEN_ID, SPAN, FRAGMENTS, TXT, ENT_TYPE, ENT_ID, NOTES}
+NOTES_LABEL = 'AnnotatorNotes'
+
+
+def gen_brat_texts(
+        doc: dict,
+        attributes: list[str] = None,
+        coref_tag_name: str = None,
+        directed_coref_tag_name: str = None,
+) -> Tuple[str, str]:
+    """Return the contents of the brat .txt and .ann files of a document.
+
+    This is the inverse of `brat_util.gen_doc_dict`: each sentence is written
+    as a line and sections are separated by an empty line, and mention spans
+    are converted into offsets in the whole text. Coreference is written as
+    `*` lines for entities with multiple members and directed mention pairs as
+    R lines. Mention keys in attributes (or, if not given, any other keys with
+    a string or True value) are written as A lines, and notes as # lines.
+    """
+
+    if coref_tag_name == None:
+        coref_tag_name = COREF
+    if directed_coref_tag_name == None:
+        directed_coref_tag_name = COREF_ATTR
+
+    # text and the offset of each sentence
+    lines = []
+    sen_id2offset = {}
+    offset = 0
+    prev_sec_id = None
+    for i, (sen_id, sen) in enumerate(doc[SENS].items()):
+        sec_id = sen.get(SEC_ID)
+        if i > 0 and sec_id != prev_sec_id:
+            lines.append('')
+            offset += 1
+        prev_sec_id = sec_id
+
+        sen_id2offset[sen_id] = offset
+        lines.append(sen[TXT])
+        offset += len(sen[TXT]) + 1
+
+    txt = ''.join(f'{line}\n' for line in lines)
+
+    ann_lines = []
+    mid2tid = {}
+    n_atts = 0
+    n_notes = 0
+    for men_id, men in doc.get(MENS, {}).items():
+        tid = f'T{len(mid2tid)+1}'
+        mid2tid[men_id] = tid
+
+        sen_offset = sen_id2offset[men[SEN_ID]]
+        fragments = men.get(FRAGMENTS) or [men[SPAN]]
+        offsets = ';'.join(f'{sen_offset+begin} {sen_offset+end}' for begin, end in fragments)
+        men_txt = men.get(TXT)
+        if men_txt is None:
+            sen_txt = doc[SENS][men[SEN_ID]][TXT]
+            men_txt = ' '.join(sen_txt[begin:end] for begin, end in fragments)
+        ann_lines.append(f'{tid}\t{men[ENT_TYPE]} {offsets}\t{men_txt}')
+
+        for key, value in men.items():
+            if (key in MENTION_KEYS
+                or (attributes is not None and not key in attributes)
+            ):
+                continue
+
+            if value is True:
+                n_atts += 1
+                ann_lines.append(f'A{n_atts}\t{key} {tid}')
+            elif isinstance(value, str) and value and len(value.split()) == 1:
+                n_atts += 1
+                ann_lines.append(f'A{n_atts}\t{key} {tid} {value}')
+
+        if men.get(NOTES):
+            n_notes += 1
+            notes = ' '.join(men[NOTES].splitlines())
+            ann_lines.append(f'#{n_notes}\t{NOTES_LABEL} {tid}\t{notes}')
+
+    # members of entities; entities are obtained from mentions if absent
+    ents = doc.get(ENTS)
+    if ents is None:
+        ents = {}
+        for men_id, men in doc.get(MENS, {}).items():
+            if men.get(ENT_ID) is not None:
+                ents.setdefault(men[ENT_ID], {MEM_MEN_IDS: []})[MEM_MEN_IDS].append(men_id)
+
+    n_rels = 0
+    for ent in ents.values():
+        if not ent:
+            continue
+
+        tids = [mid2tid[men_id] for men_id in ent[MEM_MEN_IDS] if men_id in mid2tid]
+        if len(tids) > 1:
+            ann_lines.append(f'*\t{coref_tag_name} {" ".join(tids)}')
+
+        if ent.get(DIR_MEN_PAIRS):
+            for pair in ent[DIR_MEN_PAIRS].split(';'):
+                men_id1, _, men_id2 = pair.partition('-')
+                n_rels += 1
+                ann_lines.append(
+                    f'R{n_rels}\t{directed_coref_tag_name} Arg1:{mid2tid[men_id1]} Arg2:{mid2tid[men_id2]}')
+
+    ann = ''.join(f'{line}\n' for line in ann_lines)
+
+    return txt, ann
+
+
+def write_brat_files(
+        doc_id: str,
+        doc: dict,
+        output_dir: str,
+        **kwargs,
+) -> None:
+
+    txt, ann = gen_brat_texts(doc, **kwargs)
+    with open(os.path.join(output_dir, f'{doc_id}.txt'), 'w') as fw:
+        fw.write(txt)
+    with open(os.path.join(output_dir, f'{doc_id}.ann'), 'w') as fw:
+        fw.write(ann)
+
+
+# export options shared by all documents written in a worker process
+_worker_options = None
+
+
+def _init_worker(
+        options: dict,
+) -> None:
+
+    global _worker_options
+    _worker_options = options
+
+
+def _write_in_worker(
+        item: Tuple[str, dict],
+) -> None:
+
+    doc_id, doc = item
+    write_brat_files(doc_id, doc, **_worker_options)
+
+
+def export_docs(
+        docs: Iterator[Tuple[str, dict]],
+        output_dir: str,
+        jobs: int = 1,
+        batch_size: int = 256,
+        **kwargs,
+) -> list[Tuple[str, str]]:
+    """Write a .txt and an .ann file for each (doc_id, doc) into output_dir.
+
+    Documents are read batch by batch and written by `jobs` worker processes,
+    so that the whole corpus is not loaded at once. A failure in a document
+    is logged and does not stop the export of the others. Return the list of
+    (doc_id, error message) for the failed documents. kwargs are the options
+    of `gen_brat_texts`.
+    """
+
+    os.makedirs(output_dir, exist_ok=True)
+    options = dict(kwargs, output_dir=output_dir)
+
+    n_docs = 0
+    errors = []
+    results = map_in_batches(
+        _write_in_worker, docs, jobs=jobs, batch_size=batch_size,
+        initializer=_init_worker, initargs=(options,))
+    for (doc_id, _), _, error in results:
+        n_docs += 1
+        if error:
+            logger.error(f'Failed to export {doc_id}: {error}')
+            errors.append((doc_id, error))
+
+    logger.info(f'Exported {n_docs-len(errors)} documents ({len(errors)} failed) to {output_dir}')
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--input_path', '-i',
+        type=str,
+        required=True,
+    )
+    parser.add_argument(
+        '--output_dir', '-o',
+        type=str,
+        required=True,
+    )
+    parser.add_argument(
+        '--target_ids_path', '-t',
+        type=str,
+    )
+    parser.add_argument(
+        '--attributes',
+        type=str,
+    )
+    parser.add_argument(
+        '--coref_tag_name',
+        type=str,
+    )
+    parser.add_argument(
+        '--directed_coref_tag_name',
+        type=str,
+    )
+    parser.add_argument(
+        '--jobs', '-j',
+        type=int,
+        default=1,
+    )
+    args = parser.parse_args()
+
+    if args.target_ids_path:
+        target_ids = load_target_ids(args.target_ids_path)
+    else:
+        target_ids = None
+
+    if args.attributes:
+        attributes = args.attributes.split(',')
+    else:
+        attributes = None
+
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count()
+
+    errors = export_docs(
+        iter_corpus(args.input_path, doc_ids=target_ids),
+        args.output_dir,
+        jobs=jobs,
+        attributes=attributes,
+        coref_tag_name=args.coref_tag_name,
+        directed_coref_tag_name=args.directed_coref_tag_name,
+    )
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,7 +3,7 @@ import argparse
 from logzero import logger
 
 from ent_tools.util.constants import SENS, MENS, TXT, MEN_IDS, SPAN, ENT_TYPE
-from ent_tools.util.data_io import load_json
+from ent_tools.util.data_io import iter_docs, open_file
 
 
 def read_and_write(
@@ -11,10 +11,8 @@ def read_and_write(
         output_tsv: str
 ) -> None:
 
-    data = load_json(input_json)
-
-    with open(output_tsv, 'w') as fw:
-        for doc_id, doc in data.items():
+    with open_file(output_tsv, 'w') as fw:
+        for doc_id, doc in iter_docs(input_json):
             for sen_id, sen in doc[SENS].items():
                 sen_text = sen[TXT]
         
@@ -5,7 +5,7 @@ from logzero import logger
 from ent_tools.util.constants import (
     DOC_ID, ENT_ID, MEN_IDS, MEM_MEN_IDS, SENS, MENS, ENTS, TXT, SPAN, ENT_TYPE
 )
-from ent_tools.util.data_io import load_json
+from ent_tools.util.data_io import iter_docs
 
 
 XML_DEC_LINE = '<?xml version="1.0" encoding="utf-8" ?>'
@@ -24,10 +24,8 @@ def read_and_write(
         output_xml: str
 ) -> None:
 
-    data = load_json(input_json)
-
     with open(output_xml, 'w', encoding='utf-8') as fw:
-        for doc_id, doc in data.items():
+        for doc_id, doc in iter_docs(input_json):
             fw.write(f'{XML_DEC_LINE}\n')
             if doc_id:
                 fw.write(f'{DOC_BEGIN[:-1]} {DOC_ID}="{doc_id}">\n')
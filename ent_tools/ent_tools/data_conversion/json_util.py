@@ -1,89 +1,73 @@
-import copy
+from bisect import bisect_right
+from typing import Tuple
 
 import logzero
-from logzero import logger
-
-from sentence_segmenter import Segmenter
-
 
+from ent_tools.data_conversion.sentence_segmenter import Segmenter
 from ent_tools.util.constants import (
-    SECS, SENS, MENS, ENTS, SEC_ID, SEN_ID, MEN_IDS, MEM_MEN_IDS, ENT_ID, TXT, SPAN, ENT_TYPE, COREF, COREF_ATTR, NOTES,
+    SECS, SENS, MENS, SEC_ID, SEN_ID, SEN_IDS, MEN_IDS, TXT, SPAN, FRAGMENTS, ENT_TYPE, COREF, COREF_ATTR, NOTES,
 )
+from ent_tools.util.validate_corpus import validate_doc
 
 
 def check_attributes(
         doc: dict,
         doc_id: str = None,
 ) -> None:
+    """Raise AssertionError listing all violations of `validate_corpus.validate_doc`."""
+
     logzero.loglevel(20)
 
-    sens = doc[SENS]
-
-    has_secs = SECS in doc
-    if has_secs:
-        secs = doc[SECS]
-
-    has_mens = MENS in doc
-    if has_mens:
-        mens = doc[MENS]
-
-    has_ents = ENTS in doc
-    if has_ents:
-        ents = doc[ENTS]
-
-    if has_secs:
-        for sec_id, sec in secs.items():
-            # sec's sens are associated with the sec
-            for sen_id in sec[SEN_IDS]:
-                assert sec_id == sens[sen_id][SEC_ID]
-
-    for sen_id, sen in sens.items():
-        if has_secs:
-            # sen's sec has the sen
-            sec_id = sen[SEC_ID]
-            assert sen_id in secs[sec_id][SEN_IDS]
-
-        if has_mens:
-            # sen's mens are associated with the sen
-            for men_id in sen[MEN_IDS]:
-                assert sen_id == mens[men_id][SEN_ID]
-
-    if has_mens:
-        for men_id, men in mens.items():
-            # men's sen has the men
-            sen_id = men[SEN_ID]
-            assert men_id in sens[sen_id][MEN_IDS]
-     
-            if has_ents:
-                # men's ent has the men
-                ent_id = men[ENT_ID]
-                assert ent_id == None or ent_id in ents, ent_id
-
-                if ent_id != None:
-                    logger.debug(f'- M {men_id} {men[TXT]} - E {ent_id} -> {ent_id in ents}')
-                    assert men_id in ents[ent_id][MEM_MEN_IDS], f'{men_id} {men[TXT]} - {ent_id} -> {ents[ent_id][MEM_MEN_IDS]}'
-
-    if has_mens and has_ents:
-        for ent_id, ent in ents.items():
-            # ent's mens are associated with the ent
-            for men_id in ent[MEM_MEN_IDS]:
-                logger.debug(f'- E {ent_id} - M {men_id} -> {mens[men_id][ENT_ID]}')
-                assert ent_id == mens[men_id][ENT_ID]
-
-
-def segment_sentence_in_doc_dict(doc: dict) -> dict:
+    violations = validate_doc(doc, doc_id)
+    assert not violations, '\n'.join(str(violation) for violation in violations)
+
+
+# segmenter shared by all documents, as building it compiles regexes
+_segmenter = None
+
+
+def get_segmenter() -> Segmenter:
+    global _segmenter
+    if _segmenter is None:
+        _segmenter = Segmenter()
+    return _segmenter
+
+
+def segment_sentence_in_doc_dict(
+        doc: dict,
+        segmenter: Segmenter = None,
+) -> dict:
+    """Resegment the sentences of each section and move mentions to the new sentences.
+
+    Sentences without a section id are resegmented one by one. New sentences
+    have only the section id (if any), text and mention ids, and the sentence
+    ids of sections are updated if the document has sections. Other values of
+    the document are kept. Mentions are copied shallowly: values other than
+    the sentence id, span and fragments are shared with the input document.
+    """
+
     debug = False
 
-    segmenter = Segmenter()
+    if segmenter is None:
+        segmenter = get_segmenter()
 
-    doc_new  = {SENS: {}, MENS: {}, ENTS: doc[ENTS]}
+    # the order of the keys is kept
+    doc_new = {key: {} if key in (SENS, MENS, SECS) else value for key, value in doc.items()}
     secid_to_senids = {}
+    has_sec_id = {}     # section key -> whether it is a section id or a sentence id
 
     senidold_to_secid_and_span = {}
     senidnew_to_secid_and_span = {}
+    secid_to_sen_index = {}     # sec_id -> (end offsets of new sentences, their ids)
 
     for sen_id, sen in doc[SENS].items():
-        sec_id = sen[SEC_ID]
+        sec_id = sen.get(SEC_ID)
+        if sec_id is None:
+            sec_id = sen_id
+            has_sec_id[sec_id] = False
+        else:
+            has_sec_id[sec_id] = True
+
         if not sec_id in secid_to_senids:
             secid_to_senids[sec_id] = []
         secid_to_senids[sec_id].append(sen_id)
@@ -92,8 +76,8 @@ def segment_sentence_in_doc_dict(doc: dict) -> dict:
         texts = [doc[SENS][sen_id][TXT] for sen_id in sen_ids]
         full_text = ''.join(texts)
 
-        texts_new = segmenter.sentencize(full_text)
-        full_text_new = ''.join(texts_new)
+        spans_new = segmenter.get_spans(full_text)
+        full_text_new = ''.join(full_text[begin:end] for begin, end in spans_new)
         assert full_text == full_text_new
 
         # set senidold_to_secid_and_span
@@ -104,38 +88,35 @@ def segment_sentence_in_doc_dict(doc: dict) -> dict:
             begin_idx = end_idx
 
         # set senidnew_to_secid_and_span
-        begin_idx = 0
-        for i, text_new in enumerate(texts_new):
+        sen_ends, sen_ids_new = secid_to_sen_index[sec_id] = ([], [])
+        for i, (begin_idx, end_idx) in enumerate(spans_new):
             sen_id_new = f'{sec_id}-{i+1:02d}'
-            doc_new[SENS][sen_id_new] = {
-                SEC_ID: sec_id,
-                TXT: text_new,
-                MEN_IDS: [],
-            }
+            sen_new = {TXT: full_text[begin_idx:end_idx], MEN_IDS: []}
+            if has_sec_id[sec_id]:
+                sen_new = {SEC_ID: sec_id, **sen_new}
+            doc_new[SENS][sen_id_new] = sen_new
 
-            end_idx = begin_idx + len(text_new)
             senidnew_to_secid_and_span[sen_id_new] = (sec_id, begin_idx, end_idx)
-            begin_idx = end_idx
+            sen_ends.append(end_idx)
+            sen_ids_new.append(sen_id_new)
 
         if debug:
             print(senidold_to_secid_and_span)
             print(senidnew_to_secid_and_span)
             print(doc_new[SENS][sen_id_new])
 
-    for men_id, mention in doc[MENS].items():
+    for men_id, mention in doc.get(MENS, {}).items():
         sen_id      = mention[SEN_ID]
-        sen_span    = senidold_to_secid_and_span[sen_id][1:]
-        sec_id      = doc[SENS][sen_id][SEC_ID]
+        sec_id, *sen_span = senidold_to_secid_and_span[sen_id]
         span        = mention[SPAN]
-        text        = mention[TXT]
+        text        = mention.get(TXT)
         span_global = (sen_span[0]+span[0], sen_span[0]+span[1])
 
         sen_id_new   = get_sentence_id_from_span(
-            span_global[0], sec_id, senidnew_to_secid_and_span)
-        sen_span_new = senidnew_to_secid_and_span[sen_id_new][1:]
+            span_global[0], sec_id, secid_to_sen_index)
+        sec_id_new, *sen_span_new = senidnew_to_secid_and_span[sen_id_new]
         sen_new      = doc_new[SENS][sen_id_new]
         sen_text_new = sen_new[TXT]
-        sec_id_new   = sen_new[SEC_ID]
         span_new     = [span_global[0]-sen_span_new[0], span_global[1]-sen_span_new[0]]
         text_new     = sen_text_new[span_new[0]:span_new[1]]
 
@@ -151,27 +132,38 @@ def segment_sentence_in_doc_dict(doc: dict) -> dict:
         assert sec_id == sec_id_new
         assert sen_span_new[0] <= span_global[0] and span_global[1] <= sen_span_new[1]
         assert 0 <= span_new[0] and span_new[1] <= (sen_span_new[1]-sen_span_new[0])
-        assert text_new == text
+        # the text of a discontinuous mention is the concatenation of its fragments
+        assert FRAGMENTS in mention or text is None or text_new == text
 
-        mention_new = copy.deepcopy(mention)
+        mention_new = dict(mention)
         mention_new[SEN_ID] = sen_id_new
         mention_new[SPAN] = span_new
+        if FRAGMENTS in mention:
+            shift = sen_span[0] - sen_span_new[0]
+            mention_new[FRAGMENTS] = [(frag[0]+shift, frag[1]+shift) for frag in mention[FRAGMENTS]]
         sen_new[MEN_IDS].append(men_id)
         doc_new[MENS][men_id] = mention_new
 
+    if SECS in doc:
+        for sec_id, sec in doc[SECS].items():
+            sen_ids_new = secid_to_sen_index[sec_id][1] if sec_id in secid_to_sen_index else []
+            doc_new[SECS][sec_id] = {**sec, SEN_IDS: list(sen_ids_new)}
+
     return doc_new
 
 
 def get_sentence_id_from_span(
         span_begin: int,
         sec_id: str,
-        senid_to_secid_and_span: dict[str, list[int, int, int]],
+        secid_to_sen_index: dict[str, Tuple[list[int], list[str]]],
 ) -> str:
+    """Return the id of the sentence in the section that contains the offset span_begin.
 
-    for sen_id, (sec_id_now, sen_span_begin, sen_span_end) in senid_to_secid_and_span.items():
-        if sec_id_now != sec_id:
-            continue
-        if span_begin < sen_span_end:
-            return sen_id
+    secid_to_sen_index maps a section id to the end offsets of its sentences in
+    ascending order and the sentence ids.
+    """
 
-    assert False
+    sen_ends, sen_ids = secid_to_sen_index[sec_id]
+    idx = bisect_right(sen_ends, span_begin)
+    assert idx < len(sen_ids)
+    return sen_ids[idx]
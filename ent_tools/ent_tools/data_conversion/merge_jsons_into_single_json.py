@@ -1,12 +1,170 @@
 import argparse
 from collections import Counter
-import json
 import os
+from typing import Iterator, Tuple
 
 from logzero import logger
 
 from ent_tools.util.constants import SENS, MENS, ENTS, MEM_MEN_IDS, TXT, ENT_TYPE, MEN_TYPE, HAS_REF, REF_URL
-from ent_tools.util.data_io import load_json, write_as_json
+from ent_tools.util.conversion_cache import (
+    ConversionCache, get_temporary_path, iter_docs_with_cache, save_output_with_cache,
+)
+from ent_tools.util.data_io import iter_docs, JsonWriter, load_target_ids
+
+
+def update_statistics(
+        doc: dict,
+        counter: Counter,
+        key2sets: dict[str, set],
+) -> None:
+
+    counter['num_docs'] += 1
+    if SENS in doc:
+        counter['num_sens'] += len(doc[SENS])
+
+    if MENS in doc:
+        counter['num_mens'] += len(doc[MENS])
+
+        for men_id, men in doc[MENS].items():
+            key2sets['num_mens'].add(men[TXT])
+
+            if ENT_TYPE in men:
+                key = f'num_mens:{men[ENT_TYPE]}'
+                counter[key] += 1
+                if not key in key2sets:
+                    key2sets[key] = set()
+                key2sets[key].add(men[TXT])
+
+            if MEN_TYPE in men:
+                counter[f'num_mens:{men[MEN_TYPE]}'] += 1
+
+    if ENTS in doc:
+        counter['num_ents'] += len(doc[ENTS])
+
+        for ent_id, ent in doc[ENTS].items():
+            if HAS_REF in ent and ent[HAS_REF]:
+                counter['num_ents:has_ref'] += 1
+
+            has_name = False
+            for men_id in ent[MEM_MEN_IDS]:
+                men = doc[MENS][men_id]
+                if men[ENT_TYPE].endswith('NAME'):
+                    has_name = True
+
+            if has_name:
+                counter['num_ents:has_name'] += 1
+
+            # tmp
+            if REF_URL in ent:
+                if ent[REF_URL].startswith('https://www.wikidata.org'):
+                    key = 'num_ents:has_wikidata_ref'
+                    counter[key] += 1
+                    if not key in key2sets:
+                        key2sets[key] = set()
+                    key2sets[key].add(ent[REF_URL])
+                else:
+                    key = 'num_ents:has_other_ref'
+                    counter[key] += 1
+                    if not key in key2sets:
+                        key2sets[key] = set()
+                    key2sets[key].add(ent[REF_URL])
+
+
+def log_statistics(
+        counter: Counter,
+        key2sets: dict[str, set],
+) -> None:
+
+    logger.info('Data statistics.')
+    main_keys = ['num_docs', 'num_sens', 'num_mens', 'num_ents']
+    for key in main_keys:
+        val = counter[key]
+        if key in key2sets:
+            val2 = len(key2sets[key])
+            logger.info(f'{key}\t{val}\t({val2})')
+        else:
+            logger.info(f'{key}\t{val}')
+
+    for key, val in sorted(counter.items()):
+        if not key in main_keys:
+            if key in key2sets:
+                val2 = len(key2sets[key])
+                logger.info(f'{key}\t{val}\t({val2})')
+            else:
+                logger.info(f'{key}\t{val}')
+
+
+def get_json_paths_in_dirs(
+        input_dirs: list[str],
+        target_ids: set[str] = None,
+) -> list[str]:
+
+    input_paths = []
+    for input_dir in input_dirs:
+        for file_name in os.listdir(input_dir):
+            if not file_name.endswith('.json'):
+                continue
+
+            doc_id = file_name.split('.')[0]
+            if target_ids and not doc_id in target_ids:
+                continue
+
+            input_paths.append(os.path.join(input_dir, file_name))
+
+    return input_paths
+
+
+def iter_docs_in_dirs(
+        input_dirs: list[str],
+        target_ids: set[str] = None,
+) -> Iterator[Tuple[str, dict, str]]:
+    """Yield (doc_id, doc, source path) triples from the JSON files in input_dirs."""
+
+    for input_path in get_json_paths_in_dirs(input_dirs, target_ids=target_ids):
+        for doc_id, doc in iter_docs(input_path):
+            yield doc_id, doc, input_path
+
+
+def merge_docs(
+        docs: Iterator[Tuple[str, dict, str]],
+        output_path: str,
+        compact: bool = False,
+) -> int:
+    """Write (doc_id, doc, source) triples into a single corpus file as they arrive.
+
+    Documents with no sentences are skipped. For a duplicated doc_id, the
+    first document is kept and the later ones are skipped, unlike the former
+    in-memory merge, which kept the last one. The output file is not created
+    if no document is written. Return the number of written documents.
+    """
+
+    writer = None
+    doc_ids_written = set()
+    counter = Counter()
+    key2sets = {'num_mens': set()}
+
+    for doc_id, doc, source in docs:
+        if len(doc[SENS]) == 0:
+            logger.info(f'Skip document with no sentences: {doc_id}')
+            continue
+
+        if doc_id in doc_ids_written:
+            logger.warning(f'Skip duplicated document: {doc_id} in {source}')
+            continue
+        doc_ids_written.add(doc_id)
+
+        if writer is None:
+            writer = JsonWriter(output_path, compact=compact)
+        writer.write(doc_id, doc)
+        update_statistics(doc, counter, key2sets)
+
+    if writer:
+        writer.close()
+
+        # show statistics
+        log_statistics(counter, key2sets)
+
+    return len(doc_ids_written)
 
 
 def main():
@@ -25,112 +183,35 @@ def main():
         '--target_ids_path', '-t',
         type=str,
     )
+    parser.add_argument(
+        '--compact_json',
+        action='store_true',
+    )
+    parser.add_argument(
+        '--cache_path',
+        type=str,
+    )
     args = parser.parse_args()
 
     if args.target_ids_path:
-        target_ids = set()
-        with open(args.target_ids_path) as f:
-            for line in f:
-                target_ids.add(line.strip('\n'))
-        logger.info(f'Target ids: {target_ids}')
+        target_ids = load_target_ids(args.target_ids_path)
     else:
         target_ids = None
 
-    data = {}
-    for input_dir in args.input_dirs.split(','):
-        for file_name in os.listdir(input_dir):
-            if not file_name.endswith('.json'):
-                continue
+    if args.cache_path:
+        # reuse the documents of unchanged input files in the previous output
+        cache = ConversionCache(args.cache_path)
+        input_paths = get_json_paths_in_dirs(args.input_dirs.split(','), target_ids=target_ids)
+        docs = iter_docs_with_cache(
+            input_paths, iter_docs, cache, args.output_path,
+            options={'compact': args.compact_json})
+        tmp_output_path = get_temporary_path(args.output_path)
+        merge_docs(docs, tmp_output_path, compact=args.compact_json)
+        save_output_with_cache(tmp_output_path, args.output_path, cache)
 
-            doc_id = file_name.split('.')[0]
-            if target_ids and not doc_id in target_ids:
-                continue                    
-
-            input_path = os.path.join(input_dir, file_name)
-            data_orig = load_json(input_path)
-            for doc_id, doc in data_orig.items():
-                if len(doc[SENS]) == 0:
-                    logger.info(f'Skip document with no sentences: {doc_id}')
-                    continue
-
-                data[doc_id] = data_orig[doc_id]
-
-    if data:
-        write_as_json(data, args.output_path)
-
-        # show statistics
-        counter = Counter()
-        key2sets = {'num_mens': set()}
-
-        for doc_id, doc in data.items():
-            counter['num_docs'] += 1
-            if SENS in doc:
-                counter['num_sens'] += len(doc[SENS])
-
-            if MENS in doc:
-                counter['num_mens'] += len(doc[MENS])
-
-                for men_id, men in doc[MENS].items():
-                    key2sets['num_mens'].add(men[TXT])
-
-                    if ENT_TYPE in men:
-                        key = f'num_mens:{men[ENT_TYPE]}'
-                        counter[key] += 1
-                        if not key in key2sets:
-                            key2sets[key] = set()
-                        key2sets[key].add(men[TXT])
-
-                    if MEN_TYPE in men:
-                        counter[f'num_mens:{men[MEN_TYPE]}'] += 1
-
-            if ENTS in doc:
-                counter['num_ents'] += len(doc[ENTS])
-
-                for ent_id, ent in doc[ENTS].items():
-                    if HAS_REF in ent and ent[HAS_REF]:
-                        counter['num_ents:has_ref'] += 1
-
-                    has_name = False
-                    for men_id in ent[MEM_MEN_IDS]:
-                        men = doc[MENS][men_id]
-                        if men[ENT_TYPE].endswith('NAME'):
-                            has_name = True
-
-                    if has_name:
-                        counter['num_ents:has_name'] += 1
-
-                    # tmp
-                    if REF_URL in ent:
-                        if ent[REF_URL].startswith('https://www.wikidata.org'):
-                            key = 'num_ents:has_wikidata_ref'
-                            counter[key] += 1
-                            if not key in key2sets:
-                                key2sets[key] = set()
-                            key2sets[key].add(ent[REF_URL])
-                        else:
-                            key = 'num_ents:has_other_ref'
-                            counter[key] += 1
-                            if not key in key2sets:
-                                key2sets[key] = set()
-                            key2sets[key].add(ent[REF_URL])
-
-        logger.info('Data statistics.')
-        main_keys = ['num_docs', 'num_sens', 'num_mens', 'num_ents']
-        for key in main_keys:
-            val = counter[key]
-            if key in key2sets:
-                val2 = len(key2sets[key])
-                logger.info(f'{key}\t{val}\t({val2})')
-            else:
-                logger.info(f'{key}\t{val}')
-            
-        for key, val in sorted(counter.items()):
-            if not key in main_keys:
-                if key in key2sets:
-                    val2 = len(key2sets[key])
-                    logger.info(f'{key}\t{val}\t({val2})')
-                else:
-                    logger.info(f'{key}\t{val}')
+    else:
+        docs = iter_docs_in_dirs(args.input_dirs.split(','), target_ids=target_ids)
+        merge_docs(docs, args.output_path, compact=args.compact_json)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,167 @@
+import argparse
+import os
+import sys
+from typing import Iterator, Tuple
+
+from logzero import logger
+
+from ent_tools.data_conversion.json_util import check_attributes, segment_sentence_in_doc_dict
+from ent_tools.data_conversion.sentence_segmenter import BACKENDS, REGEX_BACKEND, Segmenter
+from ent_tools.util.constants import SENS
+from ent_tools.util.data_io import JsonWriter, load_target_ids
+from ent_tools.util.indexed_corpus import iter_corpus
+from ent_tools.util.parallel import map_in_batches
+
+
+def resegment_doc(
+        doc: dict,
+        segmenter: Segmenter = None,
+        doc_id: str = None,
+        check: bool = True,
+) -> dict:
+    """Return the document whose sections are resegmented into new sentences.
+
+    If check, the cross-references of the new document are verified by
+    `json_util.check_attributes`, which raises AssertionError on failure.
+    """
+
+    doc_new = segment_sentence_in_doc_dict(doc, segmenter=segmenter)
+    if check:
+        check_attributes(doc_new, doc_id=doc_id)
+    return doc_new
+
+
+# segmenter and options shared by all documents resegmented in a worker process
+_worker_segmenter = None
+_worker_options = None
+
+
+def _init_worker(
+        options: dict,
+) -> None:
+
+    global _worker_segmenter, _worker_options
+    _worker_options = dict(options)
+    _worker_segmenter = Segmenter(
+        cache_size=_worker_options.pop('cache_size'),
+        backend=_worker_options.pop('backend'),
+    )
+
+
+def _resegment_in_worker(
+        item: Tuple[str, dict],
+) -> dict:
+
+    doc_id, doc = item
+    return resegment_doc(doc, _worker_segmenter, doc_id=doc_id, **_worker_options)
+
+
+def resegment_corpus(
+        docs: Iterator[Tuple[str, dict]],
+        output_path: str,
+        jobs: int = 1,
+        batch_size: int = 256,
+        compact: bool = False,
+        backend: str = REGEX_BACKEND,
+        cache_size: int = 0,
+        check: bool = True,
+) -> list[Tuple[str, str]]:
+    """Resegment the sentences of (doc_id, doc) pairs and write them into a corpus file.
+
+    Documents are read batch by batch, resegmented by `jobs` worker processes
+    and written to output_path in the input order, so that the whole corpus
+    is not loaded at once. A document that fails to be resegmented or checked
+    is logged and not written. Return the list of (doc_id, error message) for
+    the failed documents.
+    """
+
+    options = {'backend': backend, 'cache_size': cache_size, 'check': check}
+
+    n_docs = 0
+    n_sens = 0
+    n_sens_new = 0
+    errors = []
+    results = map_in_batches(
+        _resegment_in_worker, docs, jobs=jobs, batch_size=batch_size,
+        initializer=_init_worker, initargs=(options,))
+    with JsonWriter(output_path, compact=compact) as writer:
+        for (doc_id, doc), doc_new, error in results:
+            n_docs += 1
+            if error:
+                logger.error(f'Failed to resegment {doc_id}: {error}')
+                errors.append((doc_id, error))
+                continue
+
+            writer.write(doc_id, doc_new)
+            n_sens += len(doc[SENS])
+            n_sens_new += len(doc_new[SENS])
+
+    logger.info(f'Resegmented {n_docs-len(errors)} documents ({len(errors)} failed):'
+                + f' {n_sens} -> {n_sens_new} sentences')
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--input_path', '-i',
+        type=str,
+        required=True,
+    )
+    parser.add_argument(
+        '--output_path', '-o',
+        type=str,
+        required=True,
+    )
+    parser.add_argument(
+        '--target_ids_path', '-t',
+        type=str,
+    )
+    parser.add_argument(
+        '--backend',
+        type=str,
+        choices=BACKENDS,
+        default=REGEX_BACKEND,
+    )
+    parser.add_argument(
+        '--cache_size',
+        type=int,
+        default=0,
+    )
+    parser.add_argument(
+        '--skip_check',
+        action='store_true',
+    )
+    parser.add_argument(
+        '--compact_json',
+        action='store_true',
+    )
+    parser.add_argument(
+        '--jobs', '-j',
+        type=int,
+        default=1,
+    )
+    args = parser.parse_args()
+
+    if args.target_ids_path:
+        target_ids = load_target_ids(args.target_ids_path)
+    else:
+        target_ids = None
+
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count()
+
+    errors = resegment_corpus(
+        iter_corpus(args.input_path, doc_ids=target_ids),
+        args.output_path,
+        jobs=jobs,
+        compact=args.compact_json,
+        backend=args.backend,
+        cache_size=args.cache_size,
+        check=not args.skip_check,
+    )
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,9 @@
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+import os
 import re
+import sys
+from typing import Iterable, Tuple
 
 import functools
 from ja_sentence_segmenter.split.simple_splitter import split_punctuation
@@ -7,18 +11,114 @@ from ja_sentence_segmenter.split.simple_splitter import split_punctuation
 
 PERIODS = '。！？!?'
 
+REGEX_BACKEND = 'regex'     # ja_sentence_segmenter and regexes
+SCAN_BACKEND  = 'scan'      # scan_sentence_spans
+BACKENDS = (REGEX_BACKEND, SCAN_BACKEND)
+
+# brackets whose inside is a segment by itself (Segmenter.paren_noseg)
+NOSEG_BRACKETS = {'<': '>', '【': '】', '『': '』', '“': '”'}
+# brackets whose inside is not split (as split_punctuation of ja_sentence_segmenter)
+NOSPLIT_BRACKETS = {'「': '」', '(': ')'}
+# a sentence is not split before these chars (adjust_over_segmentation)
+NOSPLIT_BEFORE = PERIODS + ')）'
+
+_SPECIAL_CHARS = re.compile('[' + re.escape(
+    PERIODS + ''.join(o + c for o, c in (NOSEG_BRACKETS | NOSPLIT_BRACKETS).items())) + ']')
+# texts with the escape char of ja_sentence_segmenter or line boundaries of
+# str.splitlines, which the splitter drops, are left to the regex backend
+_FALLBACK_CHARS = re.compile('[∯\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]')
+
 
 class Segmenter(object):
     def __init__(
             self,
             # split_punct: bool = True,
+            cache_size: int = 0,
+            backend: str = REGEX_BACKEND,
     ):
+        if not backend in BACKENDS:
+            raise ValueError(f'Unknown backend: {backend}')
+        self.backend = backend
+
         self.segmenter = functools.partial(split_punctuation, punctuations=r'。！？!?')
         self.paren_noseg = re.compile(r'(<[^<>]*>)|(【[^【】]*】)|(『[^『』]*』)|(“[^“”]*”)')
 
+        # spans of recently segmented texts; boilerplate lines repeat in corpora
+        self.cache_size = cache_size
+        if cache_size:
+            self._get_spans = functools.lru_cache(maxsize=cache_size)(self._get_spans_uncached)
+        else:
+            self._get_spans = self._get_spans_uncached
+
+
+    def get_spans(self, text: str) -> Tuple[Tuple[int, int], ...]:
+        """Return the (begin, end) offsets of the sentences in text.
+
+        The result is the same as the offsets of the sentences returned by
+        `sentencize`, and is shared among calls for the same text if cached.
+        """
+
+        return self._get_spans(text)
+
+
+    def get_spans_batch(
+            self,
+            texts: Iterable[str],
+            jobs: int = 1,
+    ) -> list[Tuple[Tuple[int, int], ...]]:
+        """Return the sentence offsets of each text.
+
+        If jobs > 1, distinct texts are segmented by a pool of `jobs` processes
+        created for this call, which pays off only for large batches.
+        """
+
+        texts = list(texts)
+        if jobs == 1:
+            return [self._get_spans(text) for text in texts]
+
+        unique_texts = list(dict.fromkeys(texts))
+        chunksize = max(1, len(unique_texts) // (jobs * 16))
+        with ProcessPoolExecutor(
+                max_workers=jobs, initializer=_init_worker, initargs=(self.cache_size, self.backend)
+        ) as executor:
+            text2spans = dict(zip(
+                unique_texts, executor.map(_get_spans_in_worker, unique_texts, chunksize=chunksize)))
+
+        return [text2spans[text] for text in texts]
+
+
+    def cache_info(self):
+        return self._get_spans.cache_info() if self.cache_size else None
+
+
+    def _get_spans_uncached(self, text: str) -> Tuple[Tuple[int, int], ...]:
+        if self.backend == SCAN_BACKEND:
+            spans = scan_sentence_spans(text)
+            if spans is not None:
+                return tuple(spans)
+
+        # sentences are searched in order since line break chars are dropped by the splitter
+        spans = []
+        end = 0
+        for sentence in self.sentencize(text):
+            begin = text.find(sentence, end)
+            assert begin >= 0, f'Sentence not found in text: {sentence}'
+            end = begin + len(sentence)
+            spans.append((begin, end))
+        return tuple(spans)
+
 
-    # ja_sentence_segmenter で非対応の括弧表現、連続する同一終端記号に対する処理を補正
     def sentencize(self, text: str) -> list[str]:
+        if self.backend == SCAN_BACKEND:
+            spans = scan_sentence_spans(text)
+            if spans is not None:
+                return [text[begin:end] for begin, end in spans]
+
+        return self._sentencize_by_regex(text)
+
+
+    # ja_sentence_segmenter で非対応の括弧表現、連続する同一終端記号に対する処理を補正
+    def _sentencize_by_regex(self, text: str) -> list[str]:
         segments = []
      
         matches = list(self.paren_noseg.finditer(text))
@@ -82,11 +182,161 @@ def adjust_over_segmentation(texts):
     return new_texts
 
 
-if __name__ == '__main__':
+def scan_sentence_spans(text: str) -> list[Tuple[int, int]]:
+    """Return the sentence offsets in text by a single scan of its special chars.
+
+    The result is the same as that of the regex backend of `Segmenter`, but
+    bracket pairs and split points are found from the positions of brackets
+    and periods without building intermediate strings. Return None if text
+    contains a char that the regex backend handles specially (see
+    `_FALLBACK_CHARS`).
+    """
+
+    if _FALLBACK_CHARS.search(text):
+        return None
+
+    events = [(m.start(), m.group()) for m in _SPECIAL_CHARS.finditer(text)]
+
+    # regions of NOSEG_BRACKETS: as with finditer of Segmenter.paren_noseg, an
+    # opener is paired with the next bracket of the same kind if it is a
+    # closer, and non-overlapping pairs are taken from the leftmost one
+    candidates = _find_bracket_pairs(events, NOSEG_BRACKETS)
+    candidates.sort()
+    regions = []
+    for begin, end in candidates:
+        if not regions or regions[-1][1] <= begin:
+            regions.append((begin, end))
+
+    # each region is a segment and the chunks between regions are split
+    spans = []
+    n_events = len(events)
+    i = 0
+    chunk_begin = 0
+    for region_begin, region_end in regions + [(len(text), len(text))]:
+        j = i
+        while j < n_events and events[j][0] < region_begin:
+            j += 1
+        if chunk_begin < region_begin:
+            _split_chunk(text, chunk_begin, region_begin, events[i:j], spans)
+
+        i = j
+        while i < n_events and events[i][0] < region_end:
+            i += 1
+        if region_begin < region_end:
+            spans.append((region_begin, region_end))
+        chunk_begin = region_end
+
+    return spans
+
+
+def _find_bracket_pairs(
+        events: list[Tuple[int, str]],
+        brackets: dict[str, str],
+) -> list[Tuple[int, int]]:
+    """Return the (begin, end) of each opener followed by a closer of the same kind
+    without another bracket of the kind in between."""
+
+    closer2opener = {closer: opener for opener, closer in brackets.items()}
+    pending = {}
+    pairs = []
+    for pos, char in events:
+        if char in brackets:
+            pending[char] = pos
+        elif char in closer2opener:
+            begin = pending.pop(closer2opener[char], None)
+            if begin is not None:
+                pairs.append((begin, pos + 1))
+    return pairs
+
+
+def _split_chunk(
+        text: str,
+        begin: int,
+        end: int,
+        events: list[Tuple[int, str]],
+        spans: list[Tuple[int, int]],
+) -> None:
+    """Append the sentence offsets in text[begin:end] to spans."""
+
+    # periods inside NOSPLIT_BRACKETS are not split points
+    protected = _find_bracket_pairs(events, NOSPLIT_BRACKETS)
+    protected.sort()
+    k = 0
+    n_protected = len(protected)
+    protected_end = 0
+
+    sen_begin = begin
+    for pos, char in events:
+        if not char in PERIODS:
+            continue
+
+        while k < n_protected and protected[k][0] < pos:
+            protected_end = max(protected_end, protected[k][1])
+            k += 1
+        if pos < protected_end:
+            continue
+
+        # consecutive periods and closing parentheses are kept in a sentence
+        if pos + 1 < end and not text[pos+1] in NOSPLIT_BEFORE:
+            spans.append((sen_begin, pos + 1))
+            sen_begin = pos + 1
+
+    spans.append((sen_begin, end))
+
+
+# segmenter of a worker process of Segmenter.get_spans_batch
+_worker_segmenter = None
+
+
+def _init_worker(
+        cache_size: int,
+        backend: str,
+) -> None:
+
+    global _worker_segmenter
+    _worker_segmenter = Segmenter(cache_size=cache_size, backend=backend)
+
+
+def _get_spans_in_worker(
+        text: str,
+) -> Tuple[Tuple[int, int], ...]:
+
+    return _worker_segmenter.get_spans(text)
+
+
+def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument('-t', '--text', required=True)
+    parser.add_argument('-t', '--text')
+    parser.add_argument('-i', '--input_path')
+    parser.add_argument('-j', '--jobs', type=int, default=1)
+    parser.add_argument('--cache_size', type=int, default=0)
+    parser.add_argument('--backend', choices=BACKENDS, default=REGEX_BACKEND)
+    parser.add_argument('--output_spans', action='store_true')
     args = parser.parse_args()
 
-    segmenter = Segmenter()
-    print(segmenter.sentencize(args.text))
+    if bool(args.text) == bool(args.input_path):
+        parser.error('Specify either --text or --input_path.')
 
+    segmenter = Segmenter(cache_size=args.cache_size, backend=args.backend)
+
+    if args.text:
+        print(segmenter.sentencize(args.text))
+        return
+
+    # segment each line of the input file; sentences (or their offsets in the
+    # line) are printed one per line and texts are separated by an empty line
+    with open(args.input_path) as f:
+        texts = [line.rstrip('\n') for line in f]
+
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count()
+    for text, spans in zip(texts, segmenter.get_spans_batch(texts, jobs=jobs)):
+        for begin, end in spans:
+            if args.output_spans:
+                sys.stdout.write(f'{begin}\t{end}\n')
+            else:
+                sys.stdout.write(f'{text[begin:end]}\n')
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
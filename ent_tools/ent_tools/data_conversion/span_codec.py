@@ -0,0 +1,306 @@
+from itertools import accumulate
+from typing import Iterable, Sequence, Tuple
+
+import numpy as np
+
+from ent_tools.util.constants import NON_ENTITY, SENS, SEN_ID, TXT, MEN_IDS, MENS, SPAN, ENT_TYPE
+
+
+BIO   = 'BIO'
+BIOES = 'BIOES'
+BILOU = 'BILOU'
+SCHEMES = (BIO, BIOES, BILOU)
+
+# scheme -> prefixes of (the first unit, inner units, the last unit, a single-unit span)
+SCHEME_PREFIXES = {
+    BIO:   ('B', 'I', 'I', 'B'),
+    BIOES: ('B', 'I', 'E', 'S'),
+    BILOU: ('B', 'I', 'L', 'U'),
+}
+
+# prefix codes in the lookup tables of TagSet
+OUTSIDE_CODE = 0
+BEGIN_CODE   = 1
+INSIDE_CODE  = 2
+LAST_CODE    = 3
+UNIT_CODE    = 4
+PREFIX_CODES = {'B': BEGIN_CODE, 'I': INSIDE_CODE, 'E': LAST_CODE, 'L': LAST_CODE, 'S': UNIT_CODE, 'U': UNIT_CODE}
+
+# (begin, end, label) of a span over units (chars or tokens), end exclusive
+Span = Tuple[int, int, str]
+
+
+def split_tag(
+        tag: str,
+) -> Tuple[str, str]:
+    """Return (prefix, label) of a tag such as `B-City`, or (NON_ENTITY, None) for NON_ENTITY.
+
+    Raise ValueError if the tag is not of any scheme.
+    """
+
+    if tag == NON_ENTITY:
+        return NON_ENTITY, None
+
+    prefix, sep, label = tag.partition('-')
+    if not sep or not prefix in PREFIX_CODES:
+        raise ValueError(f'Invalid tag: {tag}')
+    return prefix, label
+
+
+def decode_tags(
+        tags: Iterable[str],
+) -> list[Span]:
+    """Return the spans over units represented by a sequence of tags.
+
+    Tags of all schemes are accepted. A span starts at a B/S/U tag, at a tag
+    after NON_ENTITY or an E/L/S/U tag, or at a tag whose label differs from
+    the previous one, and continues while the following tags are I/E/L tags
+    of the same label; for BIO tags this is the same as
+    `data_conversion.util.get_spans_from_BIO_seq`.
+    """
+
+    spans = []
+    begin = -1
+    cur_label = None
+    closed = False      # whether the previous tag ends a span
+    i = -1
+    for i, tag in enumerate(tags):
+        prefix, label = split_tag(tag)
+        if label is None:
+            if cur_label is not None:
+                spans.append((begin, i, cur_label))
+                cur_label = None
+            continue
+
+        code = PREFIX_CODES[prefix]
+        if cur_label is None or closed or code == BEGIN_CODE or code == UNIT_CODE or label != cur_label:
+            if cur_label is not None:
+                spans.append((begin, i, cur_label))
+            begin = i
+            cur_label = label
+        closed = code == LAST_CODE or code == UNIT_CODE
+
+    if cur_label is not None:
+        spans.append((begin, i + 1, cur_label))
+    return spans
+
+
+def encode_spans(
+        length: int,
+        spans: Iterable[Span],
+        scheme: str = BIO,
+) -> list[str]:
+    """Return the tags of `length` units representing the spans in the scheme.
+
+    Raise ValueError if a span is empty, out of the units, or overlaps another.
+    """
+
+    first, inside, last, unit = SCHEME_PREFIXES[scheme]
+    tags = [NON_ENTITY] * length
+    for begin, end, label in spans:
+        if not 0 <= begin < end <= length:
+            raise ValueError(f'Invalid span: {(begin, end, label)} for {length} units')
+        if any(tag != NON_ENTITY for tag in tags[begin:end]):
+            raise ValueError(f'Overlapping span: {(begin, end, label)}')
+
+        if end - begin == 1:
+            tags[begin] = f'{unit}-{label}'
+            continue
+
+        tags[begin] = f'{first}-{label}'
+        for i in range(begin + 1, end - 1):
+            tags[i] = f'{inside}-{label}'
+        tags[end-1] = f'{last}-{label}'
+    return tags
+
+
+def get_token_offsets(
+        words: Sequence[str],
+) -> list[int]:
+    """Return the char offsets of the beginnings of the words and the end of the last word."""
+
+    return [0] + list(accumulate(len(word) for word in words))
+
+
+def decode_token_tags(
+        words: Sequence[str],
+        tags: Iterable[str],
+) -> list[Span]:
+    """Return the char-level spans represented by the tags of the words."""
+
+    offsets = get_token_offsets(words)
+    return [(offsets[begin], offsets[end], label) for begin, end, label in decode_tags(tags)]
+
+
+def encode_token_spans(
+        words: Sequence[str],
+        spans: Iterable[Span],
+        scheme: str = BIO,
+) -> list[str]:
+    """Return the tags of the words representing char-level spans in the scheme.
+
+    Raise ValueError if a span does not begin and end at word boundaries.
+    """
+
+    offset2idx = {offset: i for i, offset in enumerate(get_token_offsets(words))}
+    token_spans = []
+    for begin, end, label in spans:
+        if not (begin in offset2idx and end in offset2idx):
+            raise ValueError(f'Span not aligned with words: {(begin, end, label)}')
+        token_spans.append((offset2idx[begin], offset2idx[end], label))
+    return encode_spans(len(words), token_spans, scheme=scheme)
+
+
+class TagSet:
+    """Vocabulary of tags with lookup tables from tag ids to prefix codes and label ids.
+
+    Tags are added on the fly by `get_id`, and the tables are rebuilt when
+    they are used after new tags are added.
+    """
+
+    def __init__(
+            self,
+            labels: Iterable[str] = (),
+            scheme: str = BIO,
+    ):
+        self.itos = [NON_ENTITY]
+        self.stoi = {NON_ENTITY: 0}
+        self.labels = []
+        self.label2id = {}
+        for label in labels:
+            for prefix in dict.fromkeys(SCHEME_PREFIXES[scheme]):
+                self.get_id(f'{prefix}-{label}')
+
+        self._prefix_codes = None
+        self._label_ids = None
+
+
+    def get_id(self, tag: str) -> int:
+        if not tag in self.stoi:
+            _, label = split_tag(tag)
+            if not label in self.label2id:
+                self.label2id[label] = len(self.labels)
+                self.labels.append(label)
+            self.stoi[tag] = len(self.itos)
+            self.itos.append(tag)
+        return self.stoi[tag]
+
+
+    def get_ids(self, tags: Iterable[str]) -> np.ndarray:
+        return np.array([self.get_id(tag) for tag in tags], dtype=np.int32)
+
+
+    def get_tables(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the arrays that map tag ids to prefix codes and to label ids (-1 for NON_ENTITY)."""
+
+        if self._prefix_codes is None or len(self._prefix_codes) != len(self.itos):
+            prefix_codes = np.zeros(len(self.itos), dtype=np.int8)
+            label_ids = np.full(len(self.itos), -1, dtype=np.int32)
+            for tag_id, tag in enumerate(self.itos):
+                prefix, label = split_tag(tag)
+                if label is not None:
+                    prefix_codes[tag_id] = PREFIX_CODES[prefix]
+                    label_ids[tag_id] = self.label2id[label]
+            self._prefix_codes = prefix_codes
+            self._label_ids = label_ids
+        return self._prefix_codes, self._label_ids
+
+
+def decode_batch(
+        tag_ids_batch: Sequence[Sequence[int]],
+        tagset: TagSet,
+        words_batch: Sequence[Sequence[str]] = None,
+) -> list[list[Span]]:
+    """Return the spans of each sequence of tag ids, as `decode_tags` does for tags.
+
+    The sequences are concatenated and decoded at once by looking up the
+    prefix codes and labels of the tag ids in the tables of tagset. Spans are
+    over units, or over chars if the words of the sequences are given.
+    """
+
+    lengths = np.array([len(tag_ids) for tag_ids in tag_ids_batch], dtype=np.int64)
+    seq_begins = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=seq_begins[1:])
+    if seq_begins[-1] == 0:
+        return [[] for _ in tag_ids_batch]
+
+    prefix_codes, label_ids = tagset.get_tables()
+    ids = np.concatenate([np.asarray(tag_ids, dtype=np.int64) for tag_ids in tag_ids_batch])
+    codes = prefix_codes[ids]
+    labels = label_ids[ids]
+
+    is_first = np.zeros(len(ids), dtype=bool)     # the first unit of a sequence
+    is_first[seq_begins[:-1][lengths > 0]] = True
+    inside = codes != OUTSIDE_CODE
+
+    prev_codes = np.empty_like(codes)
+    prev_codes[0] = OUTSIDE_CODE
+    prev_codes[1:] = codes[:-1]
+    prev_labels = np.empty_like(labels)
+    prev_labels[0] = -1
+    prev_labels[1:] = labels[:-1]
+
+    starts = inside & (
+        is_first
+        | (codes == BEGIN_CODE) | (codes == UNIT_CODE)
+        | (prev_codes == OUTSIDE_CODE) | (prev_codes == LAST_CODE) | (prev_codes == UNIT_CODE)
+        | (prev_labels != labels)
+    )
+    # a span ends before the next unit unless the next unit continues it
+    ends = inside.copy()
+    ends[:-1] &= starts[1:] | ~inside[1:] | is_first[1:]
+
+    begin_idxs = np.flatnonzero(starts)
+    end_idxs = np.flatnonzero(ends) + 1
+    seq_idxs = np.searchsorted(seq_begins, begin_idxs, side='right') - 1
+
+    if words_batch is None:
+        begin_offsets = begin_idxs - seq_begins[seq_idxs]
+        end_offsets = end_idxs - seq_begins[seq_idxs]
+    else:
+        # char offsets of the units in their sequences
+        word_lengths = np.array([len(word) for words in words_batch for word in words], dtype=np.int64)
+        assert len(word_lengths) == len(ids), 'Numbers of words and tags differ'
+        char_offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum(word_lengths, out=char_offsets[1:])
+        seq_char_begins = char_offsets[seq_begins[seq_idxs]]
+        begin_offsets = char_offsets[begin_idxs] - seq_char_begins
+        end_offsets = char_offsets[end_idxs] - seq_char_begins
+
+    span_labels = [tagset.labels[label_id] for label_id in labels[begin_idxs].tolist()]
+    spans = list(zip(begin_offsets.tolist(), end_offsets.tolist(), span_labels))
+
+    batch = []
+    span_begins = np.searchsorted(seq_idxs, np.arange(len(lengths) + 1)).tolist()
+    for i in range(len(lengths)):
+        batch.append(spans[span_begins[i]:span_begins[i+1]])
+    return batch
+
+
+def gen_doc_dict_from_spans(
+        texts: Sequence[str],
+        spans_batch: Sequence[Iterable[Span]],
+) -> dict:
+    """Return the document dict of sentences and their char-level spans as mentions.
+
+    Sentence and mention ids are sequential numbers in the document.
+    """
+
+    doc_dict  = {SENS: {}, MENS: {}}
+    men_id_num = 0
+    for sen_id_num, (text, spans) in enumerate(zip(texts, spans_batch)):
+        sen_id = f'{sen_id_num+1:03d}'
+        sen_dict = {TXT: text, MEN_IDS: []}
+        doc_dict[SENS][sen_id] = sen_dict
+
+        for begin, end, label in spans:
+            men_id_num += 1
+            men_id = f'{men_id_num:03d}'
+            men_dict = {SEN_ID: sen_id,
+                        SPAN: (begin, end),
+                        ENT_TYPE: label,
+                        TXT: text[begin:end],}
+            doc_dict[MENS][men_id] = men_dict
+            sen_dict[MEN_IDS].append(men_id)
+
+    return doc_dict
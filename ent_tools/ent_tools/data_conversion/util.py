@@ -1,13 +1,14 @@
 from logzero import logger
 
-from ent_tools.util.constants import NON_ENTITY
+from ent_tools.util.data_io import open_file
+from ent_tools.data_conversion.span_codec import decode_token_tags
 
 
 def read_tsv(
         tsv_path: str,
 ) -> None:
 
-    with open(tsv_path) as f:
+    with open_file(tsv_path) as f:
         logger.info(f'Read: {tsv_path}')
         for line in f:
             line = line.rstrip('\n')
@@ -31,40 +32,4 @@ def get_spans_from_BIO_seq(
         labels: list,
 ) -> list:
 
-    spans = []
-    span_begin = -1
-    char_idx = 0
-    prev_tag  = None
-    prev_cate = None
-    for word, label in zip(words, labels):
-        if label != NON_ENTITY:
-            tag, cate = label.split('-')
-
-            if prev_cate == None: # None VS B/I-X
-                span_begin = char_idx
-                prev_tag   = tag
-                prev_cate  = cate
-
-            elif prev_cate != cate or tag == 'B': # B/I-X VS B/I-Y or B-X
-                spans.append((span_begin, char_idx, prev_cate))
-                span_begin = char_idx
-                prev_tag   = tag
-                prev_cate  = cate
-
-            elif tag == 'I':    # B/I-X VS B-X
-                pass
-
-        else:
-            if prev_cate != None: # B/I-X VS None
-                spans.append((span_begin, char_idx, prev_cate))
-                span_begin = -1
-                prev_tag   = None
-                prev_cate  = None
-
-        char_idx += len(word)
-
-    if prev_cate is not None:
-        len_sen = len(''.join([w for w in words]))
-        spans.append((span_begin, len_sen, prev_cate))
-
-    return spans
+    return decode_token_tags(words, labels)
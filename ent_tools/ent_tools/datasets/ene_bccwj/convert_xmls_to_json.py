@@ -1,13 +1,20 @@
 import argparse
-import json
+from bisect import bisect_right
+from contextlib import ExitStack, closing
 import os
 import re
+import sys
 import xml.etree.ElementTree as ET
-from typing import Tuple
+from typing import Iterator, Tuple
 
 from logzero import logger
 
 from ent_tools.util.constants import NON_ENTITY, SENS, TXT, MEN_IDS, MENS, SEN_ID, SPAN, ENT_TYPE
+from ent_tools.util.conversion_cache import (
+    ConversionCache, get_doc_hash, get_temporary_path, open_previous_docs, save_output_with_cache,
+)
+from ent_tools.util.data_io import JsonWriter, open_file, strip_compression_suffix
+from ent_tools.util.parallel import map_in_batches
 
 
 def load_id_list(
@@ -16,7 +23,7 @@ def load_id_list(
 
     id_list = []
 
-    with open(path) as f:
+    with open_file(path) as f:
         for line in f:
             line = line.strip('\n')
 
@@ -140,7 +147,7 @@ def parse_xml(
 ) -> None:
 
     logger.info(f'Read: {xml_path}')
-    with open(xml_path) as f:
+    with open_file(xml_path) as f:
         in_text = False
 
         doc_id = None
@@ -215,58 +222,378 @@ def parse_xml(
         id2doc[doc_id] = {SENS: sentences, MENS: mentions}
 
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument('-x', '--xml_top_dir', required=True)
-    parser.add_argument('-j', '--json_output_path', required=True)
-    parser.add_argument('-i',  '--id_list_path')
-    parser.add_argument('--exclude_domains')
-    args = parser.parse_args()
+def iter_docs_in_xml(
+        xml_path: str,
+) -> Iterator[Tuple[str, dict]]:
+    """Yield (doc_id, doc) of a file parsed line by line by `parse_xml`."""
 
-    id_list = None
     id2doc = {}
+    parse_xml(xml_path, id2doc)
+    yield from id2doc.items()
+
+
+DOC_TAG  = 'DOC'
+ID_TAG   = 'ID'
+TEXT_TAG = 'TEXT'
+REJECTED_BLOCK_TAG = 'rejectedBlock'
+
+
+def collect_text_and_mentions(
+        elem: ET.Element,
+        pieces: list[str],
+        mentions: list[Tuple[int, int, str]],
+        offset: int = 0,
+) -> int:
+    """Append the text inside elem to pieces and (begin, end, tag) of each
+    element inside elem to mentions, and return the end offset of the text.
+
+    Nested elements are separate mentions, which follow the outer one.
+    rejectedBlock elements and their text are skipped.
+    """
+
+    if elem.text:
+        pieces.append(elem.text)
+        offset += len(elem.text)
+
+    for child in elem:
+        if child.tag != REJECTED_BLOCK_TAG:
+            idx = len(mentions)
+            mentions.append(None)   # filled after the inner mentions are added
+            begin = offset
+            offset = collect_text_and_mentions(child, pieces, mentions, offset)
+            mentions[idx] = (begin, offset, child.tag)
+
+        if child.tail:
+            pieces.append(child.tail)
+            offset += len(child.tail)
+
+    return offset
+
+
+def gen_doc_dict_from_text(
+        text: str,
+        mentions: list[Tuple[int, int, str]],
+) -> dict:
+    """Generate a document dict from the text of TEXT and the mentions in it.
+
+    Each line is a sentence and empty lines are skipped. Lines joined by a
+    mention across a line break are a sentence without the line break, as
+    `parse_xml` joins lines with incomplete tags.
+    """
+
+    # line breaks inside mentions do not end sentences
+    covered = []
+    for begin, end, _ in sorted(mentions):
+        if covered and begin < covered[-1][1]:
+            covered[-1][1] = max(covered[-1][1], end)
+        else:
+            covered.append([begin, end])
+    covered_begins = [begin for begin, _ in covered]
+
+    def is_boundary(pos: int) -> bool:
+        idx = bisect_right(covered_begins, pos) - 1
+        return idx < 0 or covered[idx][1] <= pos
+
+    # (begin, end) of the text of each sentence including the inner line breaks
+    sen_spans = []
+    sen_begin = 0
+    for m in re.finditer('\n', text):
+        if is_boundary(m.start()):
+            sen_spans.append((sen_begin, m.start()))
+            sen_begin = m.end()
+    sen_spans.append((sen_begin, len(text)))
+
+    sentences = {}
+    mentions_dict  = {}
+    sen_begins = [begin for begin, _ in sen_spans]
+    sen_mentions = [[] for _ in sen_spans]
+    for begin, end, tag in mentions:
+        if begin < end:
+            sen_mentions[bisect_right(sen_begins, begin) - 1].append((begin, end, tag))
+
+    sen_id = 0
+    men_id = 0
+    for (sen_begin, sen_end), men_list in zip(sen_spans, sen_mentions):
+        sen_text = text[sen_begin:sen_end]
+        # offsets of the inner line breaks, which are removed from the sentence
+        breaks = [sen_begin + m.start() for m in re.finditer('\n', sen_text)]
+        sen_text = sen_text.replace('\n', '')
+        if not sen_text:
+            continue
+
+        sen_id += 1
+        sen_dict_key = f'S{sen_id}'
+        men_ids = []
+        for begin, end, tag in men_list:
+            span = (begin - sen_begin - bisect_right(breaks, begin),
+                    end - sen_begin - bisect_right(breaks, end - 1))
+            men_id += 1
+            men_dict_key = f'M{men_id}'
+            men_ids.append(men_dict_key)
+            mentions_dict[men_dict_key] = {
+                SEN_ID: sen_dict_key,
+                SPAN: span,
+                ENT_TYPE: tag,
+                TXT: sen_text[span[0]:span[1]]}
+
+        sentences[sen_dict_key] = {
+            TXT: sen_text,
+            MEN_IDS: men_ids}
+
+    return {SENS: sentences, MENS: mentions_dict}
+
+
+def iterparse_xml(
+        xml_path: str,
+) -> Iterator[Tuple[str, dict]]:
+    """Yield (doc_id, doc) for each DOC element of a file parsed in a streaming pass.
 
-    if args.id_list_path:
-        id_list = load_id_list(args.id_list_path)
+    Each DOC element is converted when its end tag is read and then cleared,
+    so that the tree of the whole file is not held in memory.
+    """
 
-    all_domains = ['OC', 'OW', 'OY', 'PB', 'PM', 'PN']
-    if args.exclude_domains:
-        domains = set(all_domains) - set(args.exclude_domains.split(','))
-        domains = sorted(domains)
+    logger.info(f'Read: {xml_path}')
+    with open_file(xml_path, 'rb') as f:
+        for _, elem in ET.iterparse(f, events=('end',)):
+            if elem.tag != DOC_TAG:
+                continue
 
-    else:
-        domains = all_domains
+            id_elem = elem.find(ID_TAG)
+            text_elem = elem.find(TEXT_TAG)
+            doc_id = id_elem.text.strip() if id_elem is not None and id_elem.text else None
+
+            pieces = []
+            mentions = []
+            if text_elem is not None:
+                collect_text_and_mentions(text_elem, pieces, mentions)
+            doc = gen_doc_dict_from_text(''.join(pieces), mentions)
 
+            elem.clear()
+            yield doc_id, doc
+
+
+ALL_DOMAINS = ['OC', 'OW', 'OY', 'PB', 'PM', 'PN']
+
+
+def get_xml_paths(
+        xml_top_dir: str,
+        domains: list[str],
+        id2splits: dict[str, list[int]] = None,
+) -> list[Tuple[str, list[int]]]:
+    """Return (path, indices of the splits) of the xml files in the domains.
+
+    If id2splits is given, only the files whose ids are in it are returned,
+    with the splits that list the ids; otherwise every file is in split 0.
+    """
+
+    xml_paths = []
     for domain in domains:
-        dir_path = f'{args.xml_top_dir}/{domain}'
-        for file_name in os.listdir(dir_path):
+        dir_path = f'{xml_top_dir}/{domain}'
+        for file_name in sorted(os.listdir(dir_path)):
             file_id = file_name.split('.xml')[0]
             file_path = f'{dir_path}/{file_name}'
 
-            if (not id_list
-                or (id_list and file_id in id_list)
-            ):
-                if file_path.endswith('.xml'):
-                    parse_xml(file_path, id2doc)
+            if id2splits is None:
+                splits = [0]
+            elif file_id in id2splits:
+                splits = id2splits[file_id]
+            else:
+                logger.info(f'Skipped: {file_path}')
+                continue
+
+            if strip_compression_suffix(file_path).endswith('.xml'):
+                xml_paths.append((file_path, splits))
+
+    return xml_paths
+
+
+# parser of the xml files converted in a worker process
+_worker_iter_docs = None
+
+
+def _init_worker(
+        line_parser: bool,
+) -> None:
+
+    global _worker_iter_docs
+    # the line-based parser keeps only the outermost tags, as in older corpora
+    _worker_iter_docs = iter_docs_in_xml if line_parser else iterparse_xml
 
+
+def _convert_in_worker(
+        item: Tuple[str, list[int]],
+) -> list[Tuple[str, dict]]:
+
+    xml_path, _ = item
+    return list(_worker_iter_docs(xml_path))
+
+
+def convert_xmls(
+        xml_paths: list[Tuple[str, list[int]]],
+        output_paths: list[str],
+        jobs: int = 1,
+        batch_size: int = 64,
+        line_parser: bool = False,
+        compact: bool = False,
+        cache: ConversionCache = None,
+) -> list[Tuple[str, str]]:
+    """Convert the xml files and write each document to the output files of its splits.
+
+    Every file is parsed once, by `jobs` worker processes, and the documents
+    are written in the order of the files as they are converted. Return the
+    list of (xml path, error message) for the files that failed to be parsed.
+
+    If cache is given, the documents of a file unchanged since the last run
+    are taken from the previous output of one of its splits (see
+    `ConversionCache.get_docs`) and only the other files are parsed. The
+    outputs are then written to temporary paths and replace the previous ones
+    at the end.
+    """
+
+    options = {'line_parser': line_parser}
+    if cache:
+        write_paths = [get_temporary_path(output_path) for output_path in output_paths]
+    else:
+        write_paths = output_paths
+
+    writers = []
+    doc_ids = [set() for _ in output_paths]
+    stats = [[0, 0, 0] for _ in output_paths]  # documents, sentences and mentions
+    errors = []
+    n_reused = 0
+    with ExitStack() as stack:
+        prev_docs = [{} for _ in output_paths]
+        if cache:
+            for split, output_path in enumerate(output_paths):
+                prev_docs[split] = stack.enter_context(open_previous_docs(
+                    cache, output_path,
+                    [xml_path for xml_path, splits in xml_paths if split in splits], options))
+
+        # files whose documents may be reused are not sent to the workers
+        reusable = [
+            bool(cache) and cache.is_valid(xml_path, [xml_path], options)
+            and any(prev_docs[split] for split in splits)
+            for xml_path, splits in xml_paths
+        ]
+        results = stack.enter_context(closing(map_in_batches(
+            _convert_in_worker,
+            [item for item, reuse in zip(xml_paths, reusable) if not reuse],
+            jobs=jobs, batch_size=batch_size,
+            initializer=_init_worker, initargs=(line_parser,))))
+
+        for write_path in write_paths:
+            writers.append(stack.enter_context(JsonWriter(write_path, compact=compact)))
+
+        for (xml_path, splits), reuse in zip(xml_paths, reusable):
+            docs = None
+            if reuse:
+                for split in splits:
+                    docs = cache.get_docs(xml_path, prev_docs[split], options)
+                    if docs is not None:
+                        n_reused += 1
+                        break
+                else:
+                    # the documents in the previous outputs differ (e.g., duplicated ones
+                    # taken from another file), so the file is parsed in this process
+                    _, docs, error = next(map_in_batches(
+                        _convert_in_worker, [(xml_path, splits)],
+                        initializer=_init_worker, initargs=(line_parser,)))
+                    reuse = False
             else:
-                logger.info(f'Skipped: {file_path}')                
+                _, docs, error = next(results)
 
-    with open(args.json_output_path, 'w') as fw:
-        json.dump(id2doc, fw, ensure_ascii=False, indent=2)
-        logger.info(f'Saved: {args.json_output_path}')
+            if not reuse:
+                if error:
+                    logger.error(f'Failed to convert {xml_path}: {error}')
+                    errors.append((xml_path, error))
+                    if cache:
+                        cache.remove(xml_path)
+                    continue
 
-    n_doc = len(id2doc)
-    n_sen = 0
-    n_men = 0
+                if cache:
+                    cache.update_docs(xml_path, {doc_id: get_doc_hash(doc) for doc_id, doc in docs}, options)
 
-    for doc_id, doc in id2doc.items():
-        n_sen += len(doc[SENS].keys())
-        n_men += len(doc[MENS].keys())
+            for doc_id, doc in docs:
+                for split in splits:
+                    if doc_id in doc_ids[split]:
+                        logger.warning(f'Skip a duplicated document {doc_id} in {xml_path}')
+                        continue
+                    doc_ids[split].add(doc_id)
 
-    logger.info(f'No. of documents: {n_doc}')
-    logger.info(f'No. of sentences: {n_sen}')
-    logger.info(f'No. of NE mentions:  {n_men}')
+                    writers[split].write(doc_id, doc)
+                    stats[split][0] += 1
+                    stats[split][1] += len(doc[SENS].keys())
+                    stats[split][2] += len(doc[MENS].keys())
+
+    if cache:
+        logger.info(f'Reused documents of {n_reused} unchanged files out of {len(xml_paths)}')
+        for write_path, output_path in zip(write_paths, output_paths):
+            save_output_with_cache(write_path, output_path, cache)
+
+    for output_path, (n_doc, n_sen, n_men) in zip(output_paths, stats):
+        logger.info(f'{output_path}')
+        logger.info(f'No. of documents: {n_doc}')
+        logger.info(f'No. of sentences: {n_sen}')
+        logger.info(f'No. of NE mentions:  {n_men}')
+
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-x', '--xml_top_dir', required=True)
+    parser.add_argument('-j', '--json_output_path', required=True)
+    parser.add_argument('-i',  '--id_list_path')
+    parser.add_argument('--exclude_domains')
+    parser.add_argument('--compact_json', action='store_true')
+    parser.add_argument('--line_parser', action='store_true')
+    parser.add_argument('--cache_path')
+    parser.add_argument('--jobs', type=int, default=1)
+    args = parser.parse_args()
+
+    # splits are given by comma-separated id lists and their output paths
+    output_paths = args.json_output_path.split(',')
+    id2splits = None
+    if args.id_list_path:
+        id_list_paths = args.id_list_path.split(',')
+        if len(id_list_paths) != len(output_paths):
+            parser.error('Specify as many output paths as id lists.')
+
+        id2splits = {}
+        for split, id_list_path in enumerate(id_list_paths):
+            for file_id in load_id_list(id_list_path):
+                splits = id2splits.setdefault(file_id, [])
+                if not split in splits:
+                    splits.append(split)
+
+    elif len(output_paths) > 1:
+        parser.error('Specify an id list for each output path.')
+
+    if args.exclude_domains:
+        domains = set(ALL_DOMAINS) - set(args.exclude_domains.split(','))
+        domains = sorted(domains)
+
+    else:
+        domains = ALL_DOMAINS
+
+    xml_paths = get_xml_paths(args.xml_top_dir, domains, id2splits)
+
+    if args.cache_path:
+        # reuse the documents of unchanged xml files in the previous outputs
+        cache = ConversionCache(args.cache_path)
+    else:
+        cache = None
+
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count()
+    errors = convert_xmls(
+        xml_paths, output_paths,
+        jobs=jobs,
+        line_parser=args.line_parser,
+        compact=args.compact_json,
+        cache=cache,
+    )
+    if errors:
+        sys.exit(1)
 
 
 if __name__ == '__main__':
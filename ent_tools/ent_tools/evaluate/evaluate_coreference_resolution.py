@@ -6,12 +6,11 @@ from logzero import logger
 from ent_tools.util.constants import (
     SENS, MENS, ENTS, SEN_ID, ENT_ID, TXT, MEM_MEN_IDS, SPAN, ENT_TYPE, HAS_NAME
 )
-from ent_tools.util.data_io import load_json, write_as_json
+from ent_tools.util.data_io import write_as_json
+from ent_tools.util.indexed_corpus import load_corpus
 from ent_tools.evaluate.util import GOLD, PRED, CORRECT
-from ent_tools.evaluate.util import is_overlap, merge_sets, calc_PRF, get_coref_scores_str
-from ent_tools.evaluate.coref_metrics import (
-    Evaluator, get_mention_assignments, muc, b_cubed, ceafe, lea, mentions,
-)
+from ent_tools.evaluate.util import is_overlap, calc_PRF, get_coref_scores_str
+from ent_tools.util.cluster_builder import ClusterBuilder
 
 
 class CountForCoref:
@@ -404,7 +403,7 @@ def modify_pred_mentions_using_gold_mentions_considering_overlap(
     g_span2mid = {}
     g_mids_isolated = set()
     p_mid2ovlp_g_mid = {}    # p -> g;   p is overlapped (often is included) by g
-    list_p_eids_to_merged = []
+    p_eid_clusters = ClusterBuilder()   # pred entities to be merged
 
     # create p_span2mid
     for p_men_id, p_men in pred_mens.items():
@@ -426,7 +425,7 @@ def modify_pred_mentions_using_gold_mentions_considering_overlap(
         p_eids_to_merged = set()
 
         # check overlapping between g_span and each p_span (-> p_spans_overlapped)
-        #   and obtain list_p_eids_to_merged
+        #   and obtain p_eids_to_merged
         for p_span in sorted(p_span2mid.keys()):
             p_men_id = p_span2mid[p_span]
             if (g_span[0] == p_span[0]
@@ -436,7 +435,7 @@ def modify_pred_mentions_using_gold_mentions_considering_overlap(
                 p_ent_id = pred_mens[p_men_id][ENT_ID]
                 p_eids_to_merged.add(p_ent_id)
 
-                list_p_eids_to_merged = merge_sets(list_p_eids_to_merged, p_eids_to_merged)
+        p_eid_clusters.add_cluster(sorted(p_eids_to_merged))
 
         # set p_mid2ovlp_g_mid
         if p_spans_overlapped:
@@ -466,7 +465,7 @@ def modify_pred_mentions_using_gold_mentions_considering_overlap(
 
 
     # add mentions with overlap to pred_ents_new and pred_mens_new
-    list_p_eids = list_p_eids_to_merged
+    list_p_eids = p_eid_clusters.get_clusters()
     for p_eids in list_p_eids:
         p_men_ids_new = set()
 
@@ -622,6 +621,11 @@ def evaluate(
         exclude_singletons: bool = False,
         ignore_labels: set[str] = None,
 ):
+    # coref_metrics depends on numpy and scipy, which are slow to import
+    from ent_tools.evaluate.coref_metrics import (
+        Evaluator, get_mention_assignments, muc, b_cubed, ceafe, lea, mentions,
+    )
+
     doc_coref_info = {}
 
     n_gold_cls = 0
@@ -728,7 +732,7 @@ def evaluate(
     return scores
 
 
-if __name__ == '__main__':
+def main():
     parser = argparse.ArgumentParser()
     parser.add_argument(
         '--gold_path', '-g',
@@ -784,9 +788,12 @@ if __name__ == '__main__':
         ignore_labels = set(args.ignore_labels.split(','))
         logger.info(f'Set ignore_labels as {ignore_labels}.')
 
-    # TODO use target_docids
-    gold_data = load_json(args.gold_path)
-    pred_data = load_json(args.pred_path)
+    target_docids = None
+    if args.target_docids:
+        target_docids = set(args.target_docids.split(','))
+
+    gold_data = load_corpus(args.gold_path, doc_ids=target_docids)
+    pred_data = load_corpus(args.pred_path, doc_ids=target_docids)
 
     gold_ents_list, gold_mens_list, pred_ents_list, pred_mens_list = (
         get_mentions_and_entities_for_eval(
@@ -844,4 +851,8 @@ if __name__ == '__main__':
         print(res_multi)
 
     if args.output_score_path:
-        save_as_json(scores, args.output_score_path)
+        write_as_json(scores, args.output_score_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,13 +4,13 @@ from typing import Tuple
 
 import logzero
 from logzero import logger
-from sklearn.metrics import cohen_kappa_score
 
 from ent_tools.util.constants import (
     MENS, ENTS, SEN_ID, ENT_ID, MEM_MEN_IDS, ENT_TYPE, ENT_TYPE_MRG, TXT, SPAN, 
     HAS_REF, REF_URL, REF_TYPE, NIL
 )
-from ent_tools.util.data_io import load_json, write_as_json
+from ent_tools.util.data_io import write_as_json
+from ent_tools.util.indexed_corpus import load_corpus
 from ent_tools.evaluate.util import GOLD, PRED, CORRECT
 from ent_tools.evaluate.util import get_PRF_scores, get_PRF_scores_str, get_simple_scores_str
 
@@ -160,6 +160,9 @@ def evaluate(
 
     # calc kappa
     if ignore_labels is None or len(ignore_labels) == 0:
+        # scikit-learn is slow to import
+        from sklearn.metrics import cohen_kappa_score
+
         k_score = cohen_kappa_score(gold_ref_seq, pred_ref_seq)
         n_match = sum([1 if g == p else 0 for g, p in zip(gold_ref_seq, pred_ref_seq)])
         n_g_ex  = sum([1 if g != NONEX else 0 for g in zip(gold_ref_seq)])
@@ -177,7 +180,7 @@ def evaluate(
     return scores
 
 
-if __name__ == '__main__':
+def main():
     logzero.loglevel(20)
 
     parser = argparse.ArgumentParser()
@@ -220,7 +223,7 @@ if __name__ == '__main__':
 
     urlmap = load_urlmap(args.urlmap_path) if args.urlmap_path else {}
 
-    target_docids = set()
+    target_docids = None
     if args.target_docids:
         target_docids = set(args.target_docids.split(','))
 
@@ -228,9 +231,8 @@ if __name__ == '__main__':
     if args.ignore_labels:
         ignore_labels = set(args.ignore_labels.split(','))
 
-    # TODO use target_docids
-    gold_data = load_json(args.gold_path)
-    pred_data = load_json(args.pred_path)
+    gold_data = load_corpus(args.gold_path, doc_ids=target_docids)
+    pred_data = load_corpus(args.pred_path, doc_ids=target_docids)
 
     scores = evaluate(
         gold_data, pred_data, 
@@ -248,3 +250,7 @@ if __name__ == '__main__':
 
     if args.output_score_path:
         write_as_json(scores, args.output_score_path)
+
+
+if __name__ == '__main__':
+    main()
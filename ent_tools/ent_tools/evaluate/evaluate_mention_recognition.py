@@ -8,6 +8,7 @@ from ent_tools.util.constants import (
     DOC_ID, SENS, SEN_ID, TXT, MEN_IDS, MENS, SPAN, ENT_TYPE, ANY,
 )
 from ent_tools.util.data_io import load_json, write_as_json
+from ent_tools.util.indexed_corpus import iter_corpus, load_corpus
 from ent_tools.evaluate.util import GOLD, PRED, CORRECT
 from ent_tools.evaluate.util import get_PRF_scores, get_PRF_scores_str
 
@@ -39,48 +40,58 @@ class CountForMR:
             if target_docids and not doc_id in target_docids:
                 continue
 
-            logger.info(f'Count spans for {doc_id}.')
+            pred_doc = pred_data[doc_id] if doc_id in pred_data else None
+            self.update_for_document(doc_id, gold_doc, pred_doc)
 
-            sen_ids = gold_doc[SENS].keys()
-            sen_id2gold_spans = {sen_id: [] for sen_id in sen_ids}
-            sen_id2pred_spans = {sen_id: [] for sen_id in sen_ids}
 
-            for men_id, men in gold_doc[MENS].items():
-                label = men[ENT_TYPE]
-                if self.target_labels:
-                    if self.labelmap:
-                        if (not label in self.labelmap
-                            or not self.labelmap[label] in self.target_labels
-                        ):
-                            continue                            
-                    else:
-                        if not label in self.target_labels:
-                            continue
+    def update_for_document(
+            self,
+            doc_id: str,
+            gold_doc: dict,
+            pred_doc: dict = None,
+    ) -> None:
 
-                if self.ignore_label_difference:
-                    label = ANY
+        logger.info(f'Count spans for {doc_id}.')
 
-                sen_id2gold_spans[men[SEN_ID]].append((men[SPAN][0], men[SPAN][1], label))
+        sen_ids = gold_doc[SENS].keys()
+        sen_id2gold_spans = {sen_id: [] for sen_id in sen_ids}
+        sen_id2pred_spans = {sen_id: [] for sen_id in sen_ids}
 
-            if doc_id in pred_data:
-                pred_doc = pred_data[doc_id]
-                for men_id, men in pred_doc[MENS].items():
-                    label = men[ENT_TYPE]
-                    if (self.target_labels
-                        and not label in self.target_labels
+        for men_id, men in gold_doc[MENS].items():
+            label = men[ENT_TYPE]
+            if self.target_labels:
+                if self.labelmap:
+                    if (not label in self.labelmap
+                        or not self.labelmap[label] in self.target_labels
                     ):
+                        continue                            
+                else:
+                    if not label in self.target_labels:
                         continue
-                
-                    if self.ignore_label_difference:
-                        label = ANY
 
-                    sen_id2pred_spans[men[SEN_ID]].append((men[SPAN][0], men[SPAN][1], label))
+            if self.ignore_label_difference:
+                label = ANY
+
+            sen_id2gold_spans[men[SEN_ID]].append((men[SPAN][0], men[SPAN][1], label))
 
-            else:
-                logger.warning(f'Prediction for {doc_id} is not available.')
+        if pred_doc is not None:
+            for men_id, men in pred_doc[MENS].items():
+                label = men[ENT_TYPE]
+                if (self.target_labels
+                    and not label in self.target_labels
+                ):
+                    continue
+            
+                if self.ignore_label_difference:
+                    label = ANY
+
+                sen_id2pred_spans[men[SEN_ID]].append((men[SPAN][0], men[SPAN][1], label))
+
+        else:
+            logger.warning(f'Prediction for {doc_id} is not available.')
 
-            for sen_id in sen_ids:
-                self.update(sen_id2gold_spans[sen_id], sen_id2pred_spans[sen_id])
+        for sen_id in sen_ids:
+            self.update(sen_id2gold_spans[sen_id], sen_id2pred_spans[sen_id])
 
 
     def update(self, gold_spans, pred_spans):
@@ -171,7 +182,7 @@ def main():
     if args.label_conversion_map_path:
         labelmap = load_json(args.label_conversion_map_path)
 
-    target_docids = set()
+    target_docids = None
     if args.target_docids:
         target_docids = set(args.target_docids.split(','))
 
@@ -190,9 +201,12 @@ def main():
         for label in args.label_display_order.split(','):
             label_display_order.append(label)
 
-    gold_data = load_json(args.gold_path)
-    pred_data = load_json(args.pred_path)
-    count.update_for_dataset(gold_data, pred_data, target_docids=target_docids)
+    # gold documents are streamed one by one; only target documents are decoded
+    # if the data are indexed JSONL files
+    pred_data = load_corpus(args.pred_path, doc_ids=target_docids)
+    for doc_id, gold_doc in iter_corpus(args.gold_path, doc_ids=target_docids):
+        pred_doc = pred_data[doc_id] if doc_id in pred_data else None
+        count.update_for_document(doc_id, gold_doc, pred_doc)
 
     scores = get_PRF_scores(count.counter, label_display_order=label_display_order)
     if args.output_score_path:
@@ -1,6 +1,8 @@
 from collections import Counter
 from typing import Tuple
 
+from ent_tools.util.cluster_builder import merge_clusters
+
 
 GOLD    = 'G'
 PRED    = 'P'
@@ -24,14 +26,7 @@ def merge_sets(
     if y in X:
         return X
 
-    X = [x for x in X]
-    intersecting_sets = [x for x in X if x & y]
-    merged_set = set().union(*intersecting_sets, y)
-
-    X_new = [x for x in X if x not in intersecting_sets]
-    X_new.append(merged_set)
-
-    return X_new
+    return [set(cluster) for cluster in merge_clusters(X + [y])]
 
 
 def calc_PRF(
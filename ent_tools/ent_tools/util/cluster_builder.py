@@ -0,0 +1,111 @@
+from typing import Hashable, Iterable
+
+
+class ClusterBuilder:
+    """Disjoint-set forest that builds clusters of elements linked by relations.
+
+    Elements and relations can be added incrementally. `get_clusters` returns
+    the clusters in the order of their first added elements, and the elements
+    of each cluster in the order of addition, so that the result does not
+    depend on hashing.
+    """
+
+    def __init__(self):
+        self.parent = {}    # element -> parent; the key order is the order of addition
+        self.size = {}      # root -> number of elements in its tree
+
+
+    def __contains__(self, x: Hashable) -> bool:
+        return x in self.parent
+
+
+    def __len__(self) -> int:
+        return len(self.parent)
+
+
+    def add(
+            self,
+            x: Hashable,
+    ) -> None:
+
+        if not x in self.parent:
+            self.parent[x] = x
+            self.size[x] = 1
+
+
+    def find(
+            self,
+            x: Hashable,
+    ) -> Hashable:
+        """Return the root of the tree of x, compressing the path to it."""
+
+        root = x
+        while self.parent[root] != root:
+            root = self.parent[root]
+
+        while x != root:
+            self.parent[x], x = root, self.parent[x]
+
+        return root
+
+
+    def union(
+            self,
+            x: Hashable,
+            y: Hashable,
+    ) -> None:
+
+        self.add(x)
+        self.add(y)
+        root_x = self.find(x)
+        root_y = self.find(y)
+        if root_x == root_y:
+            return
+
+        # attach the smaller tree to the larger one
+        if self.size[root_x] < self.size[root_y]:
+            root_x, root_y = root_y, root_x
+        self.parent[root_y] = root_x
+        self.size[root_x] += self.size.pop(root_y)
+
+
+    def add_cluster(
+            self,
+            elements: Iterable[Hashable],
+    ) -> None:
+        """Add elements and merge them (and their current clusters) into one cluster."""
+
+        first = None
+        for i, x in enumerate(elements):
+            if i == 0:
+                first = x
+                self.add(x)
+            else:
+                self.union(first, x)
+
+
+    def get_clusters(self) -> list[list]:
+        root2cluster = {}
+        for x in self.parent:
+            root = self.find(x)
+            if root in root2cluster:
+                root2cluster[root].append(x)
+            else:
+                root2cluster[root] = [x]
+
+        return list(root2cluster.values())
+
+
+def merge_clusters(
+        clusters: Iterable[Iterable[Hashable]],
+) -> list[list]:
+    """Merge clusters sharing elements until all clusters are disjoint.
+
+    Empty clusters are dropped and duplicated elements are removed.
+    """
+
+    builder = ClusterBuilder()
+    for cluster in clusters:
+        builder.add_cluster(cluster)
+
+    return builder.get_clusters()
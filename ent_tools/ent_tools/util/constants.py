@@ -12,11 +12,13 @@ ENTS      = 'entities'
 DOC_ID    = 'document_id'
 SEC_ID    = 'section_id'
 SEN_ID    = 'sentence_id'
+SEN_IDS   = 'sentence_ids'
 MEN_IDS   = 'mention_ids'
 ENT_ID    = 'entity_id'
 
 TXT       = 'text'
 SPAN      = 'span'
+FRAGMENTS = 'fragments'
 MEN_TYPE  = 'mention_type'
 ENT_TYPE  = 'entity_type'
 
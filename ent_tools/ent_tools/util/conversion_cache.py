@@ -0,0 +1,275 @@
+from collections.abc import Mapping
+from contextlib import contextmanager
+import hashlib
+import json
+import os
+from typing import Callable, Iterator, Tuple
+
+from logzero import logger
+
+from ent_tools.util.data_io import json_dumps, load_json, write_as_json
+from ent_tools.util.indexed_corpus import IndexedCorpus, get_index_path, is_indexable_path, iter_corpus
+
+
+CACHE_VERSION = 2
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def get_file_hash(
+        path: str,
+) -> str:
+
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def get_options_hash(
+        options: dict,
+) -> str:
+
+    text = json.dumps(options or {}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def get_doc_hash(
+        doc: dict,
+) -> str:
+
+    return hashlib.blake2b(json_dumps(doc, compact=True).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def get_temporary_path(
+        path: str,
+) -> str:
+    """Return a path next to path with the same extensions, to be renamed to path later."""
+
+    dir_path, file_name = os.path.split(path)
+    return os.path.join(dir_path, f'.tmp-{file_name}')
+
+
+class ConversionCache:
+    """Manifest of content hashes of the inputs and outputs of conversions.
+
+    Each entry, identified by a key such as an output file path, records the
+    hashes of the input files, the hash of the options used, and the hashes
+    of the output files. A conversion can be skipped if its entry is valid,
+    i.e., none of them has changed since the entry was updated.
+    """
+
+    def __init__(
+            self,
+            cache_path: str,
+    ):
+        self.cache_path = cache_path
+        self.entries = {}
+        if os.path.isfile(cache_path):
+            data = load_json(cache_path)
+            if data.get('version') == CACHE_VERSION:
+                self.entries = data['entries']
+            else:
+                logger.warning(f'Ignore cache of an old version: {cache_path}')
+
+        self._hashes = {}
+
+
+    def get_hash(
+            self,
+            path: str,
+            refresh: bool = False,
+    ) -> str:
+
+        if refresh or not path in self._hashes:
+            self._hashes[path] = get_file_hash(path)
+        return self._hashes[path]
+
+
+    def get(
+            self,
+            key: str,
+    ) -> dict:
+
+        return self.entries.get(key)
+
+
+    def is_valid(
+            self,
+            key: str,
+            input_paths: list[str],
+            options: dict = None,
+    ) -> bool:
+
+        entry = self.entries.get(key)
+        if entry is None:
+            return False
+
+        if entry['options'] != get_options_hash(options):
+            return False
+
+        if set(entry['inputs']) != set(input_paths):
+            return False
+
+        for path, file_hash in list(entry['inputs'].items()) + list(entry['outputs'].items()):
+            if not os.path.isfile(path) or self.get_hash(path) != file_hash:
+                return False
+
+        return True
+
+
+    def update(
+            self,
+            key: str,
+            input_paths: list[str],
+            options: dict = None,
+            output_paths: list[str] = (),
+            **values,
+    ) -> None:
+
+        self.entries[key] = {
+            'inputs': {path: self.get_hash(path) for path in input_paths},
+            'options': get_options_hash(options),
+            # outputs have just been (re)written
+            'outputs': {path: self.get_hash(path, refresh=True) for path in output_paths},
+            **values,
+        }
+
+
+    def get_docs(
+            self,
+            input_path: str,
+            prev_docs: Mapping,
+            options: dict = None,
+    ) -> list[Tuple[str, dict]]:
+        """Return (doc_id, doc) of the documents converted from input_path in the last run.
+
+        The documents are taken from prev_docs, the previous output, and
+        verified by the hashes recorded by `update_docs`. Return None if the
+        file or the options have changed, or prev_docs does not hold the same
+        documents (e.g., a document was skipped or taken from another input).
+        """
+
+        if not self.is_valid(input_path, [input_path], options):
+            return None
+
+        docs = []
+        for doc_id, doc_hash in self.entries[input_path]['docs'].items():
+            if not doc_id in prev_docs:
+                return None
+            doc = prev_docs[doc_id]
+            if get_doc_hash(doc) != doc_hash:
+                return None
+            docs.append((doc_id, doc))
+        return docs
+
+
+    def update_docs(
+            self,
+            input_path: str,
+            doc_hashes: dict[str, str],
+            options: dict = None,
+    ) -> None:
+
+        self.update(input_path, [input_path], options, docs=doc_hashes)
+
+
+    def remove(
+            self,
+            key: str,
+    ) -> None:
+
+        self.entries.pop(key, None)
+
+
+    def save(self) -> None:
+        write_as_json({'version': CACHE_VERSION, 'entries': self.entries},
+                      self.cache_path, compact=True)
+
+
+@contextmanager
+def open_previous_docs(
+        cache: ConversionCache,
+        output_path: str,
+        input_paths: list[str],
+        options: dict = None,
+) -> Iterator[Mapping]:
+    """Open the previous output_path as a doc_id -> document mapping for `ConversionCache.get_docs`.
+
+    The mapping is empty if output_path has changed since it was saved. An
+    uncompressed JSONL output is read through its index as each document is
+    accessed; otherwise, only the documents of unchanged input_paths are
+    kept while the output is read.
+    """
+
+    if not cache.is_valid(output_path, []):
+        yield {}
+
+    elif is_indexable_path(output_path):
+        with IndexedCorpus(output_path) as corpus:
+            yield corpus
+
+    else:
+        doc_ids = set()
+        for input_path in input_paths:
+            if cache.is_valid(input_path, [input_path], options):
+                doc_ids.update(cache.get(input_path)['docs'])
+        yield dict(iter_corpus(output_path, doc_ids=doc_ids)) if doc_ids else {}
+
+
+def iter_docs_with_cache(
+        input_paths: list[str],
+        convert: Callable[[str], Iterator[Tuple[str, dict]]],
+        cache: ConversionCache,
+        output_path: str,
+        options: dict = None,
+) -> Iterator[Tuple[str, dict, str]]:
+    """Yield (doc_id, doc, input path) for the documents converted from input_paths.
+
+    Documents of an input file unchanged since the last run are taken from the
+    previous output_path instead of calling convert, if they are the same as
+    the documents converted from the file (see `ConversionCache.get_docs`).
+    Since output_path is read while the documents are yielded, the new corpus
+    must be written to another path (e.g., get_temporary_path(output_path))
+    and then passed to `save_output_with_cache`.
+    """
+
+    n_reused = 0
+    with open_previous_docs(cache, output_path, input_paths, options) as prev_docs:
+        for input_path in input_paths:
+            docs = cache.get_docs(input_path, prev_docs, options)
+            if docs is not None:
+                n_reused += 1
+                for doc_id, doc in docs:
+                    yield doc_id, doc, input_path
+                continue
+
+            doc_hashes = {}
+            for doc_id, doc in convert(input_path):
+                doc_hashes[doc_id] = get_doc_hash(doc)
+                yield doc_id, doc, input_path
+            cache.update_docs(input_path, doc_hashes, options)
+
+    logger.info(f'Reused documents of {n_reused} unchanged files out of {len(input_paths)}')
+
+
+def save_output_with_cache(
+        tmp_output_path: str,
+        output_path: str,
+        cache: ConversionCache,
+) -> None:
+    """Replace output_path by tmp_output_path and record its hash in the cache."""
+
+    if os.path.isfile(tmp_output_path):
+        os.replace(tmp_output_path, output_path)
+        index_path = get_index_path(output_path)
+        if os.path.isfile(index_path):
+            os.remove(index_path)   # the index of the previous output
+        cache.update(output_path, [], output_paths=[output_path])
+    else:
+        cache.remove(output_path)
+
+    cache.save()
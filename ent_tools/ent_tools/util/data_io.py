@@ -1,15 +1,182 @@
+import bz2
+import gzip
 import json
+import lzma
+import os
+from typing import IO, Iterator, Tuple
 
 from logzero import logger
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+ORJSON = 'orjson'
+UJSON  = 'ujson'
+STDLIB = 'json'
+
+READ_CHUNK_SIZE = 1 << 16
+
+GZIP = '.gz'
+BZ2  = '.bz2'
+XZ   = '.xz'
+ZSTD = '.zst'
+COMPRESSION_SUFFIXES = (GZIP, BZ2, XZ, ZSTD)
+GZIP_COMPRESSLEVEL = 6
+
+
+def get_compression(
+        path: str,
+) -> str:
+    """Return the compression suffix of path, or None for an uncompressed file."""
+
+    for suffix in COMPRESSION_SUFFIXES:
+        if path.endswith(suffix):
+            return suffix
+    return None
+
+
+def strip_compression_suffix(
+        path: str,
+) -> str:
+
+    suffix = get_compression(path)
+    return path[:-len(suffix)] if suffix else path
+
+
+def open_file(
+        path: str,
+        mode: str = 'r',
+        encoding: str = 'utf-8',
+) -> IO:
+    """Open a file, (de)compressing it on the fly according to its extension.
+
+    Supported extensions are .gz, .bz2, .xz and .zst (requires zstandard).
+    Compressed files are read and written as streams, so the whole content is
+    never held in memory.
+    """
+
+    compression = get_compression(path)
+    if 'b' in mode:
+        encoding = None
+    elif not 't' in mode:
+        mode += 't'
+
+    if compression is None:
+        return open(path, mode, encoding=encoding)
+
+    elif compression == GZIP:
+        return gzip.open(path, mode, encoding=encoding, compresslevel=GZIP_COMPRESSLEVEL)
+
+    elif compression == BZ2:
+        return bz2.open(path, mode, encoding=encoding)
+
+    elif compression == XZ:
+        return lzma.open(path, mode, encoding=encoding)
+
+    else:
+        if zstandard is None:
+            raise ImportError(f'zstandard is required to open {path}')
+        return zstandard.open(path, mode, encoding=encoding)
+
+
+def get_available_json_backends() -> list[str]:
+    backends = []
+    if orjson is not None:
+        backends.append(ORJSON)
+    if ujson is not None:
+        backends.append(UJSON)
+    backends.append(STDLIB)
+    return backends
+
+
+def set_json_backend(
+        name: str = None,
+) -> str:
+    """Select the JSON library used for corpus I/O.
+
+    If name is not given, the fastest installed library is used, unless the
+    environment variable ENT_TOOLS_JSON_BACKEND specifies one.
+    """
+
+    global _json_backend
+
+    available = get_available_json_backends()
+    if name is None:
+        name = os.environ.get('ENT_TOOLS_JSON_BACKEND', available[0])
+
+    if not name in available:
+        raise ValueError(f'JSON backend "{name}" is not available: {available}')
+
+    _json_backend = name
+    return name
+
+
+def get_json_backend() -> str:
+    return _json_backend
+
+
+def json_loads(
+        text: str | bytes,
+) -> object:
+
+    if _json_backend == ORJSON:
+        return orjson.loads(text)
+    elif _json_backend == UJSON:
+        return ujson.loads(text)
+    else:
+        return json.loads(text)
+
+
+def json_dumps(
+        obj: object,
+        compact: bool = False,
+) -> str:
+    """Serialize obj without escaping non-ASCII characters.
+
+    The output is indented with two spaces, or has no whitespace at all if
+    compact is True.
+    """
+
+    if _json_backend == ORJSON:
+        option = orjson.OPT_NON_STR_KEYS
+        if not compact:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option).decode('utf-8')
+
+    elif _json_backend == UJSON:
+        if compact:
+            return ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False)
+        else:
+            return ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False, indent=2)
+
+    else:
+        if compact:
+            return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+        else:
+            return json.dumps(obj, ensure_ascii=False, indent=2)
+
 
 def load_json(
         input_path: str,
 ) -> dict:
 
-    with open(input_path, encoding='utf-8') as f:
+    # all the backends accept UTF-8 bytes, which saves decoding into str
+    with open_file(input_path, 'rb') as f:
         logger.info(f'Read: {input_path}')
-        data = json.load(f)
+        data = json_loads(f.read())
     return data
 
 
@@ -18,19 +185,244 @@ def load_jsonl(
 ) -> dict:
 
     data = {}
-    with open(input_path, encoding='utf-8') as f:
+    with open_file(input_path) as f:
         logger.info(f'Read: {input_path}')
         for line in f:
-            data_line = json.loads(line.strip('\n'))
+            data_line = json_loads(line.strip('\n'))
             data.update(data_line)
     return data
 
 
+def load_target_ids(
+        input_path: str,
+) -> set[str]:
+    """Return the set of document ids listed one per line, e.g., in `--target_ids_path`."""
+
+    with open_file(input_path) as f:
+        logger.info(f'Read: {input_path}')
+        target_ids = {line.strip('\n') for line in f}
+    logger.info(f'Target ids: {len(target_ids)}')
+    return target_ids
+
+
 def write_as_json(
         data: dict,
         output_path: str,
+        compact: bool = False,
 ) -> None:
 
-    with open(output_path, 'w', encoding='utf-8') as fw:
-        json.dump(data, fw, ensure_ascii=False, indent=2)
+    with open_file(output_path, 'w') as fw:
+        fw.write(json_dumps(data, compact=compact))
     logger.info(f'Saved: {output_path}')
+
+
+def is_jsonl_path(
+        path: str,
+) -> bool:
+
+    return strip_compression_suffix(path).endswith('.jsonl')
+
+
+def iter_docs(
+        input_path: str,
+) -> Iterator[Tuple[str, dict]]:
+    """Yield (doc_id, doc) pairs one by one from a JSON or JSONL corpus file."""
+
+    if is_jsonl_path(input_path):
+        return iter_jsonl(input_path)
+    else:
+        return iter_json(input_path)
+
+
+def iter_jsonl(
+        input_path: str,
+) -> Iterator[Tuple[str, dict]]:
+
+    with open_file(input_path) as f:
+        logger.info(f'Read: {input_path}')
+        for line in f:
+            line = line.strip('\n')
+            if not line:
+                continue
+
+            data_line = json_loads(line)
+            for doc_id, doc in data_line.items():
+                yield doc_id, doc
+
+
+def iter_json(
+        input_path: str,
+) -> Iterator[Tuple[str, dict]]:
+    """Yield the members of a top-level JSON object without loading the whole file.
+
+    Each member value (i.e., a document) is decoded separately, so the peak
+    memory is bounded by the size of the largest document.
+    """
+
+    decoder = json.JSONDecoder()
+
+    with open_file(input_path) as f:
+        logger.info(f'Read: {input_path}')
+        reader = _JsonChunkReader(f, decoder)
+
+        reader.expect('{')
+        if reader.peek() == '}':
+            return
+
+        while True:
+            doc_id = reader.decode()
+            assert isinstance(doc_id, str), f'Invalid key: {doc_id}'
+            reader.expect(':')
+            doc = reader.decode()
+            yield doc_id, doc
+
+            if reader.peek() == ',':
+                reader.expect(',')
+                continue
+
+            reader.expect('}')
+            break
+
+
+class _JsonChunkReader:
+    def __init__(
+            self,
+            f,
+            decoder: json.JSONDecoder,
+    ):
+        self.f = f
+        self.decoder = decoder
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+
+    def _fill(self, size: int = READ_CHUNK_SIZE) -> bool:
+        if self.eof:
+            return False
+
+        chunk = self.f.read(size)
+        if not chunk:
+            self.eof = True
+            return False
+
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\n\r':
+                self.pos += 1
+
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+
+            if not self._fill():
+                raise ValueError('Unexpected end of JSON data')
+
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise ValueError(f'Expected "{char}" but found "{found}"')
+        self.pos += 1
+
+
+    def decode(self) -> object:
+        self.peek()
+        size = READ_CHUNK_SIZE
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # a number at the end of the buffer may still be incomplete
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+
+            # the value continues beyond the buffer; read a larger chunk
+            self._fill(size)
+            size *= 2
+
+
+class JsonWriter:
+    """Write (doc_id, doc) pairs incrementally as a JSON object or JSONL lines.
+
+    The JSON output is identical to `write_as_json` applied to the whole corpus.
+    JSONL lines are always compact.
+    """
+
+    def __init__(
+            self,
+            output_path: str,
+            compact: bool = False,
+    ):
+        self.output_path = output_path
+        self.jsonl = is_jsonl_path(output_path)
+        self.compact = compact
+        self.n_docs = 0
+        self.fw = open_file(output_path, 'w')
+        if not self.jsonl:
+            self.fw.write('{')
+
+
+    def write(
+            self,
+            doc_id: str,
+            doc: dict,
+    ) -> None:
+
+        if self.jsonl:
+            self.fw.write(json_dumps({doc_id: doc}, compact=True) + '\n')
+        elif self.compact:
+            key_str = json_dumps(doc_id, compact=True)
+            doc_str = json_dumps(doc, compact=True)
+            sep = ',' if self.n_docs > 0 else ''
+            self.fw.write(f'{sep}{key_str}:{doc_str}')
+        else:
+            key_str = json_dumps(doc_id)
+            doc_str = json_dumps(doc).replace('\n', '\n  ')
+            sep = ',\n  ' if self.n_docs > 0 else '\n  '
+            self.fw.write(f'{sep}{key_str}: {doc_str}')
+
+        self.n_docs += 1
+
+
+    def close(self) -> None:
+        if self.fw.closed:
+            return
+
+        if not self.jsonl:
+            self.fw.write('\n}' if self.n_docs > 0 and not self.compact else '}')
+        self.fw.close()
+        logger.info(f'Saved: {self.output_path}')
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def write_docs(
+        docs: Iterator[Tuple[str, dict]],
+        output_path: str,
+        compact: bool = False,
+) -> int:
+
+    with JsonWriter(output_path, compact=compact) as writer:
+        for doc_id, doc in docs:
+            writer.write(doc_id, doc)
+
+    return writer.n_docs
+
+
+_json_backend = STDLIB
+set_json_backend()
@@ -0,0 +1,280 @@
+import sys
+from typing import Iterator, Tuple
+
+from ent_tools.util.constants import (
+    SENS, MENS, ENTS, SEC_ID, SEN_ID, MEN_IDS, MEM_MEN_IDS, ENT_ID, TXT, SPAN, ENT_TYPE,
+)
+from ent_tools.util.data_io import iter_docs
+
+
+# Objects keep the key order of their source dict as a shared tuple, so that
+# `to_dict` reproduces the original JSON exactly, including absent keys, and
+# appends the keys of fields set after loading.
+_key_orders = {}
+
+
+def _intern_keys(
+        keys: Tuple[str],
+) -> Tuple[str]:
+
+    return _key_orders.setdefault(keys, keys)
+
+
+def _intern(
+        value: str,
+) -> str:
+
+    return sys.intern(value) if type(value) == str else value
+
+
+def _get_extra(
+        d: dict,
+        known_keys,
+) -> dict:
+    """Return the dict of the keys of d not in known_keys, or None if there is none."""
+
+    if all(key in known_keys for key in d):
+        return None
+    return {key: value for key, value in d.items() if not key in known_keys}
+
+
+def _to_dict(
+        obj,
+        field_keys: Tuple[str],
+) -> dict:
+    """Return the dict of obj: the keys of its source dict in their order,
+    followed by the other field keys and extra keys whose values are set.
+
+    A key absent from the source dict is skipped if its value is None, or an
+    empty list or dict of a loaded object, so that an unchanged object
+    reproduces its source dict exactly.
+    """
+
+    extra = obj.extra or {}
+    d = {}
+    for key in obj._keys or ():
+        if key in field_keys or key in extra:
+            d[key] = obj._get(key)
+
+    for key in field_keys + tuple(extra):
+        if key in d:
+            continue
+        value = obj._get(key)
+        if value is None or (obj._keys is not None and type(value) in (list, dict) and not value):
+            continue
+        d[key] = value
+    return d
+
+
+class Mention:
+    __slots__ = ('sen_id', 'begin', 'end', 'text', 'entity_type', 'entity_id', 'extra', '_keys')
+
+    _fields = {SEN_ID: 'sen_id', TXT: 'text', ENT_TYPE: 'entity_type', ENT_ID: 'entity_id'}
+    _known_keys = frozenset(_fields) | {SPAN}
+
+
+    def __init__(
+            self,
+            sen_id: str,
+            begin: int,
+            end: int,
+            text: str = None,
+            entity_type: str = None,
+            entity_id: str = None,
+            extra: dict = None,
+    ):
+        self.sen_id      = _intern(sen_id)
+        self.begin       = begin
+        self.end         = end
+        self.text        = text
+        self.entity_type = _intern(entity_type)
+        self.entity_id   = _intern(entity_id)
+        self.extra       = extra or None
+        self._keys       = None
+
+
+    @property
+    def span(self) -> Tuple[int, int]:
+        return (self.begin, self.end)
+
+
+    @classmethod
+    def from_dict(cls, men: dict) -> 'Mention':
+        span = men[SPAN]
+        extra = _get_extra(men, cls._known_keys)
+        obj = cls(
+            men.get(SEN_ID), int(span[0]), int(span[1]),
+            text=men.get(TXT),
+            entity_type=men.get(ENT_TYPE),
+            entity_id=men.get(ENT_ID),
+            extra=extra,
+        )
+        obj._keys = _intern_keys(tuple(men.keys()))
+        return obj
+
+
+    def _get(self, key: str):
+        if key == SPAN:
+            return [self.begin, self.end]
+        elif key in self._fields:
+            return getattr(self, self._fields[key])
+        else:
+            return self.extra[key]
+
+
+    def to_dict(self) -> dict:
+        return _to_dict(self, (SEN_ID, SPAN, TXT, ENT_TYPE, ENT_ID))
+
+
+class Sentence:
+    __slots__ = ('sec_id', 'text', 'mention_ids', 'extra', '_keys')
+
+    _fields = {SEC_ID: 'sec_id', TXT: 'text', MEN_IDS: 'mention_ids'}
+
+
+    def __init__(
+            self,
+            text: str,
+            mention_ids: list[str] = None,
+            sec_id: str = None,
+            extra: dict = None,
+    ):
+        self.sec_id      = _intern(sec_id)
+        self.text        = text
+        self.mention_ids = mention_ids if mention_ids is not None else []
+        self.extra       = extra or None
+        self._keys       = None
+
+
+    @classmethod
+    def from_dict(cls, sen: dict) -> 'Sentence':
+        extra = _get_extra(sen, cls._fields)
+        obj = cls(
+            sen.get(TXT),
+            mention_ids=[_intern(men_id) for men_id in sen.get(MEN_IDS, [])],
+            sec_id=sen.get(SEC_ID),
+            extra=extra,
+        )
+        obj._keys = _intern_keys(tuple(sen.keys()))
+        return obj
+
+
+    def _get(self, key: str):
+        if key == MEN_IDS:
+            return list(self.mention_ids)
+        elif key in self._fields:
+            return getattr(self, self._fields[key])
+        else:
+            return self.extra[key]
+
+
+    def to_dict(self) -> dict:
+        return _to_dict(self, (SEC_ID, TXT, MEN_IDS))
+
+
+class Entity:
+    __slots__ = ('member_mention_ids', 'extra', '_keys')
+
+
+    def __init__(
+            self,
+            member_mention_ids: list[str] = None,
+            extra: dict = None,
+    ):
+        self.member_mention_ids = member_mention_ids if member_mention_ids is not None else []
+        self.extra              = extra or None
+        self._keys              = None
+
+
+    @classmethod
+    def from_dict(cls, ent: dict) -> 'Entity':
+        if ent is None:
+            return None
+
+        extra = _get_extra(ent, (MEM_MEN_IDS,))
+        obj = cls(
+            member_mention_ids=[_intern(men_id) for men_id in ent.get(MEM_MEN_IDS, [])],
+            extra=extra,
+        )
+        obj._keys = _intern_keys(tuple(ent.keys()))
+        return obj
+
+
+    def _get(self, key: str):
+        if key == MEM_MEN_IDS:
+            return list(self.member_mention_ids)
+        else:
+            return self.extra[key]
+
+
+    def to_dict(self) -> dict:
+        return _to_dict(self, (MEM_MEN_IDS,))
+
+
+class Document:
+    """Typed counterpart of a document dict in the processed JSON format.
+
+    Keys other than sentences, mentions and entities (e.g., sections and
+    meta_info) are kept as they are in `extra`. As in the other classes,
+    `extra` is None unless the source dict has such keys, so that objects
+    without them do not hold a dict each.
+    """
+
+    __slots__ = ('sentences', 'mentions', 'entities', 'extra', '_keys')
+
+
+    def __init__(
+            self,
+            sentences: dict[str, Sentence] = None,
+            mentions: dict[str, Mention] = None,
+            entities: dict[str, Entity] = None,
+            extra: dict = None,
+    ):
+        self.sentences = sentences if sentences is not None else {}
+        self.mentions  = mentions if mentions is not None else {}
+        self.entities  = entities
+        self.extra     = extra or None
+        self._keys     = None
+
+
+    @classmethod
+    def from_dict(cls, doc: dict) -> 'Document':
+        sentences = {_intern(sen_id): Sentence.from_dict(sen)
+                     for sen_id, sen in doc[SENS].items()}
+        mentions = {_intern(men_id): Mention.from_dict(men)
+                    for men_id, men in doc.get(MENS, {}).items()}
+        entities = None
+        if ENTS in doc:
+            entities = {_intern(ent_id): Entity.from_dict(ent)
+                        for ent_id, ent in doc[ENTS].items()}
+
+        extra = _get_extra(doc, (SENS, MENS, ENTS))
+        obj = cls(sentences, mentions, entities, extra=extra)
+        obj._keys = _intern_keys(tuple(doc.keys()))
+        return obj
+
+
+    def _get(self, key: str):
+        if key == SENS:
+            return {sen_id: sen.to_dict() for sen_id, sen in self.sentences.items()}
+        elif key == MENS:
+            return {men_id: men.to_dict() for men_id, men in self.mentions.items()}
+        elif key == ENTS:
+            if self.entities is None:
+                return None
+            return {ent_id: ent.to_dict() if ent is not None else None
+                    for ent_id, ent in self.entities.items()}
+        else:
+            return self.extra[key]
+
+
+    def to_dict(self) -> dict:
+        return _to_dict(self, (SENS, MENS, ENTS))
+
+
+def iter_documents(
+        input_path: str,
+) -> Iterator[Tuple[str, Document]]:
+
+    for doc_id, doc in iter_docs(input_path):
+        yield doc_id, Document.from_dict(doc)
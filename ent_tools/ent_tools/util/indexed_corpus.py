@@ -0,0 +1,309 @@
+import argparse
+import os
+from collections.abc import Mapping
+from typing import Iterator, Tuple
+
+from logzero import logger
+
+from ent_tools.util.data_io import (
+    get_compression, is_jsonl_path, iter_docs, json_dumps, json_loads, load_json, load_jsonl,
+)
+
+
+INDEX_SUFFIX = '.idx'
+INDEX_HEADER = '#data_size'     # followed by the size and mtime_ns of the data file
+
+
+def get_index_path(
+        jsonl_path: str,
+) -> str:
+
+    return f'{jsonl_path}{INDEX_SUFFIX}'
+
+
+def get_data_stamp(
+        data_path: str,
+) -> Tuple[int, int]:
+    """Return (size, mtime_ns) of a data file, which its index must match."""
+
+    stat = os.stat(data_path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def build_index(
+        jsonl_path: str,
+) -> dict[str, Tuple[int, int]]:
+    """Scan a JSONL corpus and return doc_id -> (byte offset, byte length) of its line."""
+
+    docid2loc = {}
+    with open(jsonl_path, 'rb') as f:
+        logger.info(f'Build index: {jsonl_path}')
+        offset = 0
+        for line in f:
+            length = len(line)
+            if line.strip():
+                for doc_id in json_loads(line):
+                    docid2loc[doc_id] = (offset, length)
+            offset += length
+
+    return docid2loc
+
+
+def write_index(
+        docid2loc: dict[str, Tuple[int, int]],
+        index_path: str,
+        data_stamp: Tuple[int, int],
+) -> None:
+
+    with open(index_path, 'w', encoding='utf-8') as fw:
+        fw.write(f'{INDEX_HEADER}\t{data_stamp[0]}\t{data_stamp[1]}\n')
+        for doc_id, (offset, length) in docid2loc.items():
+            fw.write(f'{doc_id}\t{offset}\t{length}\n')
+    logger.info(f'Saved: {index_path}')
+
+
+def read_index(
+        index_path: str,
+        data_stamp: Tuple[int, int],
+) -> dict[str, Tuple[int, int]]:
+    """Read a sidecar index, or return None if it does not match the data file.
+
+    The index matches if it records the same size and mtime_ns as data_stamp,
+    so that an in-place edit of the data file keeping its size is detected.
+    """
+
+    docid2loc = {}
+    with open(index_path, encoding='utf-8') as f:
+        header = f.readline().rstrip('\n').split('\t')
+        if header != [INDEX_HEADER, str(data_stamp[0]), str(data_stamp[1])]:
+            return None
+
+        for line in f:
+            doc_id, offset, length = line.rstrip('\n').split('\t')
+            docid2loc[doc_id] = (int(offset), int(length))
+
+    return docid2loc
+
+
+def is_indexable_path(
+        path: str,
+) -> bool:
+
+    # compressed files do not support seeking to byte offsets
+    return is_jsonl_path(path) and get_compression(path) is None
+
+
+class IndexedCorpus(Mapping):
+    """Read-only mapping from doc_id to document backed by a JSONL file and its index.
+
+    Only the index is loaded on construction; each document is decoded when it
+    is accessed. The sidecar index `<path>.idx` is (re)built if it is missing or
+    does not match the data file. The JSONL file must not be compressed.
+    """
+
+    def __init__(
+            self,
+            jsonl_path: str,
+    ):
+        self.jsonl_path = jsonl_path
+        self.index_path = get_index_path(jsonl_path)
+
+        data_stamp = get_data_stamp(jsonl_path)
+        self.docid2loc = None
+        if os.path.isfile(self.index_path):
+            self.docid2loc = read_index(self.index_path, data_stamp)
+            if self.docid2loc is None:
+                logger.warning(f'Index is outdated: {self.index_path}')
+
+        if self.docid2loc is None:
+            self.docid2loc = build_index(jsonl_path)
+            try:
+                write_index(self.docid2loc, self.index_path, data_stamp)
+            except OSError as e:
+                logger.warning(f'Failed to save index: {e}')
+
+        logger.info(f'Read: {jsonl_path} ({len(self.docid2loc)} documents indexed)')
+        self.f = open(jsonl_path, 'rb')
+
+
+    def __getitem__(self, doc_id: str) -> dict:
+        offset, length = self.docid2loc[doc_id]
+        self.f.seek(offset)
+        return json_loads(self.f.read(length))[doc_id]
+
+
+    def __contains__(self, doc_id: object) -> bool:
+        return doc_id in self.docid2loc
+
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.docid2loc)
+
+
+    def __len__(self) -> int:
+        return len(self.docid2loc)
+
+
+    def close(self) -> None:
+        self.f.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class IndexedCorpusWriter:
+    """Write documents as JSONL lines and save the sidecar index on close."""
+
+    def __init__(
+            self,
+            jsonl_path: str,
+    ):
+        self.jsonl_path = jsonl_path
+        self.docid2loc = {}
+        self.offset = 0
+        self.fw = open(jsonl_path, 'wb')
+
+
+    def write(
+            self,
+            doc_id: str,
+            doc: dict,
+    ) -> None:
+
+        line = (json_dumps({doc_id: doc}, compact=True) + '\n').encode('utf-8')
+        self.fw.write(line)
+        self.docid2loc[doc_id] = (self.offset, len(line))
+        self.offset += len(line)
+
+
+    def close(self) -> None:
+        if self.fw.closed:
+            return
+
+        self.fw.close()
+        logger.info(f'Saved: {self.jsonl_path}')
+        write_index(self.docid2loc, get_index_path(self.jsonl_path), get_data_stamp(self.jsonl_path))
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def load_corpus(
+        input_path: str,
+        doc_ids: set[str] = None,
+) -> Mapping:
+    """Return a doc_id -> document mapping restricted to doc_ids if given.
+
+    For uncompressed JSONL input, only the requested documents are decoded; the whole
+    corpus is returned as a lazy IndexedCorpus if doc_ids is not given.
+    """
+
+    if is_indexable_path(input_path):
+        if doc_ids is None:
+            return IndexedCorpus(input_path)
+
+        with IndexedCorpus(input_path) as corpus:
+            return {doc_id: corpus[doc_id] for doc_id in corpus if doc_id in doc_ids}
+
+    data = load_jsonl(input_path) if is_jsonl_path(input_path) else load_json(input_path)
+    if doc_ids is None:
+        return data
+
+    return {doc_id: doc for doc_id, doc in data.items() if doc_id in doc_ids}
+
+
+def iter_corpus(
+        input_path: str,
+        doc_ids: set[str] = None,
+) -> Iterator[Tuple[str, dict]]:
+    """Yield (doc_id, doc) pairs, decoding only the requested documents for JSONL input."""
+
+    if is_indexable_path(input_path) and doc_ids is not None:
+        with IndexedCorpus(input_path) as corpus:
+            for doc_id in corpus:
+                if doc_id in doc_ids:
+                    yield doc_id, corpus[doc_id]
+        return
+
+    for doc_id, doc in iter_docs(input_path):
+        if doc_ids is None or doc_id in doc_ids:
+            yield doc_id, doc
+
+
+def split_byte_ranges(
+        jsonl_path: str,
+        split_size: int,
+) -> list[Tuple[int, int]]:
+    """Split a JSONL file into (begin, end) byte ranges of about split_size bytes.
+
+    Ranges need not be aligned to lines: `iter_docs_in_byte_range` reads the
+    lines starting in a range, so that each line is read in exactly one range.
+    """
+
+    data_size = os.path.getsize(jsonl_path)
+    n_ranges = max(1, -(-data_size // split_size))
+    return [(data_size * i // n_ranges, data_size * (i+1) // n_ranges) for i in range(n_ranges)]
+
+
+def iter_docs_in_byte_range(
+        jsonl_path: str,
+        begin: int,
+        end: int,
+) -> Iterator[Tuple[str, dict]]:
+    """Yield (doc_id, doc) pairs of the lines of a JSONL file starting in [begin, end)."""
+
+    with open(jsonl_path, 'rb') as f:
+        if begin > 0:
+            # skip the line containing begin-1, which belongs to the previous range
+            f.seek(begin - 1)
+            f.readline()
+
+        offset = f.tell()
+        while offset < end:
+            line = f.readline()
+            if not line:
+                break
+            offset += len(line)
+            if line.strip():
+                yield from json_loads(line).items()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--input_path', '-i',
+        type=str,
+        required=True,
+    )
+    parser.add_argument(
+        '--output_jsonl_path', '-o',
+        type=str,
+    )
+    args = parser.parse_args()
+
+    if args.output_jsonl_path:
+        # convert JSON/JSONL corpus into indexed JSONL corpus
+        with IndexedCorpusWriter(args.output_jsonl_path) as writer:
+            for doc_id, doc in iter_docs(args.input_path):
+                writer.write(doc_id, doc)
+
+    else:
+        # build the index for an existing JSONL corpus
+        assert is_indexable_path(args.input_path), 'Input must be an uncompressed .jsonl file to build its index.'
+        data_stamp = get_data_stamp(args.input_path)
+        docid2loc = build_index(args.input_path)
+        write_index(docid2loc, get_index_path(args.input_path), data_stamp)
+
+
+if __name__ == '__main__':
+    main()
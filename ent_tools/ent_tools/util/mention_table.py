@@ -0,0 +1,287 @@
+import argparse
+import os
+from array import array
+from collections import Counter
+from typing import Iterator, Tuple
+
+import numpy as np
+from logzero import logger
+
+from ent_tools.util.constants import (
+    ANY, SENS, MENS, ENTS, SEC_ID, SEN_ID, MEN_IDS, MEM_MEN_IDS, ENT_ID, TXT, SPAN, ENT_TYPE,
+)
+from ent_tools.util.data_io import iter_docs, load_json, write_as_json
+from ent_tools.evaluate.util import GOLD, PRED, CORRECT
+
+
+MENTION_TABLE  = 'mentions'
+SENTENCE_TABLE = 'sentences'
+ENTITY_TABLE   = 'entities'
+
+# column name -> vocabulary name (None for integer columns)
+TABLE_COLUMNS = {
+    MENTION_TABLE: {
+        'doc_id': 'doc_id', 'sen_id': 'sen_id', 'begin': None, 'end': None,
+        'entity_type': 'entity_type', 'entity_id': 'entity_id',
+    },
+    SENTENCE_TABLE: {
+        'doc_id': 'doc_id', 'sen_id': 'sen_id', 'sec_id': 'sec_id',
+        'n_chars': None, 'n_mentions': None,
+    },
+    ENTITY_TABLE: {
+        'doc_id': 'doc_id', 'entity_id': 'entity_id', 'n_members': None,
+    },
+}
+VOCAB_FILE_NAME = 'vocab.json'
+NO_VALUE = -1
+
+
+class Vocab:
+    def __init__(
+            self,
+            itos: list[str] = None,
+    ):
+        self.itos = itos if itos is not None else []
+        self.stoi = {s: i for i, s in enumerate(self.itos)}
+
+
+    def get_id(self, s: str) -> int:
+        if s is None:
+            return NO_VALUE
+
+        if not s in self.stoi:
+            self.stoi[s] = len(self.itos)
+            self.itos.append(s)
+        return self.stoi[s]
+
+
+    def get_ids_in(self, other: 'Vocab') -> np.ndarray:
+        """Return the array that maps ids of this vocab to ids of other (or NO_VALUE)."""
+
+        return np.array([other.stoi.get(s, NO_VALUE) for s in self.itos], dtype=np.int32)
+
+
+def build_tables(
+        docs: Iterator[Tuple[str, dict]],
+) -> Tuple[dict[str, dict[str, np.ndarray]], dict[str, Vocab]]:
+    """Flatten documents into column arrays; string columns are encoded as vocab ids."""
+
+    vocabs = {name: Vocab() for name in ('doc_id', 'sen_id', 'sec_id', 'entity_type', 'entity_id')}
+    columns = {table: {column: array('i') for column in table_columns}
+               for table, table_columns in TABLE_COLUMNS.items()}
+    mcols = columns[MENTION_TABLE]
+    scols = columns[SENTENCE_TABLE]
+    ecols = columns[ENTITY_TABLE]
+
+    for doc_id, doc in docs:
+        doc_idx = vocabs['doc_id'].get_id(doc_id)
+
+        for sen_id, sen in doc[SENS].items():
+            scols['doc_id'].append(doc_idx)
+            scols['sen_id'].append(vocabs['sen_id'].get_id(sen_id))
+            scols['sec_id'].append(vocabs['sec_id'].get_id(sen.get(SEC_ID)))
+            scols['n_chars'].append(len(sen[TXT]))
+            scols['n_mentions'].append(len(sen[MEN_IDS]))
+
+        for men_id, men in doc.get(MENS, {}).items():
+            mcols['doc_id'].append(doc_idx)
+            mcols['sen_id'].append(vocabs['sen_id'].get_id(men[SEN_ID]))
+            mcols['begin'].append(men[SPAN][0])
+            mcols['end'].append(men[SPAN][1])
+            mcols['entity_type'].append(vocabs['entity_type'].get_id(men.get(ENT_TYPE)))
+            mcols['entity_id'].append(vocabs['entity_id'].get_id(men.get(ENT_ID)))
+
+        for ent_id, ent in (doc.get(ENTS) or {}).items():
+            ecols['doc_id'].append(doc_idx)
+            ecols['entity_id'].append(vocabs['entity_id'].get_id(ent_id))
+            ecols['n_members'].append(len(ent[MEM_MEN_IDS]) if ent else 0)
+
+    tables = {table: {column: np.frombuffer(values, dtype=np.int32) if values else np.zeros(0, dtype=np.int32)
+                      for column, values in table_columns.items()}
+              for table, table_columns in columns.items()}
+
+    return tables, vocabs
+
+
+def save_tables(
+        tables: dict[str, dict[str, np.ndarray]],
+        vocabs: dict[str, Vocab],
+        output_dir: str,
+) -> None:
+
+    os.makedirs(output_dir, exist_ok=True)
+    for table, table_columns in tables.items():
+        for column, values in table_columns.items():
+            np.save(os.path.join(output_dir, f'{table}.{column}.npy'), values)
+
+    write_as_json({name: vocab.itos for name, vocab in vocabs.items()},
+                  os.path.join(output_dir, VOCAB_FILE_NAME), compact=True)
+    logger.info(f'Saved: {output_dir}')
+
+
+def load_tables(
+        input_dir: str,
+        mmap: bool = True,
+) -> Tuple[dict[str, dict[str, np.ndarray]], dict[str, Vocab]]:
+
+    mmap_mode = 'r' if mmap else None
+    tables = {}
+    for table, table_columns in TABLE_COLUMNS.items():
+        tables[table] = {
+            column: np.load(os.path.join(input_dir, f'{table}.{column}.npy'), mmap_mode=mmap_mode)
+            for column in table_columns
+        }
+
+    vocabs = {name: Vocab(itos) for name, itos
+              in load_json(os.path.join(input_dir, VOCAB_FILE_NAME)).items()}
+    logger.info(f'Read: {input_dir}')
+
+    return tables, vocabs
+
+
+def decode_column(
+        tables: dict[str, dict[str, np.ndarray]],
+        vocabs: dict[str, Vocab],
+        table: str,
+        column: str,
+) -> np.ndarray:
+
+    values = np.asarray(tables[table][column])
+    vocab_name = TABLE_COLUMNS[table][column]
+    if vocab_name is None:
+        return values
+
+    itos = np.array(vocabs[vocab_name].itos + [None], dtype=object)
+    return itos[values]         # NO_VALUE (-1) is decoded as None
+
+
+def get_label_distribution(
+        tables: dict[str, dict[str, np.ndarray]],
+        vocabs: dict[str, Vocab],
+) -> Counter:
+
+    itos = vocabs['entity_type'].itos
+    codes = np.asarray(tables[MENTION_TABLE]['entity_type'])
+    counts = np.bincount(codes[codes != NO_VALUE], minlength=len(itos))
+    return Counter({label: int(count) for label, count in zip(itos, counts) if count > 0})
+
+
+def get_stats_from_tables(
+        tables: dict[str, dict[str, np.ndarray]],
+        vocabs: dict[str, Vocab],
+) -> Tuple[Counter, Counter]:
+    """Vectorized counterpart of `data_statistics.get_stats_from_dict`."""
+
+    c_basic = Counter()
+    c_basic['n_document'] = len(vocabs['doc_id'].itos)
+    c_basic['n_sentence'] = len(tables[SENTENCE_TABLE]['doc_id'])
+    c_basic['n_mention']  = len(tables[MENTION_TABLE]['doc_id'])
+    c_basic['n_entity']   = len(tables[ENTITY_TABLE]['doc_id'])
+    c_cate = get_label_distribution(tables, vocabs)
+
+    return c_basic, c_cate
+
+
+def _get_span_keys(
+        tables: dict[str, dict[str, np.ndarray]],
+        id_maps: dict[str, np.ndarray] = None,
+        ignore_label_difference: bool = False,
+) -> np.ndarray:
+
+    mentions = tables[MENTION_TABLE]
+    cols = []
+    for column in ('doc_id', 'sen_id', 'begin', 'end', 'entity_type'):
+        values = np.asarray(mentions[column], dtype=np.int64)
+        if id_maps and column in id_maps:
+            values = np.where(values != NO_VALUE, id_maps[column][values], NO_VALUE)
+        if column == 'entity_type' and ignore_label_difference:
+            values = np.zeros_like(values)
+        cols.append(values)
+
+    return np.stack(cols, axis=1)
+
+
+def count_span_matches(
+        gold_tables: dict[str, dict[str, np.ndarray]],
+        gold_vocabs: dict[str, Vocab],
+        pred_tables: dict[str, dict[str, np.ndarray]],
+        pred_vocabs: dict[str, Vocab],
+        ignore_label_difference: bool = False,
+) -> Counter:
+    """Count gold, predicted and exactly matched (doc, sentence, span, label) mentions.
+
+    The returned counter has the (label, GOLD/PRED/CORRECT) keys used by
+    `evaluate.util.get_PRF_scores`.
+    """
+
+    # map pred vocab ids to gold vocab ids so that both tables share the same codes;
+    # strings unseen in gold are given ids beyond the gold vocab
+    id_maps = {}
+    for column in ('doc_id', 'sen_id', 'entity_type'):
+        gold_vocab = gold_vocabs[column]
+        pred_vocab = pred_vocabs[column]
+        id_map = pred_vocab.get_ids_in(gold_vocab)
+        unseen = id_map == NO_VALUE
+        id_map[unseen] = len(gold_vocab.itos) + np.arange(np.count_nonzero(unseen))
+        id_maps[column] = id_map
+
+    gold_keys = _get_span_keys(gold_tables, ignore_label_difference=ignore_label_difference)
+    pred_keys = _get_span_keys(pred_tables, id_maps=id_maps,
+                               ignore_label_difference=ignore_label_difference)
+    # as in CountForMR, predictions for documents absent from gold are not counted
+    pred_keys = pred_keys[pred_keys[:, 0] < len(gold_vocabs['doc_id'].itos)]
+
+    _, inverse = np.unique(np.concatenate([gold_keys, pred_keys]), axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    gold_ids = inverse[:len(gold_keys)]
+    pred_ids = inverse[len(gold_keys):]
+    correct = np.isin(gold_ids, pred_ids)
+
+    gold_labels = gold_vocabs['entity_type'].itos
+    pred_labels = gold_labels + [s for s in pred_vocabs['entity_type'].itos
+                                 if not s in gold_vocabs['entity_type'].stoi]
+
+    counter = Counter()
+    for vtype, labels, codes in (
+            (GOLD, gold_labels, gold_keys[:, 4]),
+            (CORRECT, gold_labels, gold_keys[correct, 4]),
+            (PRED, pred_labels, pred_keys[:, 4]),
+    ):
+        if ignore_label_difference:
+            counter[(ANY, vtype)] += len(codes)
+            continue
+
+        codes = codes[codes != NO_VALUE]
+        for code, count in enumerate(np.bincount(codes, minlength=len(labels))):
+            if count > 0:
+                counter[(labels[code], vtype)] += int(count)
+
+    return counter
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--input_path', '-i',
+        type=str,
+        required=True,
+    )
+    parser.add_argument(
+        '--output_dir', '-o',
+        type=str,
+        required=True,
+    )
+    args = parser.parse_args()
+
+    tables, vocabs = build_tables(iter_docs(args.input_path))
+    save_tables(tables, vocabs, args.output_dir)
+
+    c_basic, c_cate = get_stats_from_tables(tables, vocabs)
+    for key, val in c_basic.items():
+        logger.info(f'{key}\t{val}')
+    for key, val in c_cate.most_common():
+        logger.info(f'{key}\t{val}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator, Tuple
+
+
+def _call_in_worker(
+        func: Callable,
+        item: Any,
+) -> Tuple[Any, str]:
+    """Return (func(item), None) or (None, error message) if func raises an exception."""
+
+    try:
+        return func(item), None
+    except Exception as e:
+        return None, f'{type(e).__name__}: {e}'
+
+
+def map_in_batches(
+        func: Callable,
+        items: Iterable,
+        jobs: int = 1,
+        batch_size: int = 256,
+        initializer: Callable = None,
+        initargs: tuple = (),
+) -> Iterator[Tuple[Any, Any, str]]:
+    """Yield (item, result, error message) of func applied to each item in the order of items.
+
+    Items are read batch by batch and processed by `jobs` worker processes,
+    so that all the items are not held at once. Each worker is set up by
+    initializer(*initargs), which typically sets the module globals used by
+    func; with jobs=1, it is called in this process and no pool is started.
+    The error message is None unless func raises an exception for the item,
+    in which case the result is None.
+    """
+
+    call = partial(_call_in_worker, func)
+    if jobs == 1:
+        if initializer:
+            initializer(*initargs)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(
+            max_workers=jobs, initializer=initializer, initargs=initargs)
+
+    items = iter(items)
+    try:
+        while True:
+            batch = list(islice(items, batch_size))
+            if not batch:
+                break
+
+            if executor:
+                chunksize = max(1, len(batch) // (jobs * 4))
+                results = executor.map(call, batch, chunksize=chunksize)
+            else:
+                results = map(call, batch)
+
+            for item, (result, error) in zip(batch, results):
+                yield item, result, error
+    finally:
+        if executor:
+            executor.shutdown()
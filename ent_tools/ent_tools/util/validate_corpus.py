@@ -0,0 +1,254 @@
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import os
+import sys
+from typing import Iterator, NamedTuple, Tuple
+
+from logzero import logger
+
+from ent_tools.util.constants import (
+    SECS, SENS, MENS, ENTS, SEC_ID, SEN_ID, SEN_IDS, MEN_IDS, MEM_MEN_IDS, ENT_ID, TXT, SPAN,
+)
+from ent_tools.util.data_io import iter_docs
+from ent_tools.util.indexed_corpus import is_indexable_path, iter_docs_in_byte_range, split_byte_ranges
+
+
+DOCUMENT = 'document'
+SECTION  = 'section'
+SENTENCE = 'sentence'
+MENTION  = 'mention'
+ENTITY   = 'entity'
+
+SPLIT_SIZE = 32 << 20   # bytes of JSONL read by a task
+
+
+class Violation(NamedTuple):
+    doc_id: str
+    item_type: str      # DOCUMENT, SECTION, SENTENCE, MENTION or ENTITY
+    item_id: str
+    message: str
+
+    def __str__(self) -> str:
+        return f'{self.doc_id}\t{self.item_type}\t{self.item_id}\t{self.message}'
+
+
+def validate_doc(
+        doc: dict,
+        doc_id: str = None,
+) -> list[Violation]:
+    """Return all violations of the cross-references among the items of a document.
+
+    The checks are those of `json_util.check_attributes`: sections and their
+    sentences, sentences and their mentions, and mentions and their entities
+    refer to each other, and mention spans are in their sentences. The id
+    lists of items are indexed as sets, so that each check takes constant time.
+    """
+
+    violations = []
+
+    def add(item_type, item_id, message):
+        violations.append(Violation(doc_id, item_type, item_id, message))
+
+    sens = doc.get(SENS)
+    if not isinstance(sens, dict):
+        add(DOCUMENT, doc_id, f'no {SENS}')
+        return violations
+
+    secs = doc.get(SECS)
+    mens = doc.get(MENS)
+    ents = doc.get(ENTS)
+
+    if secs is not None:
+        secid2senids = {}
+        for sec_id, sec in secs.items():
+            sen_ids = sec.get(SEN_IDS, ())
+            secid2senids[sec_id] = set(sen_ids)
+            # sec's sens are associated with the sec
+            for sen_id in sen_ids:
+                if not sen_id in sens:
+                    add(SECTION, sec_id, f'unknown sentence {sen_id}')
+                elif sens[sen_id].get(SEC_ID) != sec_id:
+                    add(SECTION, sec_id, f'sentence {sen_id} is in section {sens[sen_id].get(SEC_ID)}')
+
+    senid2menids = {}
+    for sen_id, sen in sens.items():
+        if secs is not None:
+            # sen's sec has the sen
+            sec_id = sen.get(SEC_ID)
+            if not sec_id in secid2senids:
+                add(SENTENCE, sen_id, f'unknown section {sec_id}')
+            elif not sen_id in secid2senids[sec_id]:
+                add(SENTENCE, sen_id, f'not in sentences of section {sec_id}')
+
+        if mens is not None:
+            men_ids = sen.get(MEN_IDS, ())
+            senid2menids[sen_id] = set(men_ids)
+            # sen's mens are associated with the sen
+            for men_id in men_ids:
+                if not men_id in mens:
+                    add(SENTENCE, sen_id, f'unknown mention {men_id}')
+                elif mens[men_id].get(SEN_ID) != sen_id:
+                    add(SENTENCE, sen_id, f'mention {men_id} is in sentence {mens[men_id].get(SEN_ID)}')
+
+    if mens is None:
+        return violations
+
+    if ents is not None:
+        entid2menids = {ent_id: set(ent.get(MEM_MEN_IDS, ())) for ent_id, ent in ents.items()}
+
+    for men_id, men in mens.items():
+        # men's sen has the men
+        sen_id = men.get(SEN_ID)
+        if not sen_id in sens:
+            add(MENTION, men_id, f'unknown sentence {sen_id}')
+        else:
+            if not men_id in senid2menids[sen_id]:
+                add(MENTION, men_id, f'not in mentions of sentence {sen_id}')
+
+            span = men.get(SPAN)
+            if not span or not 0 <= span[0] <= span[1] <= len(sens[sen_id].get(TXT, '')):
+                add(MENTION, men_id, f'span {span} is out of sentence {sen_id}')
+
+        if ents is not None:
+            # men's ent has the men
+            ent_id = men.get(ENT_ID)
+            if ent_id is None:
+                continue
+            if not ent_id in entid2menids:
+                add(MENTION, men_id, f'unknown entity {ent_id}')
+            elif not men_id in entid2menids[ent_id]:
+                add(MENTION, men_id, f'not in members of entity {ent_id}')
+
+    if ents is not None:
+        for ent_id, ent in ents.items():
+            # ent's mens are associated with the ent
+            for men_id in ent.get(MEM_MEN_IDS, ()):
+                if not men_id in mens:
+                    add(ENTITY, ent_id, f'unknown member mention {men_id}')
+                elif mens[men_id].get(ENT_ID) != ent_id:
+                    add(ENTITY, ent_id, f'member mention {men_id} is in entity {mens[men_id].get(ENT_ID)}')
+
+    return violations
+
+
+def get_shards(
+        input_paths: list[str],
+        split_size: int = SPLIT_SIZE,
+) -> list[Tuple[str, int, int]]:
+    """Return (path, begin, end) of the shards of the input files validated as tasks.
+
+    Uncompressed JSONL files are split into byte ranges; other files are
+    single shards whose begin and end are None.
+    """
+
+    shards = []
+    for input_path in input_paths:
+        if is_indexable_path(input_path):
+            for begin, end in split_byte_ranges(input_path, split_size):
+                shards.append((input_path, begin, end))
+        else:
+            shards.append((input_path, None, None))
+    return shards
+
+
+def validate_shard(
+        shard: Tuple[str, int, int],
+) -> Tuple[int, list[Violation], str]:
+    """Validate the documents of a shard.
+
+    Return the number of documents, the violations, and the error message if
+    the shard could not be read.
+    """
+
+    input_path, begin, end = shard
+    if begin is None:
+        docs = iter_docs(input_path)
+    else:
+        docs = iter_docs_in_byte_range(input_path, begin, end)
+
+    n_docs = 0
+    violations = []
+    try:
+        for doc_id, doc in docs:
+            n_docs += 1
+            violations.extend(validate_doc(doc, doc_id))
+    except Exception as e:
+        return n_docs, violations, f'{type(e).__name__}: {e}'
+    return n_docs, violations, None
+
+
+def validate_corpora(
+        input_paths: list[str],
+        jobs: int = 1,
+        split_size: int = SPLIT_SIZE,
+) -> Iterator[Tuple[str, int, list[Violation], str]]:
+    """Yield (path, number of documents, violations, error message) for each shard in order.
+
+    Shards are validated by `jobs` worker processes.
+    """
+
+    shards = get_shards(input_paths, split_size=split_size)
+    if jobs == 1:
+        for shard in shards:
+            yield (shard[0], *validate_shard(shard))
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for shard, result in zip(shards, executor.map(validate_shard, shards)):
+            yield (shard[0], *result)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--input_paths', '-i',
+        type=str,
+        required=True,
+    )
+    parser.add_argument(
+        '--output_path', '-o',
+        type=str,
+    )
+    parser.add_argument(
+        '--split_size',
+        type=int,
+        default=SPLIT_SIZE,
+    )
+    parser.add_argument(
+        '--jobs', '-j',
+        type=int,
+        default=1,
+    )
+    args = parser.parse_args()
+
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count()
+
+    # violations are written as `doc_id<tab>item type<tab>item id<tab>message` lines
+    fw = open(args.output_path, 'w', encoding='utf-8') if args.output_path else sys.stdout
+    n_docs = 0
+    counter = Counter()
+    n_errors = 0
+    try:
+        for input_path, n_shard_docs, violations, error in validate_corpora(
+                args.input_paths.split(','), jobs=jobs, split_size=args.split_size):
+            n_docs += n_shard_docs
+            for violation in violations:
+                fw.write(f'{violation}\n')
+                counter[violation.item_type] += 1
+            if error:
+                logger.error(f'Failed to read {input_path}: {error}')
+                n_errors += 1
+    finally:
+        if fw is not sys.stdout:
+            fw.close()
+
+    n_violations = sum(counter.values())
+    logger.info(f'Validated {n_docs} documents: {n_violations} violations'
+                + ''.join(f', {item_type}: {n}' for item_type, n in counter.most_common()))
+    if n_violations > 0 or n_errors > 0:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+import json
+import sys
+
+from ent_tools.data_conversion import ann_to_json_with_sentence_resplit
+from ent_tools.util.constants import SENS, MENS, TXT, SPAN, ENT_TYPE
+
+
+def write_brat_files(tmp_path, txt):
+    txt_path = tmp_path / 'doc.txt'
+    ann_path = tmp_path / 'doc.ann'
+    txt_path.write_text(txt, encoding='utf-8')
+    begin = txt.index('東京')
+    ann_path.write_text(f'T1\tCity {begin} {begin+2}\t東京\n', encoding='utf-8')
+    return txt_path, ann_path
+
+
+def run_main(monkeypatch, tmp_path, txt_path, ann_path, *options):
+    monkeypatch.setattr(sys, 'argv', [
+        'ann_to_json_with_sentence_resplit',
+        '-txt', str(txt_path), '-ann', str(ann_path), '-json_dir', str(tmp_path), *options])
+    ann_to_json_with_sentence_resplit.main()
+    with open(tmp_path / 'doc.json', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_split_by_subdoc_without_subdocs(monkeypatch, tmp_path):
+    txt_path, ann_path = write_brat_files(tmp_path, '東京に行く。\n大阪に行く。\n')
+
+    data = run_main(monkeypatch, tmp_path, txt_path, ann_path, '--split_by_subdoc')
+    assert data == run_main(monkeypatch, tmp_path, txt_path, ann_path)
+    assert list(data) == ['doc']
+    assert [sen[TXT] for sen in data['doc'][SENS].values()] == ['東京に行く。', '大阪に行く。']
+    [men] = data['doc'][MENS].values()
+    assert (men[TXT], men[SPAN], men[ENT_TYPE]) == ('東京', [0, 2], 'City')
+
+
+def test_split_by_subdoc(monkeypatch, tmp_path):
+    txt_path, ann_path = write_brat_files(
+        tmp_path, '<subdoc page_begin=1>\n東京に行く。\n</subdoc>\n<subdoc page_begin=2>\n大阪に行く。\n</subdoc>\n')
+
+    data = run_main(monkeypatch, tmp_path, txt_path, ann_path, '--split_by_subdoc')
+    assert list(data) == ['doc-1', 'doc-2']
+    assert len(data['doc-1'][MENS]) == 1
+    assert len(data['doc-2'][MENS]) == 0
@@ -0,0 +1,62 @@
+from ent_tools.benchmark.synthetic_data import gen_corpus
+from ent_tools.util.constants import SENS, MENS, ENTS, SEC_ID, SEN_ID, MEN_IDS, MEM_MEN_IDS, ENT_ID, TXT, SPAN, ENT_TYPE
+from ent_tools.util.doc_model import Document, Entity, Mention, Sentence
+
+
+def test_round_trip():
+    for _, doc in gen_corpus(n_docs=20).items():
+        assert Document.from_dict(doc).to_dict() == doc
+
+
+def test_loaded_key_order_is_kept():
+    men = {TXT: '東京', SPAN: [0, 2], SEN_ID: 'S1', 'note': 'x'}
+    assert list(Mention.from_dict(men).to_dict()) == [TXT, SPAN, SEN_ID, 'note']
+
+
+def test_mutate_then_serialize_mention():
+    m = Mention.from_dict({SEN_ID: 'S1', SPAN: [0, 2], TXT: '東京', ENT_TYPE: 'LOC'})
+    m.entity_id = 'E1'
+    assert m.to_dict() == {SEN_ID: 'S1', SPAN: [0, 2], TXT: '東京', ENT_TYPE: 'LOC', ENT_ID: 'E1'}
+
+    m.entity_type = 'FAC'
+    assert m.to_dict()[ENT_TYPE] == 'FAC'
+
+
+def test_mutate_then_serialize_sentence_and_entity():
+    sen = Sentence.from_dict({TXT: '東京', MEN_IDS: []})
+    sen.sec_id = 'C1'
+    sen.mention_ids.append('M1')
+    assert sen.to_dict() == {TXT: '東京', MEN_IDS: ['M1'], SEC_ID: 'C1'}
+
+    ent = Entity.from_dict({'name': 'x'})
+    assert ent.to_dict() == {'name': 'x'}
+    ent.member_mention_ids.append('M1')
+    assert ent.to_dict() == {'name': 'x', MEM_MEN_IDS: ['M1']}
+
+
+def test_mutate_then_serialize_document():
+    doc = Document.from_dict({SENS: {'S1': {TXT: '東京', MEN_IDS: ['M1']}},
+                              MENS: {'M1': {SEN_ID: 'S1', SPAN: [0, 2]}}})
+    doc.entities = {'E1': Entity(['M1'])}
+    doc.mentions['M1'].entity_id = 'E1'
+    d = doc.to_dict()
+    assert list(d) == [SENS, MENS, ENTS]
+    assert d[MENS]['M1'] == {SEN_ID: 'S1', SPAN: [0, 2], ENT_ID: 'E1'}
+    assert d[ENTS] == {'E1': {MEM_MEN_IDS: ['M1']}}
+
+
+def test_new_objects_skip_unset_fields():
+    assert Mention('S1', 0, 2).to_dict() == {SEN_ID: 'S1', SPAN: [0, 2]}
+    assert Sentence('東京').to_dict() == {TXT: '東京', MEN_IDS: []}
+    assert Document().to_dict() == {SENS: {}, MENS: {}}
+
+
+def test_extra_is_allocated_only_for_unknown_keys():
+    men = Mention.from_dict({SEN_ID: 'S1', SPAN: [0, 2], TXT: '東京', ENT_TYPE: 'LOC'})
+    sen = Sentence.from_dict({TXT: '東京', MEN_IDS: []})
+    ent = Entity.from_dict({MEM_MEN_IDS: ['M1']})
+    assert men.extra is None and sen.extra is None and ent.extra is None
+
+    men = Mention.from_dict({SEN_ID: 'S1', SPAN: [0, 2], 'note': 'x'})
+    assert men.extra == {'note': 'x'}
+    assert men.to_dict() == {SEN_ID: 'S1', SPAN: [0, 2], 'note': 'x'}
@@ -94,12 +94,16 @@ def main():
         '--output_json_path', '-o',
         required=True,
     )
+    parser.add_argument(
+        '--compact_json',
+        action='store_true',
+    )
     args = parser.parse_args()
 
     doc_id = os.path.basename(args.input_result_path).split('.')[0]
     doc_dict = read_result(args.input_result_path)
     data = {doc_id: doc_dict}
-    write_as_json(data, args.output_json_path)
+    write_as_json(data, args.output_json_path, compact=args.compact_json)
 
 
 if __name__ == "__main__":
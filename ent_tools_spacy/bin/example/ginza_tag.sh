@@ -0,0 +1,14 @@
+# example:
+MODEL_NAME="ja_ginza_electra"
+INPUT_TXT_DIR=../data/original/sample_ja_ner
+OUTPUT_JSON=../data/output/sample_ja_ner/ginza/$MODEL_NAME/json/all.json
+OUTPUT_ANN_DIR=../data/output/sample_ja_ner/ginza/$MODEL_NAME/ann
+
+# The model is loaded once and the sentences of all documents are tagged in batches.
+python ent_tools_spacy/tag_with_ginza.py \
+       -m $MODEL_NAME \
+       -i $INPUT_TXT_DIR \
+       -o $OUTPUT_JSON \
+       -ann_dir $OUTPUT_ANN_DIR \
+       --batch_size 256 \
+       --n_process 1
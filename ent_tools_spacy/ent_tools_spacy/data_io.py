@@ -1,4 +1,3 @@
-import json
 import os
 from typing import Tuple
 
@@ -9,9 +8,22 @@ from spacy.tokens import DocBin
 from spacy.util import filter_spans
 
 from ent_tools.util.constants import DOC_ID, SENS, SEN_ID, TXT, MEN_IDS, MENS, SPAN, ENT_TYPE
+from ent_tools.util.data_io import COMPRESSION_SUFFIXES, json_dumps, json_loads, open_file
 from ent_tools_spacy.util import load_model
 
 
+def get_ids_path(
+        data_path: str,
+) -> str:
+    """Return the path of the (possibly compressed) .ids sidecar of data_path if it exists."""
+
+    for suffix in ('',) + COMPRESSION_SUFFIXES:
+        data_ids_path = f'{data_path}.ids{suffix}'
+        if os.path.isfile(data_ids_path):
+            return data_ids_path
+    return None
+
+
 def load_spacy_data(
         data_path: str,
 ) -> Tuple[DocBin, list]:
@@ -20,13 +32,13 @@ def load_spacy_data(
     data.from_disk(data_path)
     logger.info(f'Loaded data: {data_path}')
 
-    data_ids_path = f'{data_path}.ids'
+    data_ids_path = get_ids_path(data_path)
     data_ids = []
-    if os.path.isfile(data_ids_path):
-        with open(data_ids_path) as f:
+    if data_ids_path:
+        with open_file(data_ids_path) as f:
             for line in f:
                 line = line.strip('\n')
-                line_dict = json.loads(line)
+                line_dict = json_loads(line)
                 data_ids.append(line_dict)
 
     return data, data_ids
@@ -36,11 +48,13 @@ def convert_dict_to_docbin(
         model_name: str,
         data_org: dict,
         output_path: str = None,
+        ids_compression: str = None,
 ) -> Tuple[DocBin, list]:
 
+    fw = None
     if output_path:
-        output_path_sen_ids = f'{output_path}.ids'
-        fw = open(output_path_sen_ids, 'w')    
+        output_path_sen_ids = f'{output_path}.ids{ids_compression or ""}'
+        fw = open_file(output_path_sen_ids, 'w')
 
     nlp = load_model(model_name)
     docbin = DocBin()
@@ -52,7 +66,7 @@ def convert_dict_to_docbin(
             user_data = {DOC_ID: docid, SEN_ID: sen_id}
             data_ids.append(user_data)
             if fw:
-                fw.write(json.dumps(user_data, ensure_ascii=False)+'\n')
+                fw.write(json_dumps(user_data, compact=True)+'\n')
 
             text = d_sen[TXT]
             doc  = nlp.make_doc(text)
@@ -1,5 +1,4 @@
 import argparse
-import json
 import os
 
 from logzero import logger
@@ -8,6 +7,7 @@ from spacy import Language
 from spacy.tokens import DocBin, Doc
 
 from ent_tools.util.constants import DOC_ID, SENS, SEN_ID, TXT, MEN_IDS, MENS, SPAN, ENT_TYPE
+from ent_tools.util.data_io import write_as_json
 from ent_tools_spacy.data_io import load_spacy_data
 from ent_tools_spacy.util import get_simple_span, load_model, prepare_ner_model
 
@@ -18,6 +18,7 @@ def decode_and_save_as_json(
         data_ids: list,
         output_path: str,
         save_per_doc: bool = True,
+        compact: bool = False,
 ) -> None:
 
     if save_per_doc:
@@ -41,9 +42,7 @@ def decode_and_save_as_json(
             if prev_doc_id:
                 if save_per_doc:
                     output_path_ = f'{output_dir}/{prev_doc_id}.json'
-                    with open(output_path_, 'w') as fw_:
-                        json.dump({prev_doc_id: doc_dict}, fw_, ensure_ascii=False, indent=2)
-                    logger.info(f'Saved: {output_path_}')
+                    write_as_json({prev_doc_id: doc_dict}, output_path_, compact=compact)
                 else:
                     data_dict[prev_doc_id] = doc_dict
 
@@ -85,16 +84,12 @@ def decode_and_save_as_json(
     if doc_dict:
         if save_per_doc:
             output_path_ = f'{output_dir}/{prev_doc_id}.json'
-            with open(output_path_, 'w') as fw_:
-                json.dump({prev_doc_id: doc_dict}, fw_, ensure_ascii=False, indent=2)
-            logger.info(f'Saved: {output_path_}')
+            write_as_json({prev_doc_id: doc_dict}, output_path_, compact=compact)
         else:
             data_dict[prev_doc_id] = doc_dict
 
     if not save_per_doc:
-        with open(output_path, 'w') as fw:
-            json.dump(data_dict, fw, ensure_ascii=False, indent=2)
-        logger.info(f'Saved: {output_path}')
+        write_as_json(data_dict, output_path, compact=compact)
 
 
 def main():
@@ -118,6 +113,10 @@ def main():
         '--save_per_doc',
         action='store_true'
     )
+    parser.add_argument(
+        '--compact_json',
+        action='store_true',
+    )
     args = parser.parse_args()
 
     # load model
@@ -128,7 +127,8 @@ def main():
     data, data_ids = load_spacy_data(args.input_docbin_path)
 
     # decode
-    decode_and_save_as_json(nlp, data, data_ids, args.output_json_path, args.save_per_doc)
+    decode_and_save_as_json(nlp, data, data_ids, args.output_json_path, args.save_per_doc,
+                            compact=args.compact_json)
 
 
 if __name__ == '__main__':
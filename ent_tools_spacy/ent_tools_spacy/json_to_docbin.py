@@ -2,7 +2,7 @@ import argparse
 
 from logzero import logger
 
-from ent_tools.util.data_io import load_json
+from ent_tools.util.data_io import COMPRESSION_SUFFIXES, load_json
 from ent_tools.util.data_statistics import get_stats_from_dict
 from ent_tools_spacy.util import get_stats_from_docbin
 from ent_tools_spacy.data_io import convert_dict_to_docbin
@@ -25,6 +25,11 @@ def main():
         type=str,
         required=True,
     )
+    parser.add_argument(
+        '--ids_compression',
+        type=str,
+        choices=COMPRESSION_SUFFIXES,
+    )
     args = parser.parse_args()
     
     data_org = load_json(args.input_json_path)
@@ -37,7 +42,8 @@ def main():
         logger.info(f'Num of mentions: {c_basic["n_mention"]}')
 
     data_docbin, data_ids = convert_dict_to_docbin(
-        args.model_name, data_org, output_path=args.output_path)
+        args.model_name, data_org, output_path=args.output_path,
+        ids_compression=args.ids_compression)
     c_basic, c_cate = get_stats_from_docbin(data_docbin, data_ids)
     if 'n_document' in c_basic:
         logger.info(f'Num of documents: {c_basic["n_document"]}')
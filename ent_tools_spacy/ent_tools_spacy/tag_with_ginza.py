@@ -0,0 +1,189 @@
+import argparse
+from collections import deque
+import os
+from typing import Iterator, Tuple
+
+from logzero import logger
+
+from spacy import Language
+
+from ent_tools.data_conversion.brat_util import iter_lines_with_offsets
+from ent_tools.data_conversion.conll_reader import (
+    TaggedSentence, gen_ann_text_from_sentences, gen_doc_dict_from_sentences,
+)
+from ent_tools.data_conversion.merge_jsons_into_single_json import merge_docs
+from ent_tools.util.data_io import load_json
+from ent_tools_spacy.util import load_model, prepare_ner_model
+
+
+def iter_txt_paths_in_dir(
+        input_dir: str,
+) -> Iterator[Tuple[str, str]]:
+    """Yield (name, txt path) for the non-empty .txt files in input_dir."""
+
+    for file_name in sorted(os.listdir(input_dir)):
+        if not file_name.endswith('.txt'):
+            continue
+
+        txt_path = os.path.join(input_dir, file_name)
+        if os.path.getsize(txt_path) == 0:
+            logger.info(f'Skip: empty file {txt_path}')
+            continue
+
+        yield file_name[:-len('.txt')], txt_path
+
+
+def iter_sentences(
+        txt_path: str,
+) -> Iterator[Tuple[int, str]]:
+    """Yield (begin offset, text) of the non-empty lines, which are tagged as sentences.
+
+    These are the sentences of `txt_to_tsv_for_auto_ner` passed to `ginza -d`.
+    """
+
+    with open(txt_path) as f:
+        logger.info(f'Read: {txt_path}')
+        for bol_idx, line in iter_lines_with_offsets(f):
+            text = line.rstrip('\n')
+            if text:
+                yield bol_idx, text
+
+
+def tag_docs(
+        nlp: Language,
+        txt_paths: Iterator[Tuple[str, str]],
+        batch_size: int = 256,
+        n_process: int = 1,
+        labelmap: dict = None,
+) -> Iterator[Tuple[str, list[TaggedSentence]]]:
+    """Yield (name, tagged sentences) for each document.
+
+    Sentences of all documents are streamed through a single `nlp.pipe`, so
+    that the model is loaded once and batches are not cut at document
+    boundaries. If labelmap is given, labels are mapped by it and mentions
+    with other labels are dropped.
+    """
+
+    names = deque()     # names of the documents read so far and not yielded yet
+
+    def gen_inputs():
+        for name, txt_path in txt_paths:
+            names.append(name)
+            for bol_idx, text in iter_sentences(txt_path):
+                yield text, (name, bol_idx)
+
+    sentences = []
+    for doc, (name, bol_idx) in nlp.pipe(
+            gen_inputs(), as_tuples=True, batch_size=batch_size, n_process=n_process):
+        # documents before this one are complete; those with no sentences are yielded as empty
+        while names[0] != name:
+            yield names.popleft(), sentences
+            sentences = []
+
+        text = doc.text
+        mentions = []
+        for ent in doc.ents:
+            label = ent.label_
+            if labelmap:
+                if label in labelmap:
+                    label = labelmap[label]
+                else:
+                    continue
+
+            begin = ent.start_char
+            end = ent.end_char
+            if text[end-1] == '　':
+                end -= 1
+            mentions.append((begin, end, label))
+
+        sentences.append((bol_idx, text, mentions))
+
+    while names:
+        yield names.popleft(), sentences
+        sentences = []
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--model_name', '-m',
+        type=str,
+        required=True,
+    )
+    parser.add_argument(
+        '--input_dir', '-i',
+        type=str,
+        required=True,
+    )
+    parser.add_argument(
+        '--output_json_path', '-o',
+        type=str,
+    )
+    parser.add_argument(
+        '--output_ann_dir', '-ann_dir',
+        type=str,
+    )
+    parser.add_argument(
+        '--label_conversion_map_path', '-label',
+        type=str,
+    )
+    parser.add_argument(
+        '--batch_size',
+        type=int,
+        default=256,
+    )
+    parser.add_argument(
+        '--n_process',
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        '--ner_only',
+        action='store_true',
+    )
+    parser.add_argument(
+        '--compact_json',
+        action='store_true',
+    )
+    args = parser.parse_args()
+
+    if not (args.output_json_path or args.output_ann_dir):
+        parser.error('Specify --output_json_path and/or --output_ann_dir.')
+
+    labelmap = None
+    if args.label_conversion_map_path:
+        labelmap = load_json(args.label_conversion_map_path)
+
+    # load model once for all documents
+    nlp = load_model(args.model_name)
+    if args.ner_only:
+        prepare_ner_model(nlp)
+
+    if args.output_ann_dir:
+        os.makedirs(args.output_ann_dir, exist_ok=True)
+
+    def gen_docs():
+        tagged_docs = tag_docs(
+            nlp, iter_txt_paths_in_dir(args.input_dir),
+            batch_size=args.batch_size,
+            n_process=args.n_process,
+            labelmap=labelmap,
+        )
+        for name, sentences in tagged_docs:
+            if args.output_ann_dir:
+                output_ann_path = os.path.join(args.output_ann_dir, f'{name}.ann')
+                with open(output_ann_path, 'w') as fw:
+                    fw.write(gen_ann_text_from_sentences(sentences))
+                logger.info(f'Save: {output_ann_path}')
+
+            yield name, gen_doc_dict_from_sentences(sentences), name
+
+    if args.output_json_path:
+        merge_docs(gen_docs(), args.output_json_path, compact=args.compact_json)
+    else:
+        for _ in gen_docs():
+            pass
+
+
+if __name__ == '__main__':
+    main()